@@ -1,12 +1,25 @@
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse, PlainTextResponse
-from api.gradescopeClient import GradescopeClient
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from api.gradescopePool import GradescopeClientPool
 from api.utils import *
+from api.cache import TTLCache
+from api.gradeStore import GradeStore, format_timestamp
+from api.columnar import ColumnarGrades
+from api.gradeAggregation import ScoreMatrix, compute_course_grades
+from gradescopeCronJob.assignment_classifier import AssignmentClassifier
+from gradescopeCronJob.download_cache import CachedDownload, DownloadCache
+from api.asyncSession import AsyncSession
+from api.singleFlight import SingleFlight
+from api.metrics import GradeSyncCollector, STORE_LOAD_SECONDS, UPSTREAM_RETRIES, time_upstream_request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+import time
+import anyio
 import gspread
 from google.oauth2.service_account import Credentials
 from backoff_utils import strategies
 from backoff_utils import backoff
 import requests
+import httpx
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 credentials_json = os.getenv("SERVICE_ACCOUNT_CREDENTIALS")
@@ -14,7 +27,6 @@ credentials_dict = json.loads(credentials_json)
 credentials = Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
 client = gspread.authorize(credentials)
 app = FastAPI()
-GRADESCOPE_CLIENT = GradescopeClient()
 # Load JSON variables
 config_path = os.path.join(os.path.dirname(__file__), "config/cs10_fall_2024.json")
 with open(config_path, "r") as config_file:
@@ -24,8 +36,75 @@ with open(config_path, "r") as config_file:
 CS_10_GS_COURSE_ID = str(config.get("CS_10_GS_COURSE_ID"))
 # Hardcoded (for now) PL CS10 Summer 2024 COURSE ID
 CS_10_PL_COURSE_ID = str(config.get("CS_10_PL_COURSE_ID"))
+# Maximum number of scores.csv downloads /fetchAllGrades keeps in flight at once
+FETCH_ALL_GRADES_MAX_WORKERS = int(config.get("FETCH_ALL_GRADES_MAX_WORKERS", 8))
+# Local files that survive a restart (e.g. cached assignment catalogs) are kept here
+CACHE_DIRECTORY = config.get("CACHE_DIRECTORY", os.path.join(os.path.dirname(__file__), "cache"))
+# Seconds a Gradescope login is trusted before it is checked again. Requests that fail authentication log in again
+# and are retried either way. The session cookies are saved so that a restarted server does not need to log in.
+GRADESCOPE_SESSION_TTL_SECONDS = int(config.get("GRADESCOPE_SESSION_TTL_SECONDS", 300))
+# Requests to Gradescope check out one of GRADESCOPE_SESSION_POOL_SIZE independently logged-in sessions, waiting at
+# most GRADESCOPE_POOL_TIMEOUT_SECONDS for one to be free. Each request times out after GRADESCOPE_REQUEST_TIMEOUT_SECONDS.
+GRADESCOPE_SESSION_POOL_SIZE = int(config.get("GRADESCOPE_SESSION_POOL_SIZE", 8))
+GRADESCOPE_POOL_TIMEOUT_SECONDS = float(config.get("GRADESCOPE_POOL_TIMEOUT_SECONDS", 30))
+GRADESCOPE_REQUEST_TIMEOUT_SECONDS = float(config.get("GRADESCOPE_REQUEST_TIMEOUT_SECONDS", 60))
+GRADESCOPE_CLIENT = GradescopeClientPool(
+    size=GRADESCOPE_SESSION_POOL_SIZE,
+    checkout_timeout_seconds=GRADESCOPE_POOL_TIMEOUT_SECONDS,
+    request_timeout_seconds=GRADESCOPE_REQUEST_TIMEOUT_SECONDS,
+    # Each pooled session downloads one file at a time, plus a login page while logging in again
+    connections_per_host=2,
+    session_ttl_seconds=GRADESCOPE_SESSION_TTL_SECONDS,
+    cookie_path_template=os.path.join(CACHE_DIRECTORY, "gradescope_cookies.{index}.json")
+)
+# Seconds before a cached assignment catalog is refreshed in the background; stale catalogs are served meanwhile
+ASSIGNMENT_CATALOG_TTL_SECONDS = int(config.get("ASSIGNMENT_CATALOG_TTL_SECONDS", 3600))
+ASSIGNMENT_CATALOG_CACHE = TTLCache(
+    ttl_seconds=ASSIGNMENT_CATALOG_TTL_SECONDS,
+    persist_path=os.path.join(CACHE_DIRECTORY, "assignment_catalog.json")
+)
+# Categorizes assignments by title with the ASSIGNMENT_CATEGORIES rules of the config file (the CS10 rules by default)
+ASSIGNMENT_CLASSIFIER = AssignmentClassifier.from_config(config)
+# Grades downloaded from Gradescope are kept in a local SQLite store and served from there
+# until they are older than GRADE_STORE_MAX_AGE_SECONDS. Use 0 to always fetch live.
+GRADE_STORE_MAX_AGE_SECONDS = int(config.get("GRADE_STORE_MAX_AGE_SECONDS", 900))
+GRADE_STORE = GradeStore(os.path.join(CACHE_DIRECTORY, "grades.sqlite3"))
+# Scores are downloaded with conditional requests, so that Gradescope can answer an unchanged scores.csv with a 304, and
+# an unchanged one is not parsed and saved to the grade store again (see gradescopeCronJob/download_cache.py).
+# Set CONDITIONAL_DOWNLOADS to false to always download and save the whole file.
+CONDITIONAL_DOWNLOADS = bool(config.get("CONDITIONAL_DOWNLOADS", True))
+SCORES_DOWNLOAD_CACHE = DownloadCache(os.path.join(CACHE_DIRECTORY, "scores_downloads")) if CONDITIONAL_DOWNLOADS else None
+# Media types of the formats that grades can be streamed in with the `stream` query parameter
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Columns of the long-format CSV streamed by /fetchAllGrades?stream=csv
+ALL_GRADES_CSV_COLUMNS = ["Assignment", "Assignment ID", "Name", "SID", "Email", "Total Score", "Max Points", "Status"]
+# Course policy applied by /computeGrades
+NUM_LECTURE_DROPS = int(config.get("NUM_LECTURE_DROPS", 0))
+UNGRADED_LABS = [int(lab) for lab in config.get("UNGRADED_LABS", [])]
+SPECIAL_CASE_LABS = [int(lab) for lab in config.get("SPECIAL_CASE_LABS", [])]
+TOTAL_LAB_POINTS = float(config.get("TOTAL_LAB_POINTS", 100))
+# The score matrix of each class, kept until any of its assignments is fetched again: class_id -> (fetch times, matrix)
+SCORE_MATRIX_CACHE = {}
 PL_API_TOKEN = os.getenv("PL_API_TOKEN")
 PL_SERVER = "https://us.prairielearn.com/pl/api/v1"
+# The /async endpoints send their Gradescope requests over this client, which shares the cookies of GRADESCOPE_CLIENT's
+# primary session, and their PrairieLearn requests over the second one. Each keeps at most ASYNC_MAX_CONNECTIONS
+# connections open.
+ASYNC_MAX_CONNECTIONS = int(config.get("ASYNC_MAX_CONNECTIONS", 100))
+ASYNC_GRADESCOPE_SESSION = AsyncSession(lambda: GRADESCOPE_CLIENT.primary.session, max_connections=ASYNC_MAX_CONNECTIONS,
+                                        upstream="gradescope")
+ASYNC_PL_SESSION = AsyncSession(max_connections=ASYNC_MAX_CONNECTIONS, upstream="prairielearn")
+# Concurrent requests for the same Gradescope page (or the same PrairieLearn gradebook) share one upstream call.
+# The number of calls that were coalesced is reported by /getCacheStats.
+GRADESCOPE_FLIGHTS = SingleFlight()
+PL_FLIGHTS = SingleFlight()
+# /metrics reads the counters of the caches, the coalescing and the session pool when it is scraped
+REGISTRY.register(GradeSyncCollector(
+    get_caches=lambda: {"assignment_catalog": ASSIGNMENT_CATALOG_CACHE},
+    get_flights=lambda: {"gradescope": GRADESCOPE_FLIGHTS, "prairielearn": PL_FLIGHTS},
+    get_session_pool=lambda: GRADESCOPE_CLIENT,
+    get_download_caches=lambda: {"scores_downloads": SCORES_DOWNLOAD_CACHE} if SCORES_DOWNLOAD_CACHE else {},
+))
 
 
 @app.get("/")
@@ -41,14 +120,26 @@ def read_item(item_id: int, q: str = None):
 @app.get("/getGrades")
 @handle_errors
 @gradescope_session(GRADESCOPE_CLIENT)
-def fetchGrades(class_id: str, assignment_id: str, file_type: str = "json"):
+def fetchGrades(class_id: str, assignment_id: str, file_type: str = "json", with_metadata: bool = False, stream: str = None):
     """
     Fetches student grades from Gradescope as JSON. 
 
+    Grades are answered from the local grade store if they were downloaded less than
+    `GRADE_STORE_MAX_AGE_SECONDS` ago. Otherwise they are downloaded from Gradescope and saved to the store.
+    As in `/fetchAllGrades`, if the download fails but the store has older grades, those are returned instead
+    (with the time they were fetched), and the failure is logged.
+
     Parameters:
         class_id (str): The ID of the class/course. If not provided, a default ID (CS_10_COURSE_ID) is used.
         assignment_id (str): The ID of the assignment for which grades are to be fetched.
         file_type (str): JSON or CSV format. The default type is JSON.
+                         "columnar" returns each column once, with scores as numbers (see `ColumnarGrades.to_json`)
+                         instead of a list of string-valued rows.
+        with_metadata (bool): If true, wrap the grades with the time they were fetched from Gradescope:
+                              {"assignment_id": "5211613", "fetched_at": "2024-10-01T17:00:00+00:00", "grades": [...]}
+        stream (str): "ndjson" or "csv" to stream the rows from the grade store instead of building the whole
+                      JSON response in memory. NDJSON has one JSON row per line; CSV is the Gradescope export.
+                      The fetch time is sent in the `X-Fetched-At` header.
     Returns:
         dict or list: A list of dictionaries containing student grades if the request is successful.
                       If an error occurs, a dictionary with an error message is returned.
@@ -56,21 +147,196 @@ def fetchGrades(class_id: str, assignment_id: str, file_type: str = "json"):
         HTTPException: If there is an issue with the request to Gradescope (e.g., network issues).
         Exception: Catches any unexpected errors and includes a descriptive message.
     """
-    # supported filetypes
-    assert file_type in ["csv", "json"], "File type must be either CSV or JSON."
+    check_grades_format(file_type, stream)
     # If the class_id is not passed in, use the default (CS10) class id
     class_id = class_id or CS_10_GS_COURSE_ID
-    filetype = "csv" # json is not supported
-    GRADESCOPE_CLIENT.last_res = result = GRADESCOPE_CLIENT.session.get(f"https://www.gradescope.com/courses/{class_id}/assignments/{assignment_id}/scores.{filetype}")
-    if result.ok:
-        csv_content = result.content.decode("utf-8")
-        json_content = csv_to_json(csv_content)
-        return json_content
+    stored_at = GRADE_STORE.get_fetched_at(class_id, [assignment_id]).get(str(assignment_id))
+    fetched_at, grades = stored_at, None
+    if stored_at is None or time.time() - stored_at >= GRADE_STORE_MAX_AGE_SECONDS:
+        try:
+            result, fetched_at, csv_content = GRADESCOPE_FLIGHTS.do(
+                ("scores.csv", class_id, str(assignment_id)), lambda: download_grades_into_store(class_id, assignment_id))
+        except requests.RequestException as e:
+            if stored_at is None:
+                raise
+            result, fetched_at, csv_content = e, None, None
+        if fetched_at is None:
+            if stored_at is None:
+                return JSONResponse(
+                    content={"message": f"Failed to fetch grades."},
+                    status_code=int(result.status_code)
+                )
+            fetched_at = log_stale_grades(assignment_id, stored_at, result)
+        # Unchanged grades are read from the grade store instead of parsing the download again
+        elif csv_content is not None:
+            grades = parse_downloaded_grades(csv_content, file_type, stream)
+    return grades_response(class_id, assignment_id, file_type, with_metadata, stream, fetched_at, grades)
+
+
+@app.get("/async/getGrades")
+@handle_errors
+@gradescope_session(GRADESCOPE_CLIENT)
+async def fetch_grades_async(class_id: str, assignment_id: str, file_type: str = "json", with_metadata: bool = False,
+                             stream: str = None):
+    """
+    Same as `/getGrades`, but the download from Gradescope is awaited on the event loop instead of holding a
+    threadpool worker, so many concurrent requests do not queue for workers.
+    """
+    check_grades_format(file_type, stream)
+    class_id = class_id or CS_10_GS_COURSE_ID
+    stored_at = GRADE_STORE.get_fetched_at(class_id, [assignment_id]).get(str(assignment_id))
+    fetched_at, grades = stored_at, None
+    if stored_at is None or time.time() - stored_at >= GRADE_STORE_MAX_AGE_SECONDS:
+        try:
+            result, fetched_at, csv_content = await GRADESCOPE_FLIGHTS.do_async(
+                ("scores.csv", class_id, str(assignment_id)), lambda: download_grades_into_store_async(class_id, assignment_id))
+        except httpx.TransportError as e:
+            if stored_at is None:
+                raise
+            result, fetched_at, csv_content = e, None, None
+        if fetched_at is None:
+            if stored_at is None:
+                return JSONResponse(
+                    content={"message": f"Failed to fetch grades."},
+                    status_code=int(result.status_code)
+                )
+            fetched_at = log_stale_grades(assignment_id, stored_at, result)
+        # Parsing a large export takes a while, so it runs on a worker thread
+        elif csv_content is not None:
+            grades = await anyio.to_thread.run_sync(parse_downloaded_grades, csv_content, file_type, stream)
+    return await anyio.to_thread.run_sync(grades_response, class_id, assignment_id, file_type, with_metadata, stream,
+                                          fetched_at, grades)
+
+
+def log_stale_grades(assignment_id: str, stored_at: float, failure) -> float:
+    """
+    Logs that the grades of an assignment could not be downloaded again, and returns the fetch time of its stored
+    grades, which `/getGrades` returns instead. `failure` is the failed response or the connection error.
+    """
+    error = f"{failure.status_code} response from Gradescope" if hasattr(failure, "status_code") else failure
+    logging.error(f"Failed to fetch grades for {assignment_id}, returning the grades fetched at "
+                  f"{format_timestamp(stored_at)}: {error}")
+    return stored_at
+
+
+def check_grades_format(file_type: str, stream: str):
+    """
+    Raises an AssertionError if `/getGrades` cannot return grades in this format.
+    """
+    # supported filetypes
+    assert file_type in ["csv", "json", "columnar"], "File type must be either CSV, JSON or columnar."
+    assert stream is None or stream in STREAM_MEDIA_TYPES, "Stream must be either NDJSON or CSV."
+    assert not (stream and file_type == "columnar"), "Columnar grades cannot be streamed."
+
+
+def download_grades_into_store(class_id: str, assignment_id: str, title: str = None):
+    """
+    Downloads the `scores.csv` of one assignment and, if Gradescope returned it, saves it to the grade store.
+    With `SCORES_DOWNLOAD_CACHE`, the download is conditional, and unchanged grades are not saved again.
+    Callers share concurrent downloads of the same assignment through `GRADESCOPE_FLIGHTS`.
+
+    Returns:
+        tuple: The `requests.Response`, the unix timestamp the grades were saved with (None if the download failed),
+               and the downloaded CSV content if it was saved (None if the stored grades were unchanged).
+    """
+    url = f"{GRADESCOPE_BASE_URL}/courses/{class_id}/assignments/{assignment_id}/scores.csv"
+    if SCORES_DOWNLOAD_CACHE is None:
+        result = GRADESCOPE_CLIENT.session.get(url)
+        download = CachedDownload(result.content, changed=True, not_modified=False) if result.ok else None
     else:
-        return JSONResponse(
-            content={"message": f"Failed to fetch grades."},
-            status_code=int(result.status_code)
+        key = (str(class_id), str(assignment_id))
+        result = GRADESCOPE_CLIENT.session.get(url, headers=SCORES_DOWNLOAD_CACHE.request_headers(key))
+        # A 304 is `ok` for requests
+        download = SCORES_DOWNLOAD_CACHE.resolve(key, result.status_code, result.headers, result.content) if result.ok else None
+    if download is None:
+        return result, None, None
+    fetched_at = time.time()
+    return result, fetched_at, save_downloaded_grades(class_id, assignment_id, download, title, fetched_at)
+
+
+async def download_grades_into_store_async(class_id: str, assignment_id: str, title: str = None):
+    """
+    Same as `download_grades_into_store`, over `ASYNC_GRADESCOPE_SESSION`. Returns the `httpx.Response`.
+    """
+    url = f"{GRADESCOPE_BASE_URL}/courses/{class_id}/assignments/{assignment_id}/scores.csv"
+    if SCORES_DOWNLOAD_CACHE is None:
+        result = await ASYNC_GRADESCOPE_SESSION.get(url)
+        download = CachedDownload(result.content, changed=True, not_modified=False) if result.is_success else None
+    else:
+        key = (str(class_id), str(assignment_id))
+        result = await ASYNC_GRADESCOPE_SESSION.get(url, headers=SCORES_DOWNLOAD_CACHE.request_headers(key))
+        download = None
+        if result.is_success or result.status_code == 304:
+            download = await anyio.to_thread.run_sync(
+                SCORES_DOWNLOAD_CACHE.resolve, key, result.status_code, result.headers, result.content)
+    if download is None:
+        return result, None, None
+    fetched_at = time.time()
+    # Saving a large export takes a while, so it runs on a worker thread
+    csv_content = await anyio.to_thread.run_sync(save_downloaded_grades, class_id, assignment_id, download, title, fetched_at)
+    return result, fetched_at, csv_content
+
+
+def save_downloaded_grades(class_id: str, assignment_id: str, download: CachedDownload, title: str, fetched_at: float):
+    """
+    Saves a downloaded `scores.csv` to the grade store and returns its content. If it is unchanged since the last
+    download and still stored, only its fetch time is updated and None is returned, so that callers read the stored
+    grades instead of parsing the file again.
+    """
+    if not download.changed and GRADE_STORE.mark_fetched(class_id, assignment_id, fetched_at, title=title):
+        return None
+    csv_content = download.content.decode("utf-8")
+    GRADE_STORE.save_assignment(class_id, assignment_id, csv_content, title=title, fetched_at=fetched_at)
+    return csv_content
+
+
+def parse_downloaded_grades(csv_content: str, file_type: str, stream: str):
+    """
+    Returns the grades of a downloaded `scores.csv` in the requested format, or None if they will be streamed from
+    the grade store.
+    """
+    if file_type == "columnar":
+        return ColumnarGrades.from_csv(csv_content).to_json()
+    elif not stream:
+        return csv_to_json(csv_content)
+    return None
+
+
+def grades_response(class_id: str, assignment_id: str, file_type: str, with_metadata: bool, stream: str,
+                    fetched_at: float, grades):
+    """
+    Builds the response of `/getGrades`, reading the grades from the grade store unless they were just downloaded.
+    """
+    if stream:
+        return StreamingResponse(
+            stream_assignment_grades(class_id, assignment_id, stream),
+            media_type=STREAM_MEDIA_TYPES[stream],
+            headers={"X-Fetched-At": format_timestamp(fetched_at)}
         )
+    if grades is None and file_type == "columnar":
+        columns = GRADE_STORE.get_columns(class_id, assignment_id)
+        rows = [[row.get(column) for column in columns] for row in GRADE_STORE.iter_grades(class_id, assignment_id)]
+        grades = ColumnarGrades.from_rows(columns, rows).to_json()
+    elif grades is None:
+        grades = GRADE_STORE.get_assignment(class_id, assignment_id)["grades"]
+    if with_metadata:
+        return {"assignment_id": str(assignment_id), "fetched_at": format_timestamp(fetched_at), "grades": grades}
+    return grades
+
+
+def stream_assignment_grades(class_id: str, assignment_id: str, stream: str):
+    """
+    Yields the stored rows of one assignment as NDJSON lines, or as CSV lines preceded by the header,
+    reading them from the grade store one at a time.
+    """
+    if stream == "csv":
+        columns = GRADE_STORE.get_columns(class_id, assignment_id)
+        yield to_csv_line(columns)
+        for row in GRADE_STORE.iter_grades(class_id, assignment_id):
+            yield to_csv_line([row.get(column) for column in columns])
+    else:
+        for row in GRADE_STORE.iter_grades(class_id, assignment_id):
+            yield json.dumps(row) + "\n"
 
 
 @app.get("/getAssignmentJSON")
@@ -81,7 +347,8 @@ def get_assignment_info(class_id: str = None):
     Fetches and returns assignment information in a JSON format for a specified class from Gradescope.
 
     This endpoint retrieves all assignments for the given `class_id` from Gradescope, using the 
-    Gradescope client session.
+    Gradescope client session. Catalogs are cached per class for `ASSIGNMENT_CATALOG_TTL_SECONDS`; 
+    after that the cached catalog is still returned while a fresh copy is scraped in the background.
 
     Parameters:
     - class_id (str, optional): The ID of the class for which assignments are being retrieved. 
@@ -124,21 +391,118 @@ def get_assignment_info(class_id: str = None):
             content={"error": "Unauthorized access", "message": "User is not logged into Gradescope"},
             status_code=401
         )
-    GRADESCOPE_CLIENT.last_res = res = GRADESCOPE_CLIENT.session.get(f"https://www.gradescope.com/courses/{class_id}/assignments")
+    try:
+        # We return the JSON without JSONResponse so we can reuse this in other APIs easily.
+        # We let FastAPI reformat this for us.
+        return ASSIGNMENT_CATALOG_CACHE.get(class_id, lambda: GRADESCOPE_FLIGHTS.do(
+            ("assignments", class_id), lambda: scrape_assignment_info(class_id)))
+    except HTTPException as e:
+        return JSONResponse(content=e.detail, status_code=e.status_code)
+
+
+def scrape_assignment_info(class_id: str) -> dict:
+    """
+    Scrapes the assignments page of a class on Gradescope and categorizes its assignments.
+    This is the uncached loader behind `get_assignment_info`.
+
+    Raises:
+    - HTTPException: If Gradescope cannot be reached (503) or returns an error status code.
+    """
+    res = GRADESCOPE_CLIENT.session.get(f"{GRADESCOPE_BASE_URL}/courses/{class_id}/assignments")
     if not res:
-        return JSONResponse(
-        content={"error": "Connection Error", "message": "Failed to connect to Gradescope"},
-        status_code=503
-    )
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "Connection Error", "message": "Failed to connect to Gradescope"}
+        )
     if not res.ok:
+        raise HTTPException(
+            status_code=res.status_code,
+            detail={"error": "Gradescope Error", "message": f"Gradescope returned a {res.status_code} status code"}
+        )
+    return convert_course_info_to_json(res.content, ASSIGNMENT_CLASSIFIER)
+
+
+@app.get("/async/getAssignmentJSON")
+@handle_errors
+@gradescope_session(GRADESCOPE_CLIENT)
+async def get_assignment_info_async(class_id: str = None):
+    """
+    Same as `/getAssignmentJSON`, but a catalog that is not cached is scraped on the event loop instead of holding
+    a threadpool worker. Both endpoints share the catalog cache.
+    """
+    class_id = class_id or CS_10_GS_COURSE_ID
+    if str(class_id) == "902165": #CS10_FALL_2024_DUMMY class
+        with open(os.path.join(os.path.dirname(__file__), "cs10_assignments.json"), "r") as f:
+            return json.load(f)
+    if not GRADESCOPE_CLIENT.logged_in:
         return JSONResponse(
-        content={"error": "Gradescope Error", "message": f"Gradescope returned a {res.status_code} status code"},
-        status_code=res.status_code
-    )
-    # We return the JSON without JSONResponse so we can reuse this in other APIs easily.
-    # We let FastAPI reformat this for us.
-    json_format_content = convert_course_info_to_json(str(res.content).replace("\\", "").replace("\\u0026", "&"))
-    return json_format_content
+            content={"error": "Unauthorized access", "message": "User is not logged into Gradescope"},
+            status_code=401
+        )
+    try:
+        return await ASSIGNMENT_CATALOG_CACHE.get_async(class_id, lambda: GRADESCOPE_FLIGHTS.do_async(
+            ("assignments", class_id), lambda: scrape_assignment_info_async(class_id)))
+    except HTTPException as e:
+        return JSONResponse(content=e.detail, status_code=e.status_code)
+
+
+async def scrape_assignment_info_async(class_id: str) -> dict:
+    """
+    Same as `scrape_assignment_info`, over `ASYNC_GRADESCOPE_SESSION`. Connection errors raise httpx.TransportError.
+    """
+    res = await ASYNC_GRADESCOPE_SESSION.get(f"{GRADESCOPE_BASE_URL}/courses/{class_id}/assignments")
+    if not res.is_success:
+        raise HTTPException(
+            status_code=res.status_code,
+            detail={"error": "Gradescope Error", "message": f"Gradescope returned a {res.status_code} status code"}
+        )
+    return convert_course_info_to_json(res.content, ASSIGNMENT_CLASSIFIER)
+
+
+@app.get("/getCacheStats")
+def get_cache_stats():
+    """
+    Returns the hit and miss counters of the server-side caches, how many upstream calls were coalesced
+    with an identical call already in flight, how busy the pool of Gradescope sessions is, and how many
+    scores.csv downloads were unchanged (answered 304, or identical to the last download) and the bytes that
+    304 responses saved.
+
+    Example Output:
+    {
+        "assignment_catalog": {"entries": 1, "hits": 40, "stale_hits": 3, "misses": 1, "refresh_failures": 0, "hit_rate": 0.977},
+        "coalesced_requests": {
+            "gradescope": {"calls": 120, "coalesced_calls": 85, "in_flight": 2, "coalesced_rate": 0.708},
+            "prairielearn": {"calls": 4, "coalesced_calls": 1, "in_flight": 0, "coalesced_rate": 0.25}
+        },
+        "gradescope_session_pool": {"size": 8, "in_use": 3, "logged_in": 5, "checkouts": 1200, "waited_checkouts": 40,
+                                    "average_wait_ms": 2.1, "max_wait_ms": 350.0, "utilization": 0.42},
+        "scores_downloads": {"entries": 80, "not_modified": 300, "unchanged": 12, "changed": 40,
+                             "bytes_downloaded": 5200000, "bytes_saved": 39000000, "unchanged_rate": 0.886}
+    }
+    """
+    return {
+        "assignment_catalog": ASSIGNMENT_CATALOG_CACHE.stats(),
+        "coalesced_requests": {"gradescope": GRADESCOPE_FLIGHTS.stats(), "prairielearn": PL_FLIGHTS.stats()},
+        "gradescope_session_pool": GRADESCOPE_CLIENT.stats(),
+        "scores_downloads": SCORES_DOWNLOAD_CACHE.stats() if SCORES_DOWNLOAD_CACHE else None,
+    }
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Returns the server's metrics in the Prometheus text format, for a Prometheus server to scrape:
+    - gradesync_upstream_request_seconds: A histogram of the latency of requests to Gradescope, PrairieLearn and
+      Google Sheets, by upstream and status code.
+    - gradesync_upstream_retries_total: Requests sent again, by upstream and reason (a connection error, or a session
+      that had to log in again).
+    - gradesync_upstream_rate_limited_total: Responses with status 429, by upstream.
+    - gradesync_api_store_load_seconds: A histogram of the duration of each stage of loading grades into the grade
+      store.
+    - gradesync_cache_*, gradesync_upstream_calls_total, gradesync_session_pool_* and gradesync_download_*: The
+      counters of /getCacheStats.
+    """
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/getGradeScopeAssignmentID/{category_type}/{assignment_number}")
@@ -211,13 +575,28 @@ def get_assignment_id(category_type: str, assignment_number: int, lab_type: int
 
 @app.get("/fetchAllGrades")
 @handle_errors
-def fetchAllGrades(class_id: str = None):
+def fetchAllGrades(class_id: str = None, max_workers: int = FETCH_ALL_GRADES_MAX_WORKERS, with_metadata: bool = False,
+                   stream: str = None):
     """
     Fetch Grades for all assignments for all students
 
+    Assignments downloaded less than `GRADE_STORE_MAX_AGE_SECONDS` ago are answered from the local grade store.
+    The other `scores.csv` files are downloaded in parallel over the authenticated Gradescope session,
+    with at most `max_workers` downloads in flight at once. An assignment whose download fails does
+    not fail the whole request: its previously stored grades are returned if there are any, and otherwise
+    its entry holds an error dictionary instead of a list of rows.
+
     Parameters:
     - class_id (str, optional): The ID of the class for which assignments are being retrieved. 
       Defaults to `None`.
+    - max_workers (int, optional): The number of concurrent downloads. Defaults to
+      `FETCH_ALL_GRADES_MAX_WORKERS` from the config file. Use 1 to download serially.
+    - with_metadata (bool, optional): If true, each assignment's rows are wrapped with the time they were
+      fetched from Gradescope, as in `/getGrades`.
+    - stream (str, optional): "ndjson" or "csv" to stream the gradebook instead of building it in memory.
+      NDJSON has one line per assignment, shaped like the `with_metadata` output plus a "title" key (or an
+      "error" key if the assignment could not be fetched). CSV is a long format with one line per student
+      per assignment and the columns in `ALL_GRADES_CSV_COLUMNS`; question columns are left out.
 
     Returns:
     - JSON
@@ -247,6 +626,7 @@ def fetchAllGrades(class_id: str = None):
             },
             ...,
         ], 
+        "Lab 2: Basics (Code)": {"error": "Gradescope Error", "message": "500 Server Error: ..."},
         .....
     }
     """
@@ -254,12 +634,236 @@ def fetchAllGrades(class_id: str = None):
     assignment_info = get_assignment_info(class_id)
     all_ids = get_ids_for_all_assignments(assignment_info)
 
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise ValueError("Stream must be either NDJSON or CSV.")
+    outcomes = load_grades_into_store(class_id, all_ids, max_workers, GRADE_STORE_MAX_AGE_SECONDS)
+    return all_grades_response(class_id, all_ids, outcomes, with_metadata, stream)
+
+
+@app.get("/async/fetchAllGrades")
+@handle_errors
+async def fetch_all_grades_async(class_id: str = None, max_workers: int = FETCH_ALL_GRADES_MAX_WORKERS,
+                                 with_metadata: bool = False, stream: str = None):
+    """
+    Same as `/fetchAllGrades`, but the catalog and the `scores.csv` downloads are awaited on the event loop.
+    `max_workers` is the number of downloads in flight at once, as there are no worker threads.
+    """
+    class_id = class_id or CS_10_GS_COURSE_ID
+    assignment_info = await get_assignment_info_async(class_id)
+    all_ids = get_ids_for_all_assignments(assignment_info)
+
+    if stream is not None and stream not in STREAM_MEDIA_TYPES:
+        raise ValueError("Stream must be either NDJSON or CSV.")
+    outcomes = await load_grades_into_store_async(class_id, all_ids, max_workers, GRADE_STORE_MAX_AGE_SECONDS)
+    # Reading every assignment back from the grade store takes a while, so it runs on a worker thread
+    return await anyio.to_thread.run_sync(all_grades_response, class_id, all_ids, outcomes, with_metadata, stream)
+
+
+def all_grades_response(class_id: str, all_ids: list, outcomes: dict, with_metadata: bool, stream: str):
+    """
+    Builds the response of `/fetchAllGrades` from the grade store. `outcomes` is the output of `load_grades_into_store`.
+    """
+    if stream:
+        return StreamingResponse(stream_all_grades(class_id, all_ids, outcomes, stream), media_type=STREAM_MEDIA_TYPES[stream])
     all_grades = {}
     for title, one_id in all_ids:
-        all_grades[title] = fetchGrades(class_id, one_id)
+        fetched_at, error = outcomes[one_id]
+        if fetched_at is None:
+            all_grades[title] = {"error": "Gradescope Error", "message": str(error)}
+            continue
+        grades = GRADE_STORE.get_assignment(class_id, one_id)["grades"]
+        if with_metadata:
+            all_grades[title] = {"assignment_id": one_id, "fetched_at": format_timestamp(fetched_at), "grades": grades}
+        else:
+            all_grades[title] = grades
     return all_grades
 
 
+def stream_all_grades(class_id: str, titles_and_ids: list, outcomes: dict, stream: str):
+    """
+    Yields the gradebook of a class assignment by assignment, holding at most one assignment in memory
+    (NDJSON) or one row (CSV). `outcomes` is the output of `load_grades_into_store`.
+    """
+    if stream == "csv":
+        yield to_csv_line(ALL_GRADES_CSV_COLUMNS)
+    for title, one_id in titles_and_ids:
+        fetched_at, error = outcomes[one_id]
+        if stream == "csv":
+            if fetched_at is None:
+                continue
+            for row in GRADE_STORE.iter_grades(class_id, one_id):
+                yield to_csv_line([title, one_id] + [row.get(column) for column in ALL_GRADES_CSV_COLUMNS[2:]])
+        elif fetched_at is None:
+            yield json.dumps({"title": title, "assignment_id": one_id, "error": "Gradescope Error", "message": str(error)}) + "\n"
+        else:
+            grades = list(GRADE_STORE.iter_grades(class_id, one_id))
+            yield json.dumps({"title": title, "assignment_id": one_id, "fetched_at": format_timestamp(fetched_at), "grades": grades}) + "\n"
+
+
+@app.post("/syncGradeStore")
+@handle_errors
+def sync_grade_store(class_id: str = None, max_workers: int = FETCH_ALL_GRADES_MAX_WORKERS):
+    """
+    Downloads every assignment of a class from Gradescope into the local grade store, regardless of age.
+    Call this periodically (e.g. from a cron job) so that `/getGrades` and `/fetchAllGrades` rarely go to Gradescope.
+
+    Example Output:
+    {"synced": ["5211613", "5211612"], "failed": {"5211616": "500 Server Error: ..."}}
+    """
+    class_id = class_id or CS_10_GS_COURSE_ID
+    all_ids = get_ids_for_all_assignments(get_assignment_info(class_id))
+    outcomes = load_grades_into_store(class_id, all_ids, max_workers, max_age_seconds=0)
+    return {
+        "synced": [one_id for one_id, (_, error) in outcomes.items() if error is None],
+        "failed": {one_id: str(error) for one_id, (_, error) in outcomes.items() if error is not None},
+    }
+
+
+@app.get("/computeGrades")
+@handle_errors
+def compute_grades(class_id: str = None, max_workers: int = FETCH_ALL_GRADES_MAX_WORKERS):
+    """
+    Computes every student's course aggregates (lab score, lecture attendance, discussions, projects) from the
+    scores of all assignments, applying `NUM_LECTURE_DROPS`, `UNGRADED_LABS`, `SPECIAL_CASE_LABS` and
+    `TOTAL_LAB_POINTS` from the config file. The policy is the one of the cron job's instructor dashboard (see
+    gradescopeCronJob/course_policy.py), so both give a student the same grades.
+
+    Scores are loaded like `/fetchAllGrades` does, then joined into one student x assignment matrix that is
+    kept in memory until any assignment of the class is fetched again, so repeated calls only redo the
+    aggregation. Assignments that have never been downloaded successfully are left out and listed under "failed".
+
+    Parameters:
+    - class_id (str, optional): The ID of the class. Defaults to CS10's course ID.
+    - max_workers (int, optional): The number of concurrent downloads, as in `/fetchAllGrades`.
+
+    Returns:
+    - JSON
+
+    Example Output:
+    {
+        "policy": {"num_lecture_drops": 3, "ungraded_labs": [0], "special_case_labs": [16], "total_lab_points": 80.0},
+        "failed": {"5211616": "500 Server Error: ..."},
+        "students": [
+            {
+                "Name": "Student1", "SID": "3031", "Email": "student1@berkeley.edu",
+                "lab_score": 72.0, "full_credit_labs": 9, "average_lab_score": 0.95,
+                "lecture_attendance": 1.0, "full_credit_lecture_quizzes": 14,
+                "discussions_completed": 7, "average_project_score": 0.88
+            },
+            ...
+        ]
+    }
+    """
+    class_id = class_id or CS_10_GS_COURSE_ID
+    catalog = get_assignment_info(class_id)
+    all_ids = get_ids_for_all_assignments(catalog)
+    outcomes = load_grades_into_store(class_id, all_ids, max_workers, GRADE_STORE_MAX_AGE_SECONDS)
+    fetch_times = tuple(sorted((one_id, fetched_at) for one_id, (fetched_at, _) in outcomes.items() if fetched_at is not None))
+    cached = SCORE_MATRIX_CACHE.get(class_id)
+    if cached and cached[0] == fetch_times:
+        matrix = cached[1]
+    else:
+        stored_ids = [one_id for one_id, _ in fetch_times]
+        matrix = ScoreMatrix.from_rows(stored_ids, GRADE_STORE.get_scores(class_id, stored_ids))
+        SCORE_MATRIX_CACHE[class_id] = (fetch_times, matrix)
+    aggregates = compute_course_grades(matrix, [(one_id, title) for title, one_id in all_ids], ASSIGNMENT_CLASSIFIER,
+                                       NUM_LECTURE_DROPS, UNGRADED_LABS, SPECIAL_CASE_LABS, TOTAL_LAB_POINTS)
+    students = GRADE_STORE.get_students(class_id)
+    # NaN (e.g. no graded labs) is not valid JSON, so it becomes null
+    columns = {name: [None if value != value else value for value in values.tolist()] for name, values in aggregates.items()}
+    return {
+        "policy": {"num_lecture_drops": NUM_LECTURE_DROPS, "ungraded_labs": UNGRADED_LABS,
+                   "special_case_labs": SPECIAL_CASE_LABS, "total_lab_points": TOTAL_LAB_POINTS},
+        "failed": {one_id: str(error) for one_id, (fetched_at, error) in outcomes.items() if fetched_at is None},
+        "students": [
+            {
+                "Name": students.get(email, (None, None))[0],
+                "SID": students.get(email, (None, None))[1],
+                "Email": email,
+                **{name: values[row] for name, values in columns.items()},
+            }
+            for row, email in enumerate(matrix.emails.tolist())
+        ],
+    }
+
+
+def load_grades_into_store(class_id: str, titles_and_ids: list, max_workers: int, max_age_seconds: float) -> dict:
+    """
+    Downloads the assignments that are missing from the grade store, or older than `max_age_seconds`, 
+    and reports when each assignment now in the store was fetched. No rows are loaded into memory.
+
+    Parameters:
+    - class_id (str): The ID of the class.
+    - titles_and_ids (list): [[title, assignment_id], ...] as returned by `get_ids_for_all_assignments`.
+    - max_workers (int): The number of concurrent downloads.
+    - max_age_seconds (float): How old stored grades may be before they are downloaded again.
+
+    Returns:
+    - dict: Maps each assignment ID to a `(fetched_at, error)` tuple, where `fetched_at` is the unix timestamp
+      of the stored grades (or None if the assignment has never been downloaded) and `error` is the download
+      error, if any.
+    """
+    titles = {one_id: title for title, one_id in titles_and_ids}
+    with STORE_LOAD_SECONDS.labels("find outdated assignments").time():
+        outdated_ids = find_outdated_assignments(class_id, titles, max_age_seconds)
+
+    def download_into_store(assignment_id):
+        result, fetched_at, _ = GRADESCOPE_FLIGHTS.do(("scores.csv", class_id, str(assignment_id)),
+                                                      lambda: download_grades_into_store(class_id, assignment_id, titles[assignment_id]))
+        if fetched_at is None:
+            result.raise_for_status()
+
+    with STORE_LOAD_SECONDS.labels("download assignments").time():
+        downloads = run_concurrently(download_into_store, outdated_ids, max_workers)
+    return collect_load_outcomes(class_id, titles, downloads)
+
+
+async def load_grades_into_store_async(class_id: str, titles_and_ids: list, max_concurrency: int,
+                                       max_age_seconds: float) -> dict:
+    """
+    Same as `load_grades_into_store`, but the downloads are awaited on the event loop over
+    `ASYNC_GRADESCOPE_SESSION`, with at most `max_concurrency` in flight.
+    """
+    titles = {one_id: title for title, one_id in titles_and_ids}
+    with STORE_LOAD_SECONDS.labels("find outdated assignments").time():
+        outdated_ids = find_outdated_assignments(class_id, titles, max_age_seconds)
+
+    async def download_into_store(assignment_id):
+        result, fetched_at, _ = await GRADESCOPE_FLIGHTS.do_async(
+            ("scores.csv", class_id, str(assignment_id)),
+            lambda: download_grades_into_store_async(class_id, assignment_id, titles[assignment_id]))
+        if fetched_at is None:
+            result.raise_for_status()
+
+    with STORE_LOAD_SECONDS.labels("download assignments").time():
+        downloads = await run_concurrently_async(download_into_store, outdated_ids, max_concurrency)
+    return collect_load_outcomes(class_id, titles, downloads)
+
+
+def find_outdated_assignments(class_id: str, titles: dict, max_age_seconds: float) -> list:
+    """
+    Returns the IDs of the assignments that are missing from the grade store or older than `max_age_seconds`.
+    """
+    fetched_at = GRADE_STORE.get_fetched_at(class_id, list(titles))
+    now = time.time()
+    return [one_id for one_id in titles if one_id not in fetched_at or now - fetched_at[one_id] >= max_age_seconds]
+
+
+def collect_load_outcomes(class_id: str, titles: dict, downloads: dict) -> dict:
+    """
+    Combines the `(result, error)` of each download with the fetch times now in the grade store, logging failures.
+    See `load_grades_into_store` for the returned dictionary.
+    """
+    fetched_at = GRADE_STORE.get_fetched_at(class_id, list(titles))
+    outcomes = {}
+    for one_id, title in titles.items():
+        _, error = downloads.get(one_id, (None, None))
+        if error is not None:
+            logging.error(f"Failed to fetch grades for {title} ({one_id}): {error}")
+        outcomes[one_id] = (fetched_at.get(one_id), error)
+    return outcomes
+
+
 @handle_errors
 @app.post("/testWriteToSheet")
 async def write_to_sheet(request: WriteRequest):
@@ -269,8 +873,10 @@ async def write_to_sheet(request: WriteRequest):
     # NOTE: Remove this test function in a future version once more Sheets API endpoints are written.
     """
     try:
-        sheet = client.open_by_key(request.spreadsheet_id).worksheet(request.sheet_name)
-        sheet.update_acell(request.cell, request.value)
+        with time_upstream_request("sheets") as sheets_request:
+            sheet = client.open_by_key(request.spreadsheet_id).worksheet(request.sheet_name)
+            sheet.update_acell(request.cell, request.value)
+            sheets_request["status"] = 200
         return JSONResponse(content={"message": f"Successfully wrote '{request.value}' to {request.cell}"}, status_code=200)
     except Exception as e:
         return JSONResponse(
@@ -297,6 +903,36 @@ def retrieve_gradebook():
     """
     headers = {'Private-Token': PL_API_TOKEN}
     url = PL_SERVER + f"/course_instances/{CS_10_PL_COURSE_ID}/gradebook"
-    r = backoff(requests.get, args = [url], kwargs = {'headers': headers}, max_tries = 3,  max_delay = 30, strategy = strategies.Exponential)
-    data = r.json()
+    attempts = 0
+
+    def get_gradebook():
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            UPSTREAM_RETRIES.labels("prairielearn", "connection error").inc()
+        with time_upstream_request("prairielearn") as pl_request:
+            response = requests.get(url, headers=headers)
+            pl_request["status"] = response.status_code
+        return response
+
+    # Concurrent callers share one download of the gradebook
+    data = PL_FLIGHTS.do(("gradebook", CS_10_PL_COURSE_ID), lambda: backoff(
+        get_gradebook, max_tries = 3,  max_delay = 30, strategy = strategies.Exponential).json())
     return data
+
+
+@app.get("/async/getPLGrades")
+@handle_errors
+async def retrieve_gradebook_async():
+    """
+    Same as `/getPLGrades`, but the request to PrairieLearn, and the delays between its retries, are awaited on the
+    event loop instead of holding a threadpool worker.
+    """
+    headers = {'Private-Token': PL_API_TOKEN}
+    url = PL_SERVER + f"/course_instances/{CS_10_PL_COURSE_ID}/gradebook"
+
+    async def download_gradebook():
+        r = await ASYNC_PL_SESSION.get_with_backoff(url, max_tries=3, max_delay=30, headers=headers)
+        return r.json()
+
+    return await PL_FLIGHTS.do_async(("gradebook", CS_10_PL_COURSE_ID), download_gradebook)
@@ -0,0 +1,115 @@
+"""
+Non-blocking HTTP for the `/async` endpoints of app.py.
+
+The sync endpoints hold a threadpool worker for as long as Gradescope or PrairieLearn takes to answer, so under
+concurrent dashboard traffic the pool (40 workers by default) runs out and requests queue behind each other. The
+`/async` endpoints await the same requests on the event loop with httpx instead.
+"""
+import asyncio
+import random
+import time
+
+import anyio
+import httpx
+from backoff_utils import strategies
+
+from api.gradescopeClient import ReauthenticatingSession, is_auth_failure
+from api.metrics import UPSTREAM_RETRIES, time_upstream_request
+
+
+class AsyncSession:
+    """
+    An `httpx.AsyncClient` per event loop, optionally sharing the cookie jar and headers of a requests session.
+
+    Gradescope is only reachable with the cookies of the fullGSapi session that `GRADESCOPE_CLIENT` logs in with.
+    httpx uses a `CookieJar` it is given as is, so cookies set by a login (or cleared by a logout) through either
+    client are seen by the other. If that session is a `ReauthenticatingSession`, a request that fails authentication
+    logs its client in again and is retried once, as it would be over the session itself.
+
+    Example:
+        >>> gradescope = AsyncSession(lambda: GRADESCOPE_CLIENT.session, max_connections=100, upstream="gradescope")
+        >>> response = await gradescope.get("https://www.gradescope.com/courses/831412/assignments")
+    """
+
+    def __init__(self, get_cookie_session=None, max_connections: int = 100, timeout_seconds: float = 30, transport=None,
+                 upstream: str = "other"):
+        """
+        Parameters:
+            get_cookie_session (function, optional): Returns the `requests.Session` whose cookies and headers are
+                shared. It is called whenever a client is created, so a session that is replaced is picked up.
+            max_connections (int): The maximum number of open connections per event loop.
+            timeout_seconds (float): The connect, read, write and pool timeout of every request.
+            transport (httpx.AsyncBaseTransport, optional): Only overridden in tests, e.g. with an `httpx.MockTransport`.
+            upstream (str): The service the requests go to, as labeled in the metrics of `/metrics`.
+        """
+        self.upstream = upstream
+        self.get_cookie_session = get_cookie_session
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.timeout = httpx.Timeout(timeout_seconds)
+        self.transport = transport
+        self.client = None
+        self.loop = None
+        # The GradescopeClient that logs the shared session in again, if any
+        self.auth_client = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Returns the client of the running event loop, creating it on first use. Connections cannot be shared between
+        event loops, so a new client is created if the loop changes (e.g. between requests of a test client).
+        """
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.loop is not loop:
+            cookie_session = self.get_cookie_session() if self.get_cookie_session else None
+            self.auth_client = cookie_session.client if isinstance(cookie_session, ReauthenticatingSession) else None
+            self.client = httpx.AsyncClient(
+                cookies=cookie_session.cookies if cookie_session is not None else None,
+                headers=dict(cookie_session.headers) if cookie_session is not None else None,
+                limits=self.limits,
+                timeout=self.timeout,
+                # requests follows redirects by default, e.g. to the login page
+                follow_redirects=True,
+                transport=self.transport,
+            )
+            self.loop = loop
+        return self.client
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends a GET request. Keyword arguments are passed to `httpx.AsyncClient.get`.
+        """
+        client = self.get_client()
+        auth_client = self.auth_client
+        login_generation = auth_client.login_generation if auth_client is not None else None
+        response = await self._timed_get(client, url, **kwargs)
+        if auth_client is not None and is_auth_failure(
+                response.history[0].url if response.history else url, response.url, response.status_code):
+            # fullGSapi logs in with blocking requests, so this runs on a worker thread
+            if await anyio.to_thread.run_sync(auth_client.reauthenticate, login_generation):
+                UPSTREAM_RETRIES.labels(self.upstream, "reauthenticated").inc()
+                response = await self._timed_get(client, url, **kwargs)
+        return response
+
+    async def _timed_get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        with time_upstream_request(self.upstream) as request:
+            response = await client.get(url, **kwargs)
+            request["status"] = response.status_code
+        return response
+
+    async def get_with_backoff(self, url: str, max_tries: int = 3, max_delay: float = 30, **kwargs) -> httpx.Response:
+        """
+        Sends a GET request, retrying connection errors with the exponential delays (plus jitter) of
+        `backoff_utils.backoff(..., strategy=strategies.Exponential)`, but sleeping without blocking the event loop.
+
+        Raises:
+            httpx.TransportError: If every attempt failed, or the next delay would exceed `max_delay` seconds in total.
+        """
+        start_time = time.monotonic()
+        for attempt in range(1, max_tries + 1):
+            try:
+                return await self.get(url, **kwargs)
+            except httpx.TransportError:
+                delay = strategies.Exponential(attempt=attempt).time_to_sleep + random.random()
+                if attempt == max_tries or time.monotonic() - start_time + delay > max_delay:
+                    raise
+                UPSTREAM_RETRIES.labels(self.upstream, "connection error").inc()
+                await asyncio.sleep(delay)
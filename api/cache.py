@@ -0,0 +1,176 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+
+class TTLCache:
+    """
+    A thread-safe cache whose entries expire `ttl_seconds` after they were loaded.
+
+    Expired entries are not dropped. A lookup of an expired entry returns the stale value immediately and
+    reloads it on a background thread (stale-while-revalidate), so only the very first lookup of a key
+    ever waits for the upstream service. If `persist_path` is given, the cache is written to that JSON file
+    after every load and read back on construction, so a restarted server starts warm.
+
+    Values must be JSON-serializable when `persist_path` is set, and keys are always strings.
+
+    Example:
+        >>> catalog_cache = TTLCache(ttl_seconds=3600, persist_path="cache/assignment_catalog.json")
+        >>> catalog_cache.get("902165", lambda: scrape_catalog("902165"))
+    """
+
+    def __init__(self, ttl_seconds: float, persist_path: str = None):
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.lock = threading.Lock()
+        # key -> {"value": ..., "fetched_at": unix timestamp}
+        self.entries = {}
+        self.refreshing = set()
+        self.refresh_tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+        if persist_path:
+            self._load_from_disk()
+
+    def get(self, key: str, loader):
+        """
+        Returns the cached value for `key`, calling `loader()` to produce it if the key has never been loaded.
+
+        Parameters:
+            key (str): The cache key, e.g. a course ID.
+            loader (function): Takes no arguments and returns the fresh value. Exceptions it raises on a miss
+                propagate to the caller and nothing is cached; exceptions during a background refresh are logged
+                and the stale value is kept.
+
+        Returns:
+            The cached or freshly loaded value.
+        """
+        key = str(key)
+        found, value = self._lookup(key, lambda: threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start())
+        if found:
+            return value
+        value = loader()
+        self._store(key, value)
+        return value
+
+    async def get_async(self, key: str, loader):
+        """
+        Same as `get`, but `loader` is a coroutine function, which is awaited on a miss and run as a task on the
+        event loop to refresh a stale entry.
+        """
+        key = str(key)
+        found, value = self._lookup(key, lambda: self._schedule_refresh_task(key, loader))
+        if found:
+            return value
+        value = await loader()
+        self._store(key, value)
+        return value
+
+    def _lookup(self, key: str, start_refresh):
+        """
+        Returns `(True, value)` for a cached key, calling `start_refresh()` if the entry is stale and not already being
+        refreshed, or `(False, None)` on a miss. Updates the counters.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if time.time() - entry["fetched_at"] < self.ttl_seconds:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                if key not in self.refreshing:
+                    self.refreshing.add(key)
+                    start_refresh()
+            return True, entry["value"]
+
+    def invalidate(self, key: str = None):
+        """
+        Drops one key, or every key if `key` is None, so that the next lookup reloads it.
+        """
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(str(key), None)
+        self._save_to_disk()
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters of this cache.
+
+        Example Output:
+            {"entries": 2, "hits": 40, "stale_hits": 3, "misses": 2, "refresh_failures": 0, "hit_rate": 0.955}
+        """
+        with self.lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refresh_failures": self.refresh_failures,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+            }
+
+    def _refresh(self, key: str, loader):
+        try:
+            self._store(key, loader())
+        except Exception as e:
+            with self.lock:
+                self.refresh_failures += 1
+            logging.error(f"Failed to refresh cache entry '{key}', keeping the stale value: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def _schedule_refresh_task(self, key: str, loader):
+        async def refresh():
+            try:
+                self._store(key, await loader())
+            except Exception as e:
+                with self.lock:
+                    self.refresh_failures += 1
+                logging.error(f"Failed to refresh cache entry '{key}', keeping the stale value: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+                self.refresh_tasks.discard(task)
+        task = asyncio.get_running_loop().create_task(refresh())
+        # The event loop only keeps weak references to tasks
+        self.refresh_tasks.add(task)
+
+    def _store(self, key: str, value):
+        with self.lock:
+            self.entries[key] = {"value": value, "fetched_at": time.time()}
+        self._save_to_disk()
+
+    def _load_from_disk(self):
+        try:
+            with open(self.persist_path, "r") as cache_file:
+                self.entries = json.load(cache_file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.error(f"Ignoring unreadable cache file {self.persist_path}: {e}")
+
+    def _save_to_disk(self):
+        if not self.persist_path:
+            return
+        with self.lock:
+            snapshot = json.dumps(self.entries)
+        try:
+            os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+            # Write to a temporary file first so that a crash mid-write cannot leave a truncated cache behind
+            temporary_path = f"{self.persist_path}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w") as cache_file:
+                cache_file.write(snapshot)
+            os.replace(temporary_path, self.persist_path)
+        except OSError as e:
+            logging.error(f"Failed to persist cache to {self.persist_path}: {e}")
@@ -0,0 +1,135 @@
+import csv
+import io
+import itertools
+import math
+from array import array
+
+
+class ColumnarGrades:
+    """
+    A column-oriented, typed copy of a Gradescope `scores.csv` export.
+
+    `csv_to_json` repeats every column name in every row and keeps every cell as a string. Here each
+    column is stored once, in the most compact form its values allow:
+    - "number": every non-empty cell parses as a float (scores, max points, question columns, counts).
+      Stored as an `array('d')`, with NaN for empty cells.
+    - "category": few distinct values (e.g. "Status"). Stored as the distinct values plus an `array('I')` of codes.
+    - "string": everything else (names, emails, SIDs, timestamps). Stored as one concatenated string plus an
+      `array('I')` of offsets, so a column of N strings is two objects instead of N.
+
+    Example:
+        >>> grades = ColumnarGrades.from_csv("Name,Total Score\\nStudent1,90\\nStudent2,\\n")
+        >>> grades.types
+        {"Name": "string", "Total Score": "number"}
+        >>> grades.column("Total Score")
+        [90.0, None]
+    """
+
+    # A column is dictionary-encoded if it has at most this many distinct values per row
+    MAX_CATEGORY_RATIO = 0.5
+
+    def __init__(self, columns: list, num_rows: int):
+        self.columns = columns
+        self.num_rows = num_rows
+        self.types = {}
+        self.numbers = {}
+        self.categories = {}
+        self.strings = {}
+
+    @classmethod
+    def from_csv(cls, csv_content: str):
+        """
+        Parses raw CSV content. Rows with missing cells are padded with empty cells, like `csv.DictReader`
+        would fill them with None.
+        """
+        rows = csv.reader(io.StringIO(csv_content))
+        columns = next(rows, [])
+        return cls.from_rows(columns, list(rows))
+
+    @classmethod
+    def from_rows(cls, columns: list, rows: list):
+        """
+        Builds the columnar representation from a header and a list of rows, each a list of cell strings
+        (or None for missing cells).
+        """
+        width = len(columns)
+        if any(len(row) != width for row in rows):
+            rows = [(list(row) + [None] * width)[:width] for row in rows]
+        grades = cls(list(columns), len(rows))
+        for name, values in zip(columns, zip(*rows) if rows else [()] * width):
+            grades._add_column(name, values)
+        return grades
+
+    def _add_column(self, name: str, values: tuple):
+        numbers = self._parse_numbers(values)
+        if numbers is not None:
+            self.types[name] = "number"
+            self.numbers[name] = numbers
+            return
+        if None in values:
+            values = tuple(value or "" for value in values)
+        categories = list(dict.fromkeys(values))
+        if len(categories) <= max(1, self.MAX_CATEGORY_RATIO * len(values)):
+            self.types[name] = "category"
+            index = {value: code for code, value in enumerate(categories)}
+            self.categories[name] = (categories, array("I", map(index.__getitem__, values)))
+            return
+        self.types[name] = "string"
+        offsets = array("I", [0])
+        offsets.extend(itertools.accumulate(map(len, values)))
+        self.strings[name] = ("".join(values), offsets)
+
+    @staticmethod
+    def _parse_numbers(values: tuple):
+        """
+        Returns the values as an array of floats with NaN for empty cells, or None if any cell is not numeric.
+        """
+        has_empty_cells = "" in values or None in values
+        if has_empty_cells:
+            if not any(values):
+                # An entirely empty column carries no type information; keep it as strings
+                return None
+            values = [value or "nan" for value in values]
+        try:
+            return array("d", map(float, values))
+        except ValueError:
+            return None
+
+    def column(self, name: str) -> list:
+        """
+        Returns one column as a list of Python values: floats (None for empty cells) for "number" columns,
+        and strings for the others.
+        """
+        column_type = self.types[name]
+        if column_type == "number":
+            return [None if math.isnan(value) else value for value in self.numbers[name]]
+        if column_type == "category":
+            categories, codes = self.categories[name]
+            return [categories[code] for code in codes]
+        buffer, offsets = self.strings[name]
+        return [buffer[offsets[i]:offsets[i + 1]] for i in range(self.num_rows)]
+
+    def to_json(self) -> dict:
+        """
+        Returns a JSON-serializable dictionary with every column name once.
+
+        Example Output:
+        {
+            "num_rows": 2,
+            "columns": ["Name", "Total Score", "Status"],
+            "types": {"Name": "string", "Total Score": "number", "Status": "category"},
+            "data": {
+                "Name": ["Student1", "Student2"],
+                "Total Score": [90.0, null],
+                "Status": {"categories": ["Graded", "Missing"], "codes": [0, 1]}
+            }
+        }
+        """
+        data = {}
+        for name in self.columns:
+            if self.types[name] == "category":
+                categories, codes = self.categories[name]
+                data[name] = {"categories": categories, "codes": codes.tolist()}
+            else:
+                data[name] = self.column(name)
+        return {"num_rows": self.num_rows, "columns": self.columns, "types": self.types, "data": data}
@@ -0,0 +1,93 @@
+import numpy as np
+
+from gradescopeCronJob.course_policy import compute_course_policy, select_policy_assignments
+
+
+class ScoreMatrix:
+    """
+    Every stored score of a class as one students x assignments matrix, so that course policy can be applied with
+    whole-array operations instead of per-student loops.
+
+    Attributes:
+        emails (numpy.ndarray): One email per row, in the order the students first appear in the rows.
+        assignment_ids (list): One assignment ID per column.
+        scores (numpy.ndarray): Float matrix of total scores, NaN where a student is ungraded or has no row.
+        missing (numpy.ndarray): Boolean matrix, True where the status is "Missing" or the student has no row.
+        max_points (numpy.ndarray): The max points of each assignment, NaN if unknown.
+
+    Example:
+        >>> matrix = ScoreMatrix.from_rows(["5211613"], [("5211613", "a@berkeley.edu", 3.0, 4.0, "Graded")])
+        >>> matrix.scores
+        array([[3.]])
+    """
+
+    def __init__(self, emails, assignment_ids: list, scores, missing, max_points):
+        self.emails = emails
+        self.assignment_ids = assignment_ids
+        self.column_index = {assignment_id: column for column, assignment_id in enumerate(assignment_ids)}
+        self.scores = scores
+        self.missing = missing
+        self.max_points = max_points
+
+    @classmethod
+    def from_rows(cls, assignment_ids: list, rows: list):
+        """
+        Builds the matrix from `(assignment_id, email, total_score, max_points, status)` tuples, as returned by
+        `GradeStore.get_scores`. Rows of assignments that are not in `assignment_ids` are ignored.
+        """
+        assignment_ids = [str(assignment_id) for assignment_id in assignment_ids]
+        column_lookup = {assignment_id: column for column, assignment_id in enumerate(assignment_ids)}
+        rows = [row for row in rows if row[0] in column_lookup]
+        if not rows:
+            return cls(np.array([], dtype=str), assignment_ids, np.empty((0, len(assignment_ids))),
+                       np.empty((0, len(assignment_ids)), dtype=bool), np.full(len(assignment_ids), np.nan))
+        row_assignment_ids, emails, total_scores, max_points, statuses = zip(*rows)
+        # Hashing the emails is much faster than sorting them with numpy.unique
+        student_lookup = {}
+        student_index = np.fromiter((student_lookup.setdefault(email, len(student_lookup)) for email in emails),
+                                    dtype=np.intp, count=len(rows))
+        column_index = np.fromiter((column_lookup[assignment_id] for assignment_id in row_assignment_ids),
+                                   dtype=np.intp, count=len(rows))
+        shape = (len(student_lookup), len(assignment_ids))
+        scores = np.full(shape, np.nan)
+        # None (an empty cell) becomes NaN
+        scores[student_index, column_index] = np.array(total_scores, dtype=float)
+        missing = np.ones(shape, dtype=bool)
+        missing[student_index, column_index] = np.fromiter((status == "Missing" for status in statuses), dtype=bool,
+                                                           count=len(rows))
+        assignment_max_points = np.full(len(assignment_ids), np.nan)
+        np.fmax.at(assignment_max_points, column_index, np.array(max_points, dtype=float))
+        return cls(np.array(list(student_lookup), dtype=str), assignment_ids, scores, missing, assignment_max_points)
+
+    def columns_of(self, assignment_ids: list) -> list:
+        """
+        Returns the matrix columns of the given assignments, leaving out assignments that are not in the matrix.
+        """
+        return [self.column_index[assignment_id] for assignment_id in assignment_ids if assignment_id in self.column_index]
+
+
+def compute_course_grades(matrix: ScoreMatrix, assignments: list, classifier, num_lecture_drops: int,
+                          ungraded_labs: list, special_case_labs: list, total_lab_points: float) -> dict:
+    """
+    Applies the course policy to every student at once, with the same function as the cron job's instructor dashboard
+    (see gradescopeCronJob/course_policy.py), so that both give a student the same grades.
+    Assignments that are not in the matrix (e.g. never downloaded) are left out.
+
+    Parameters:
+        matrix (ScoreMatrix): The scores of the class.
+        assignments (list): The (assignment_id, title) of every assignment of the class.
+        classifier (AssignmentClassifier): Categorizes the assignments by title.
+        num_lecture_drops (int): The number of lecture quizzes a student may miss.
+        ungraded_labs (list): The numbers of the labs that are not graded.
+        special_case_labs (list): The numbers of the labs with four parts.
+        total_lab_points (float): The lab score of a student with full credit on every lab.
+
+    Returns:
+        dict: Maps each aggregate name (lab_score, full_credit_labs, average_lab_score, lecture_attendance,
+            full_credit_lecture_quizzes, discussions_completed, average_project_score) to an array with one value per
+            row of the matrix (NaN where undefined).
+    """
+    categories = select_policy_assignments(classifier.classify(assignments))
+    grades = compute_course_policy(matrix.scores, matrix.max_points, matrix.missing, matrix.column_index, categories,
+                                   ungraded_labs, special_case_labs, num_lecture_drops, total_lab_points)
+    return grades.aggregates
@@ -0,0 +1,237 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS assignments (
+    class_id TEXT NOT NULL,
+    assignment_id TEXT NOT NULL,
+    title TEXT,
+    columns TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (class_id, assignment_id)
+);
+CREATE TABLE IF NOT EXISTS students (
+    class_id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    name TEXT,
+    sid TEXT,
+    PRIMARY KEY (class_id, email)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    class_id TEXT NOT NULL,
+    assignment_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    email TEXT,
+    total_score REAL,
+    max_points REAL,
+    status TEXT,
+    row TEXT NOT NULL,
+    PRIMARY KEY (class_id, assignment_id, position)
+);
+"""
+
+
+def to_float(value):
+    """
+    Converts a Gradescope score cell to a float, or None if the cell is empty or not numeric.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_timestamp(timestamp: float) -> str:
+    """
+    Formats a unix timestamp as an ISO 8601 UTC string, e.g. "2024-10-01T17:00:00+00:00".
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+class GradeStore:
+    """
+    A local SQLite copy of Gradescope `scores.csv` exports, so that read endpoints do not have to download
+    the same assignment from Gradescope on every request.
+
+    Each saved assignment records when it was fetched, which callers compare against their own maximum
+    age to decide whether to answer from the store or go back to Gradescope. Every row is kept exactly as
+    Gradescope exported it, alongside typed copies of the columns that are commonly queried.
+
+    A new connection is opened for every operation, so one instance can be shared between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _connection(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:  # Commits on success, rolls back on error
+                yield connection
+        finally:
+            connection.close()
+
+    def save_assignment(self, class_id: str, assignment_id: str, csv_content: str, title: str = None,
+                        fetched_at: float = None):
+        """
+        Replaces the stored scores of one assignment with the rows of a `scores.csv` export.
+
+        Parameters:
+            class_id (str): The ID of the class/course.
+            assignment_id (str): The ID of the assignment.
+            csv_content (str): The raw CSV content downloaded from Gradescope.
+            title (str, optional): The assignment title. A previously stored title is kept if omitted.
+            fetched_at (float, optional): Unix timestamp of the download. Defaults to now.
+        """
+        class_id, assignment_id = str(class_id), str(assignment_id)
+        csv_reader = csv.DictReader(io.StringIO(csv_content))
+        rows = list(csv_reader)
+        columns = csv_reader.fieldnames or []
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO assignments (class_id, assignment_id, title, columns, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (class_id, assignment_id) DO UPDATE SET "
+                "title = COALESCE(excluded.title, assignments.title), columns = excluded.columns, fetched_at = excluded.fetched_at",
+                (class_id, assignment_id, title, json.dumps(columns), fetched_at)
+            )
+            connection.execute("DELETE FROM scores WHERE class_id = ? AND assignment_id = ?", (class_id, assignment_id))
+            connection.executemany(
+                "INSERT INTO scores (class_id, assignment_id, position, email, total_score, max_points, status, row) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (class_id, assignment_id, position, row.get("Email"), to_float(row.get("Total Score")),
+                     to_float(row.get("Max Points")), row.get("Status"), json.dumps(row))
+                    for position, row in enumerate(rows)
+                ]
+            )
+            connection.executemany(
+                "INSERT INTO students (class_id, email, name, sid) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (class_id, email) DO UPDATE SET name = excluded.name, sid = excluded.sid",
+                [(class_id, row["Email"], row.get("Name"), row.get("SID")) for row in rows if row.get("Email")]
+            )
+
+    def mark_fetched(self, class_id: str, assignment_id: str, fetched_at: float, title: str = None) -> bool:
+        """
+        Records that the stored scores of one assignment were fetched again at `fetched_at` and found unchanged,
+        without rewriting its rows. Returns False if the assignment has never been saved.
+        """
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "UPDATE assignments SET fetched_at = ?, title = COALESCE(?, title) WHERE class_id = ? AND assignment_id = ?",
+                (fetched_at, title, str(class_id), str(assignment_id))
+            )
+            return cursor.rowcount > 0
+
+    def get_fetched_at(self, class_id: str, assignment_ids: list) -> dict:
+        """
+        Returns a dictionary mapping each stored assignment ID in `assignment_ids` to its unix fetch timestamp.
+        Assignments that have never been saved are left out.
+        """
+        assignment_ids = [str(assignment_id) for assignment_id in assignment_ids]
+        if not assignment_ids:
+            return {}
+        placeholders = ", ".join("?" * len(assignment_ids))
+        with self._connection() as connection:
+            cursor = connection.execute(
+                f"SELECT assignment_id, fetched_at FROM assignments WHERE class_id = ? AND assignment_id IN ({placeholders})",
+                [str(class_id)] + assignment_ids
+            )
+            return dict(cursor.fetchall())
+
+    def get_assignment(self, class_id: str, assignment_id: str):
+        """
+        Returns the stored scores of one assignment, or None if it has never been saved.
+
+        Example Output:
+        {
+            "assignment_id": "5211613",
+            "title": "Lecture Quiz 1: Intro",
+            "fetched_at": 1727802000.0,
+            "grades": [{"Name": "test2", "SID": "", "Email": "test2@test.com", "Total Score": "", ...}, ...]
+        }
+        """
+        class_id, assignment_id = str(class_id), str(assignment_id)
+        with self._connection() as connection:
+            assignment = connection.execute(
+                "SELECT title, fetched_at FROM assignments WHERE class_id = ? AND assignment_id = ?",
+                (class_id, assignment_id)
+            ).fetchone()
+            if assignment is None:
+                return None
+            rows = connection.execute(
+                "SELECT row FROM scores WHERE class_id = ? AND assignment_id = ? ORDER BY position",
+                (class_id, assignment_id)
+            ).fetchall()
+        title, fetched_at = assignment
+        return {
+            "assignment_id": assignment_id,
+            "title": title,
+            "fetched_at": fetched_at,
+            "grades": [json.loads(row) for (row,) in rows],
+        }
+
+    def get_columns(self, class_id: str, assignment_id: str):
+        """
+        Returns the CSV header of a stored assignment, or None if it has never been saved.
+        """
+        with self._connection() as connection:
+            assignment = connection.execute(
+                "SELECT columns FROM assignments WHERE class_id = ? AND assignment_id = ?",
+                (str(class_id), str(assignment_id))
+            ).fetchone()
+        return json.loads(assignment[0]) if assignment else None
+
+    def get_scores(self, class_id: str, assignment_ids: list) -> list:
+        """
+        Returns the typed score columns of every stored row of the given assignments with one query, as
+        `(assignment_id, email, total_score, max_points, status)` tuples. Rows without an email are left out.
+        """
+        assignment_ids = [str(assignment_id) for assignment_id in assignment_ids]
+        if not assignment_ids:
+            return []
+        placeholders = ", ".join("?" * len(assignment_ids))
+        with self._connection() as connection:
+            return connection.execute(
+                "SELECT assignment_id, email, total_score, max_points, status FROM scores "
+                f"WHERE class_id = ? AND assignment_id IN ({placeholders}) AND email IS NOT NULL AND email != ''",
+                [str(class_id)] + assignment_ids
+            ).fetchall()
+
+    def get_students(self, class_id: str) -> dict:
+        """
+        Returns a dictionary mapping the email of every student seen in a class to their `(name, sid)`.
+        """
+        with self._connection() as connection:
+            cursor = connection.execute("SELECT email, name, sid FROM students WHERE class_id = ?", (str(class_id),))
+            return {email: (name, sid) for email, name, sid in cursor}
+
+    def iter_grades(self, class_id: str, assignment_id: str):
+        """
+        Yields the stored rows of one assignment one at a time, in their original order, without loading
+        the whole assignment into memory.
+
+        The connection stays open until the generator is exhausted or closed. It may be advanced from
+        different threads (as Starlette does for a `StreamingResponse`), but only by one thread at a time.
+        """
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        try:
+            cursor = connection.execute(
+                "SELECT row FROM scores WHERE class_id = ? AND assignment_id = ? ORDER BY position",
+                (str(class_id), str(assignment_id))
+            )
+            for (row,) in cursor:
+                yield json.loads(row)
+        finally:
+            connection.close()
@@ -1,46 +1,158 @@
 # https://pypi.org/project/fullGSapi/
 from fullGSapi.api.client import GradescopeClient as GradescopeBaseClient
+from urllib.parse import urlparse
+import json
+import logging
+import os
 import threading
+import time
 import requests
 
+from api.metrics import UPSTREAM_RETRIES, time_upstream_request
+
+LOGIN_PATH = GradescopeBaseClient.login_path
+
+
+def is_auth_failure(request_url, response_url, status_code: int) -> bool:
+    """
+    Returns whether Gradescope answered a request as if the session were logged out: with a 401, or by redirecting
+    to the login page. Requests to the login page itself are never auth failures, because a logged-in session
+    gets a 401 there (see `verify_logged_in`).
+
+    Parameters:
+        request_url (str): The URL that was requested, before any redirect.
+        response_url (str): The URL of the final response.
+        status_code (int): The status code of the final response.
+    """
+    if urlparse(str(request_url)).path == LOGIN_PATH:
+        return False
+    return status_code == 401 or urlparse(str(response_url)).path == LOGIN_PATH
+
+
+class ReauthenticatingSession(requests.Session):
+    """
+    A `requests.Session` that logs its client in again, and retries once, when a GET request fails authentication.
+    Requests that do not set a timeout use `timeout`, if set.
+    """
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+        self.timeout = None
+
+    def request(self, method, url, *args, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        login_generation = self.client.login_generation
+        response = self._timed_request(method, url, *args, **kwargs)
+        if method.upper() in ("GET", "HEAD") and is_auth_failure(
+                response.history[0].url if response.history else url, response.url, response.status_code):
+            logging.warning(f"Gradescope session expired while requesting {url}, logging in again")
+            if self.client.reauthenticate(login_generation):
+                UPSTREAM_RETRIES.labels("gradescope", "reauthenticated").inc()
+                response = self._timed_request(method, url, *args, **kwargs)
+        return response
+
+    def _timed_request(self, method, url, *args, **kwargs):
+        with time_upstream_request("gradescope") as request:
+            response = super().request(method, url, *args, **kwargs)
+            request["status"] = response.status_code
+        return response
+
+
 class GradescopeClient(GradescopeBaseClient):
-    def __init__(self):
+    def __init__(self, session_ttl_seconds: float = 300, cookie_path: str = None):
         """
         Initializes the extended fullGSapi Gradescope client with thread-safe operations for login
         and logout on a singleton instance.
+
+        Parameters:
+            session_ttl_seconds (float): How long a login is trusted before `log_in` checks it with Gradescope again.
+                Requests that fail authentication in the meantime log in again on their own (see `ReauthenticatingSession`).
+            cookie_path (str, optional): A JSON file the session cookies are saved to after every login, and read back
+                on construction, so that a restarted server does not need to log in again.
         """
         super().__init__()  # Initialize the parent class (GradescopeBaseClient)
+        headers = self.session.headers
+        self.session = ReauthenticatingSession(self)
+        self.session.headers.update(headers)
         self.lock = threading.Lock() # This is used for login synchronization
+        self.session_ttl_seconds = session_ttl_seconds
+        self.cookie_path = cookie_path
+        # When the session was last known to be logged in, as a unix timestamp
+        self.verified_at = None
+        # Incremented by every login, so that threads that saw the same expired session only log in once
+        self.login_generation = 0
+        # The credentials of the last log_in call, used to log in again when the session expires
+        self.credentials = None
+        if cookie_path:
+            self._load_cookies()
+
 
-    
     def log_in(self, email: str, password: str) -> bool:
         """
         Logs into Gradescope. This overriden method is thread-safe.
+
+        Checking a login costs a request to Gradescope, so a session that was logged in or checked less than
+        `session_ttl_seconds` ago is trusted without one.
         """
-        if not self.logged_in or not self.verify_logged_in():
-            with self.lock:  # Ensures only one thread can execute this block at a time
-                if self.logged_in:  # Double-check inside the lock to avoid redundant login attempts
-                    print("Logged in to Gradescope")
-                    return True
-                
-                url = self.base_url + self.login_path
-                token = self.get_token(url)
-                payload = {
-                    "utf8": "✓",
-                    "authenticity_token": token,
-                    "session[email]": email,
-                    "session[password]": password,
-                    "session[remember_me]": 1,
-                    "commit": "Log In",
-                    "session[remember_me_sso]": 0,
-                }
-                self.last_res = res = self.submit_form(url, url, data=payload)
-                if res.ok:
-                    self.logged_in = True
-                    print("Logged in to Gradescope")
-                    return True
-                return False
-        return self.logged_in
+        self.credentials = (email, password)
+        if self.logged_in and self.verified_at is not None and time.time() - self.verified_at < self.session_ttl_seconds:
+            return True
+        login_generation = self.login_generation
+        if self.logged_in and self.verify_logged_in():
+            self.verified_at = time.time()
+            self._save_cookies()
+            return True
+        with self.lock:  # Ensures only one thread can execute this block at a time
+            if self.login_generation != login_generation:  # Another thread logged in while we were checking
+                print("Logged in to Gradescope")
+                return self.logged_in
+            return self._submit_login(email, password)
+
+
+    def reauthenticate(self, login_generation: int) -> bool:
+        """
+        Logs in again with the credentials of the last `log_in` call, after a request failed authentication.
+        Does nothing if another thread already logged in since `login_generation`.
+
+        Returns:
+            bool: Whether the session is logged in, i.e. whether the failed request is worth retrying.
+        """
+        if self.credentials is None:
+            return False
+        with self.lock:
+            if self.login_generation != login_generation:
+                return self.logged_in
+            self.logged_in = False
+            return self._submit_login(*self.credentials)
+
+
+    def _submit_login(self, email: str, password: str) -> bool:
+        """
+        Submits the login form. Must be called with `self.lock` held.
+        """
+        url = self.base_url + self.login_path
+        token = self.get_token(url)
+        payload = {
+            "utf8": "✓",
+            "authenticity_token": token,
+            "session[email]": email,
+            "session[password]": password,
+            "session[remember_me]": 1,
+            "commit": "Log In",
+            "session[remember_me_sso]": 0,
+        }
+        self.last_res = res = self.submit_form(url, url, data=payload)
+        self.login_generation += 1
+        if res.ok:
+            self.logged_in = True
+            self.verified_at = time.time()
+            self._save_cookies()
+            print("Logged in to Gradescope")
+            return True
+        self.logged_in = False
+        return False
 
 
     def logout(self):
@@ -59,6 +171,46 @@ class GradescopeClient(GradescopeBaseClient):
             self.last_res = res = self.session.get(url, headers={"Referer": ref_url})
             if res.ok:
                 self.logged_in = False
+                self.verified_at = None
+                self.login_generation += 1
+                if self.cookie_path and os.path.exists(self.cookie_path):
+                    os.remove(self.cookie_path)
                 return True
             return False
-    
\ No newline at end of file
+
+
+    def _save_cookies(self):
+        if not self.cookie_path:
+            return
+        cookies = [
+            {"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path,
+             "expires": cookie.expires, "secure": cookie.secure}
+            for cookie in self.session.cookies
+        ]
+        try:
+            os.makedirs(os.path.dirname(self.cookie_path) or ".", exist_ok=True)
+            # The cookies grant access to the course, so only the server's user may read them. Write to a temporary
+            # file first so that a crash mid-write cannot leave a truncated file behind.
+            temporary_path = f"{self.cookie_path}.{threading.get_ident()}.tmp"
+            with open(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as cookie_file:
+                json.dump({"verified_at": self.verified_at, "cookies": cookies}, cookie_file)
+            os.replace(temporary_path, self.cookie_path)
+        except OSError as e:
+            logging.error(f"Failed to save Gradescope cookies to {self.cookie_path}: {e}")
+
+
+    def _load_cookies(self):
+        try:
+            with open(self.cookie_path, "r") as cookie_file:
+                saved = json.load(cookie_file)
+            for cookie in saved["cookies"]:
+                self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                                         expires=cookie["expires"], secure=cookie["secure"])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Ignoring unreadable Gradescope cookie file {self.cookie_path}: {e}")
+            return
+        # The saved session is checked by the first log_in call once it is older than session_ttl_seconds
+        self.logged_in = bool(saved["cookies"])
+        self.verified_at = saved["verified_at"]
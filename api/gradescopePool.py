@@ -0,0 +1,191 @@
+"""
+A pool of independently logged-in Gradescope clients, so that concurrent requests do not share one `requests.Session`.
+
+A single session holds at most 10 connections to a host and is shared by every threadpool worker, so under load
+connections are discarded and reopened, and per-request state (such as fullGSapi's `last_res`) is overwritten by other
+requests. Each client of the pool is used by one request at a time: requests check a client out, and return it when
+they are done.
+"""
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+
+from api.gradescopeClient import GradescopeClient
+
+
+class SessionPoolTimeout(RequestException):
+    """
+    Raised when no Gradescope client is returned to the pool in time. `handle_errors` answers it with a 503.
+    """
+
+
+class GradescopeClientPool:
+    """
+    A fixed number of `GradescopeClient`s, handed out one request at a time.
+
+    Clients are handed out last-in first-out, so under light load the same few clients (and their open connections)
+    are reused, and the others are only logged in once the load needs them. Each client logs in with the credentials
+    of the last `log_in` call when it is checked out, which costs no request while its login is trusted.
+
+    Example:
+        >>> pool = GradescopeClientPool(size=8, cookie_path_template="cache/gradescope_cookies.{index}.json")
+        >>> pool.log_in(email, password)
+        >>> with pool.checkout() as client:
+        >>>     client.session.get("https://www.gradescope.com/courses/831412/assignments")
+    """
+
+    def __init__(self, size: int = 8, checkout_timeout_seconds: float = 30, request_timeout_seconds: float = 60,
+                 connections_per_host: int = 4, session_ttl_seconds: float = 300, cookie_path_template: str = None):
+        """
+        Parameters:
+            size (int): The number of clients, i.e. the number of requests that can use Gradescope at the same time.
+            checkout_timeout_seconds (float): How long `checkout` waits for a client before raising SessionPoolTimeout.
+            request_timeout_seconds (float): The connect and read timeout of every request that does not set its own.
+            connections_per_host (int): The number of connections each client keeps alive per host.
+            session_ttl_seconds (float): See `GradescopeClient`.
+            cookie_path_template (str, optional): Where each client saves its cookies, with "{index}" replaced by
+                the client's position in the pool.
+        """
+        if size < 1:
+            raise ValueError("The session pool size must be at least 1.")
+        self.checkout_timeout_seconds = checkout_timeout_seconds
+        self.clients = []
+        for index in range(size):
+            client = GradescopeClient(
+                session_ttl_seconds=session_ttl_seconds,
+                cookie_path=cookie_path_template.format(index=index) if cookie_path_template else None
+            )
+            # Retry connection errors only: a read that failed may already have reached Gradescope
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=connections_per_host,
+                                  max_retries=Retry(connect=2, read=False, backoff_factor=0.5))
+            client.session.mount("https://", adapter)
+            client.session.mount("http://", adapter)
+            client.session.timeout = request_timeout_seconds
+            self.clients.append(client)
+        # The client whose login `log_in` checks, and whose cookies the /async endpoints share
+        self.primary = self.clients[0]
+        self.idle_clients = queue.LifoQueue()
+        for client in reversed(self.clients):
+            self.idle_clients.put(client)
+        self.credentials = None
+        self.logged_in = False
+        self.lock = threading.Lock()
+        self.created_at = time.monotonic()
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.busy_seconds = 0.0
+        self.in_use = 0
+
+    @property
+    def session(self):
+        """
+        A drop-in for `requests.Session` whose every request checks out a client for its duration.
+        """
+        return PooledSession(self)
+
+    def log_in(self, email: str, password: str) -> bool:
+        """
+        Remembers the credentials the clients log in with, and logs in the primary client.
+        """
+        self.credentials = (email, password)
+        self.logged_in = self.primary.log_in(email, password)
+        return self.logged_in
+
+    def logout(self) -> bool:
+        """
+        Logs out every client that is logged in. Returns whether all of them were logged out.
+        """
+        logged_out = True
+        for client in self.clients:
+            if client.logged_in:
+                logged_out = client.logout() and logged_out
+        self.logged_in = not logged_out
+        return logged_out
+
+    @contextmanager
+    def checkout(self):
+        """
+        Lends a client for the duration of the `with` block, logging it in first.
+
+        Raises:
+            SessionPoolTimeout: If no client is returned within `checkout_timeout_seconds`.
+        """
+        start_time = time.monotonic()
+        waited = False
+        try:
+            client = self.idle_clients.get_nowait()
+        except queue.Empty:
+            waited = True
+            try:
+                client = self.idle_clients.get(timeout=self.checkout_timeout_seconds)
+            except queue.Empty:
+                raise SessionPoolTimeout(
+                    f"No Gradescope session became free within {self.checkout_timeout_seconds} seconds") from None
+        checked_out_at = time.monotonic()
+        wait_seconds = checked_out_at - start_time
+        with self.lock:
+            self.checkouts += 1
+            self.waited_checkouts += waited
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            self.in_use += 1
+        try:
+            if self.credentials is not None and not client.log_in(*self.credentials):
+                logging.error("A pooled Gradescope session failed to log in")
+            yield client
+        finally:
+            with self.lock:
+                self.in_use -= 1
+                self.busy_seconds += time.monotonic() - checked_out_at
+            self.idle_clients.put(client)
+
+    def stats(self) -> dict:
+        """
+        Returns the size of the pool, how long requests waited for a client, and how busy the clients were.
+        "utilization" is the fraction of the pool's lifetime that the clients spent checked out.
+
+        Example Output:
+            {"size": 8, "in_use": 3, "logged_in": 5, "checkouts": 1200, "waited_checkouts": 40,
+             "average_wait_ms": 2.1, "max_wait_ms": 350.0, "utilization": 0.42}
+        """
+        with self.lock:
+            lifetime = (time.monotonic() - self.created_at) * len(self.clients)
+            return {
+                "size": len(self.clients),
+                "in_use": self.in_use,
+                "logged_in": sum(client.logged_in for client in self.clients),
+                "checkouts": self.checkouts,
+                "waited_checkouts": self.waited_checkouts,
+                "average_wait_ms": round(self.total_wait_seconds / self.checkouts * 1000, 1) if self.checkouts else None,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 1),
+                "utilization": round(self.busy_seconds / lifetime, 3) if lifetime else None,
+            }
+
+
+class PooledSession:
+    """
+    Sends each request over a client checked out of a `GradescopeClientPool`, so that code written against one
+    shared `requests.Session` (e.g. `GRADESCOPE_CLIENT.session.get(url)`) uses the pool without changes.
+    """
+
+    def __init__(self, pool: GradescopeClientPool):
+        self.pool = pool
+
+    def request(self, method: str, url: str, **kwargs):
+        with self.pool.checkout() as client:
+            return client.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        kwargs.setdefault("allow_redirects", True)
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
@@ -0,0 +1,135 @@
+"""
+Prometheus metrics of the API, served in the text exposition format by `/metrics`.
+
+Requests to Gradescope, PrairieLearn and Google Sheets are timed where they are sent (see `time_upstream_request`).
+Counters that the caches, the request coalescing and the session pool already keep are read when `/metrics` is
+scraped (see `GradeSyncCollector`), so they are not counted twice.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Upstream requests take from tens of milliseconds (a cached page) to tens of seconds (a large scores.csv)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "gradesync_upstream_request_seconds", "Time taken by requests to an upstream service, by upstream and status code.",
+    ["upstream", "status"], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_RETRIES = Counter(
+    "gradesync_upstream_retries", "Requests to an upstream service that were sent again, by upstream and reason.",
+    ["upstream", "reason"]
+)
+UPSTREAM_RATE_LIMITED = Counter(
+    "gradesync_upstream_rate_limited", "Responses with status 429 (Too Many Requests), by upstream.", ["upstream"]
+)
+# Not gradesync_sync_stage_seconds, the cron job's gauge of the stages of a sync run, so that both can be scraped
+STORE_LOAD_SECONDS = Histogram(
+    "gradesync_api_store_load_seconds", "Time taken by each stage of loading a class's grades into the grade store.",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+
+
+@contextmanager
+def time_upstream_request(upstream: str):
+    """
+    Times the request sent in the `with` block. The block must set `request["status"]` to the response's status code.
+    Requests that raise are recorded with the status code of the exception's response (e.g. a gspread `APIError`),
+    or with the status "error" if it has none.
+
+    Example:
+        >>> with time_upstream_request("prairielearn") as request:
+        >>>     response = requests.get(url)
+        >>>     request["status"] = response.status_code
+    """
+    request = {"status": "error"}
+    start_time = time.perf_counter()
+    try:
+        yield request
+    except Exception as e:
+        request["status"] = getattr(getattr(e, "response", None), "status_code", "error")
+        raise
+    finally:
+        UPSTREAM_REQUEST_SECONDS.labels(upstream, str(request["status"])).observe(time.perf_counter() - start_time)
+        if request["status"] == 429:
+            UPSTREAM_RATE_LIMITED.labels(upstream).inc()
+
+
+class GradeSyncCollector(Collector):
+    """
+    Exposes the counters of the server-side caches, the request coalescing and the Gradescope session pool.
+
+    Parameters:
+        get_caches (function): Returns {name: TTLCache}.
+        get_flights (function): Returns {upstream: SingleFlight}.
+        get_session_pool (function): Returns the GradescopeClientPool.
+        get_download_caches (function): Returns {name: DownloadCache} (see gradescopeCronJob/download_cache.py).
+    The arguments are functions so that caches replaced at runtime (e.g. by tests) are picked up.
+    """
+
+    def __init__(self, get_caches, get_flights, get_session_pool, get_download_caches=lambda: {}):
+        self.get_caches = get_caches
+        self.get_flights = get_flights
+        self.get_session_pool = get_session_pool
+        self.get_download_caches = get_download_caches
+
+    def collect(self):
+        lookups = CounterMetricFamily("gradesync_cache_lookups", "Lookups of the server-side caches, by result.",
+                                      labels=["cache", "result"])
+        entries = GaugeMetricFamily("gradesync_cache_entries", "Entries in the server-side caches.", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("gradesync_cache_hit_ratio", "Fraction of cache lookups answered from the cache.",
+                                      labels=["cache"])
+        for name, cache in self.get_caches().items():
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "stale_hit"], stats["stale_hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            entries.add_metric([name], stats["entries"])
+            if stats["hit_rate"] is not None:
+                hit_ratio.add_metric([name], stats["hit_rate"])
+        yield lookups
+        yield entries
+        yield hit_ratio
+
+        calls = CounterMetricFamily("gradesync_upstream_calls", "Calls to an upstream service, and how many of them "
+                                    "shared an identical call already in flight.", labels=["upstream", "coalesced"])
+        for upstream, flights in self.get_flights().items():
+            stats = flights.stats()
+            calls.add_metric([upstream, "false"], stats["calls"] - stats["coalesced_calls"])
+            calls.add_metric([upstream, "true"], stats["coalesced_calls"])
+        yield calls
+
+        downloads = CounterMetricFamily("gradesync_download_responses", "Downloads with a conditional request, by result: "
+                                        "not_modified (answered 304), unchanged (downloaded again, but identical) or "
+                                        "changed.", labels=["cache", "result"])
+        bytes_saved = CounterMetricFamily("gradesync_download_bytes_saved",
+                                          "Bytes that were not downloaded again, because the upstream answered 304.",
+                                          labels=["cache"])
+        for name, cache in self.get_download_caches().items():
+            stats = cache.stats()
+            for result in ["not_modified", "unchanged", "changed"]:
+                downloads.add_metric([name, result], stats[result])
+            bytes_saved.add_metric([name], stats["bytes_saved"])
+        yield downloads
+        yield bytes_saved
+
+        pool = self.get_session_pool()
+        stats = pool.stats()
+        yield GaugeMetricFamily("gradesync_session_pool_size", "Gradescope sessions in the pool.", value=stats["size"])
+        yield GaugeMetricFamily("gradesync_session_pool_in_use", "Gradescope sessions checked out.", value=stats["in_use"])
+        yield GaugeMetricFamily("gradesync_session_pool_logged_in", "Gradescope sessions that are logged in.",
+                                value=stats["logged_in"])
+        yield CounterMetricFamily("gradesync_session_pool_checkouts", "Checkouts of a Gradescope session.",
+                                  value=stats["checkouts"])
+        yield CounterMetricFamily("gradesync_session_pool_waited_checkouts",
+                                  "Checkouts that waited for a Gradescope session to be returned.",
+                                  value=stats["waited_checkouts"])
+        yield CounterMetricFamily("gradesync_session_pool_wait_seconds",
+                                  "Time spent waiting for a Gradescope session.", value=pool.total_wait_seconds)
+        if stats["utilization"] is not None:
+            yield GaugeMetricFamily("gradesync_session_pool_utilization",
+                                    "Fraction of the pool's lifetime that its sessions spent checked out.",
+                                    value=stats["utilization"])
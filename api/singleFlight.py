@@ -0,0 +1,102 @@
+"""
+Request coalescing ("single flight") for the calls app.py makes to Gradescope and PrairieLearn.
+
+When several TAs open the dashboard at once, every `/getGrades?assignment_id=X` used to download the same `scores.csv`.
+With a `SingleFlight` in front of the download, the first caller for a key makes the request and every caller that
+arrives while it is in flight waits for it and gets the same result (or the same exception). Nothing is cached: once
+the call returns, the next caller for the key makes a new one.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call per key between concurrent callers.
+
+    Calls from threadpool workers (`do`) and from the event loop (`do_async`) are coalesced separately, because a
+    thread cannot await a task and the event loop must not block on a thread.
+
+    Example:
+        >>> gradescope_flights = SingleFlight()
+        >>> gradescope_flights.do(("scores.csv", "831412", "5211613"), lambda: session.get(url))
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> Future of the call in flight
+        self.in_flight = {}
+        # (event loop, key) -> asyncio.Task of the call in flight
+        self.tasks_in_flight = {}
+        self.calls = 0
+        self.coalesced_calls = 0
+
+    def do(self, key, func):
+        """
+        Returns `func()`, or the result of the call already in flight for `key`.
+
+        Parameters:
+            key (hashable): Identifies the upstream request, e.g. ("scores.csv", class_id, assignment_id).
+            func (function): Takes no arguments and makes the request. Exceptions it raises are raised to every caller
+                that waited for it.
+        """
+        with self.lock:
+            self.calls += 1
+            future = self.in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self.in_flight[key] = Future()
+            else:
+                self.coalesced_calls += 1
+        if not is_leader:
+            return future.result()
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+    async def do_async(self, key, func):
+        """
+        Same as `do`, but `func` is a coroutine function, which runs as a task on the event loop. The task is shielded,
+        so a caller that is cancelled (e.g. its client disconnected) does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        with self.lock:
+            self.calls += 1
+            task = self.tasks_in_flight.get(task_key)
+            if task is not None:
+                self.coalesced_calls += 1
+            else:
+                task = self.tasks_in_flight[task_key] = loop.create_task(func())
+                task.add_done_callback(lambda done_task: self._forget_task(task_key, done_task))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of calls, and how many of them shared a call that was already in flight.
+
+        Example Output:
+            {"calls": 120, "coalesced_calls": 85, "in_flight": 2, "coalesced_rate": 0.708}
+        """
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "coalesced_calls": self.coalesced_calls,
+                "in_flight": len(self.in_flight) + len(self.tasks_in_flight),
+                "coalesced_rate": round(self.coalesced_calls / self.calls, 3) if self.calls else None,
+            }
+
+    def _forget_task(self, task_key, task):
+        with self.lock:
+            self.tasks_in_flight.pop(task_key, None)
+        if not task.cancelled():
+            # Marks the exception as retrieved, in case every caller was cancelled before the task finished
+            task.exception()
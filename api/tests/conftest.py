@@ -0,0 +1,23 @@
+"""
+Shared fixtures for the API tests.
+"""
+
+import importlib
+import pytest
+from api.cache import TTLCache
+from api.gradeStore import GradeStore
+
+
+@pytest.fixture(autouse=True)
+def isolated_local_state(tmp_path, monkeypatch):
+    """
+    Give every test an empty grade store and assignment catalog cache, so that grades saved by one test
+    are never served to another and the developer's own cache directory is left untouched.
+    Downloads are unconditional, because most tests mock responses without a status code or headers;
+    the tests of the download cache set their own.
+    """
+    # `api.app` is shadowed by the FastAPI instance re-exported from `api/__init__.py`, so look the module up directly
+    app_module = importlib.import_module("api.app")
+    monkeypatch.setattr(app_module, "GRADE_STORE", GradeStore(str(tmp_path / "grades.sqlite3")))
+    monkeypatch.setattr(app_module, "ASSIGNMENT_CATALOG_CACHE", TTLCache(ttl_seconds=app_module.ASSIGNMENT_CATALOG_TTL_SECONDS))
+    monkeypatch.setattr(app_module, "SCORES_DOWNLOAD_CACHE", None)
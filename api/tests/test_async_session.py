@@ -0,0 +1,56 @@
+"""
+These are unit tests for asyncSession.py
+"""
+
+import asyncio
+import httpx
+import pytest
+import requests
+from unittest.mock import patch
+from api.asyncSession import AsyncSession
+
+
+def test_async_session_shares_cookie_jar():
+    """
+    Test that cookies of the requests session are sent, and cookies set by responses are seen by the requests session.
+    """
+    session = requests.Session()
+    session.cookies.set("signed_token", "abc", domain="www.gradescope.com")
+    received_cookies = []
+
+    def handler(request):
+        received_cookies.append(request.headers.get("cookie"))
+        return httpx.Response(200, headers={"set-cookie": "_gradescope_session=xyz; Path=/"}, text="ok")
+
+    async_session = AsyncSession(lambda: session, transport=httpx.MockTransport(handler))
+    response = asyncio.run(async_session.get("https://www.gradescope.com/courses/831412/assignments"))
+
+    assert response.text == "ok"
+    assert received_cookies == ["signed_token=abc"]
+    assert session.cookies.get("_gradescope_session") == "xyz"
+
+
+def test_async_session_get_with_backoff_retries_connection_errors():
+    """
+    Test that connection errors are retried until an attempt succeeds, and re-raised after `max_tries` attempts.
+    """
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("Connection refused")
+        return httpx.Response(200, json={"gradebook": []})
+
+    async_session = AsyncSession(transport=httpx.MockTransport(handler))
+    # No real sleeping between attempts
+    with patch("api.asyncSession.asyncio.sleep") as mock_sleep:
+        mock_sleep.return_value = None
+        response = asyncio.run(async_session.get_with_backoff("https://us.prairielearn.com/pl/api/v1", max_tries=3))
+        assert response.json() == {"gradebook": []}
+        assert len(attempts) == 3
+
+        attempts.clear()
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(async_session.get_with_backoff("https://us.prairielearn.com/pl/api/v1", max_tries=2))
+        assert len(attempts) == 2
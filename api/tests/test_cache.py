@@ -0,0 +1,113 @@
+"""
+These are unit tests for cache.py
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from api.cache import TTLCache
+
+
+def test_ttl_cache_miss_then_hit():
+    """
+    Test that the loader is only called on the first lookup of a key.
+    """
+    cache = TTLCache(ttl_seconds=60)
+    loader = MagicMock(return_value={"labs": {}})
+
+    assert cache.get("902165", loader) == {"labs": {}}
+    assert cache.get("902165", loader) == {"labs": {}}
+
+    loader.assert_called_once()
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_ttl_cache_serves_stale_value_while_refreshing():
+    """
+    Test that an expired entry is returned immediately and reloaded in the background.
+    """
+    cache = TTLCache(ttl_seconds=0)
+    cache.get("902165", lambda: "old")
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.set()
+        return "new"
+
+    assert cache.get("902165", loader) == "old"
+    assert refreshed.wait(timeout=5)
+    # The refresh thread stores the value right after the loader returns
+    for _ in range(100):
+        if cache.entries["902165"]["value"] == "new":
+            break
+        time.sleep(0.01)
+    assert cache.entries["902165"]["value"] == "new"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_ttl_cache_loader_error_is_not_cached():
+    """
+    Test that a failing loader propagates its error on a miss and caches nothing.
+    """
+    cache = TTLCache(ttl_seconds=60)
+
+    with pytest.raises(RuntimeError):
+        cache.get("902165", MagicMock(side_effect=RuntimeError("Gradescope is down")))
+
+    assert cache.get("902165", lambda: "recovered") == "recovered"
+    assert cache.stats()["misses"] == 2
+
+
+def test_ttl_cache_persists_to_disk(tmp_path):
+    """
+    Test that a new cache with the same file starts warm.
+    """
+    persist_path = str(tmp_path / "cache" / "catalog.json")
+    TTLCache(ttl_seconds=60, persist_path=persist_path).get("902165", lambda: {"labs": {"2": {}}})
+
+    warm_cache = TTLCache(ttl_seconds=60, persist_path=persist_path)
+    loader = MagicMock()
+
+    assert warm_cache.get("902165", loader) == {"labs": {"2": {}}}
+    loader.assert_not_called()
+
+
+def test_ttl_cache_invalidate():
+    """
+    Test that an invalidated key is reloaded on the next lookup.
+    """
+    cache = TTLCache(ttl_seconds=60)
+    cache.get("902165", lambda: "old")
+    cache.invalidate("902165")
+
+    assert cache.get("902165", lambda: "new") == "new"
+
+
+def test_ttl_cache_get_async():
+    """
+    Test that `get_async` awaits the loader on a miss, and refreshes a stale entry in a task on the event loop.
+    """
+    cache = TTLCache(ttl_seconds=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return f"catalog {len(calls)}"
+
+    async def lookups():
+        first = await cache.get_async("902165", loader)
+        second = await cache.get_async("902165", loader)
+        cache.ttl_seconds = 0
+        stale = await cache.get_async("902165", loader)
+        # Let the refresh task run
+        await asyncio.gather(*cache.refresh_tasks)
+        return first, second, stale
+
+    assert asyncio.run(lookups()) == ("catalog 1", "catalog 1", "catalog 1")
+    assert cache.entries["902165"]["value"] == "catalog 2"
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["stale_hits"] == 1
@@ -0,0 +1,70 @@
+"""
+These are unit tests for columnar.py
+"""
+
+import math
+from api.columnar import ColumnarGrades
+from api.utils import csv_to_json
+
+SCORES_CSV = """Name,SID,Email,Total Score,Max Points,Status,1: Lists (1.0 pts)
+Student1,3031,student1@berkeley.edu,3.0,4.0,Graded,1.0
+Student2,3032,student2@berkeley.edu,,4.0,Missing,
+Student3,3033,student3@berkeley.edu,4.0,4.0,Graded,1.0
+Student4,3034,student4@berkeley.edu,2.5,4.0,Graded,0.0
+"""
+
+
+def test_column_types():
+    """
+    Test that score columns become numbers, repetitive columns categories, and the rest strings.
+    """
+    grades = ColumnarGrades.from_csv(SCORES_CSV)
+
+    assert grades.num_rows == 4
+    assert grades.types == {
+        "Name": "string",
+        "SID": "number",
+        "Email": "string",
+        "Total Score": "number",
+        "Max Points": "number",
+        "Status": "category",
+        "1: Lists (1.0 pts)": "number",
+    }
+    assert math.isnan(grades.numbers["Total Score"][1])
+
+
+def test_columns_round_trip_with_csv_to_json():
+    """
+    Test that every column holds the same values as the row-oriented csv_to_json output.
+    """
+    grades = ColumnarGrades.from_csv(SCORES_CSV)
+    rows = csv_to_json(SCORES_CSV)
+
+    for name in grades.columns:
+        expected = [row[name] for row in rows]
+        if grades.types[name] == "number":
+            expected = [float(value) if value else None for value in expected]
+        assert grades.column(name) == expected
+
+
+def test_to_json():
+    """
+    Test that the JSON form lists every column name once and dictionary-encodes categories.
+    """
+    output = ColumnarGrades.from_csv(SCORES_CSV).to_json()
+
+    assert output["num_rows"] == 4
+    assert output["columns"][0] == "Name"
+    assert output["data"]["Total Score"] == [3.0, None, 4.0, 2.5]
+    assert output["data"]["Status"] == {"categories": ["Graded", "Missing"], "codes": [0, 1, 0, 0]}
+    assert output["data"]["Email"][3] == "student4@berkeley.edu"
+
+
+def test_short_rows_and_empty_csv():
+    """
+    Test that missing cells are treated as empty, and that empty content produces no columns.
+    """
+    grades = ColumnarGrades.from_csv("Name,Total Score\nStudent1\nStudent2,85\nStudent3,90\n")
+
+    assert grades.column("Total Score") == [None, 85.0, 90.0]
+    assert ColumnarGrades.from_csv("").to_json() == {"num_rows": 0, "columns": [], "types": {}, "data": {}}
@@ -0,0 +1,92 @@
+"""
+These are unit tests for gradescopeCronJob/download_cache.py, and for the conditional downloads of the API
+"""
+
+import importlib
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+from requests.structures import CaseInsensitiveDict
+from api.app import app
+from gradescopeCronJob.download_cache import DownloadCache
+
+SCORES_CSV = b"Name,Email,Total Score\nStudent1,s1@berkeley.edu,90\n"
+KEY = ("902165", "5211613")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DownloadCache(str(tmp_path / "scores_downloads"))
+
+
+def test_download_cache_sends_validators_and_serves_304(cache):
+    """
+    Test that a cached download is requested with its ETag and Last-Modified, and that a 304 returns the cached body.
+    """
+    assert cache.request_headers(KEY) == {}
+    headers = CaseInsensitiveDict({"ETag": '"abc"', "Last-Modified": "Tue, 01 Oct 2024 17:00:00 GMT"})
+    first = cache.resolve(KEY, 200, headers, SCORES_CSV)
+
+    assert first.changed and not first.not_modified
+    assert cache.request_headers(KEY) == {"If-None-Match": '"abc"', "If-Modified-Since": "Tue, 01 Oct 2024 17:00:00 GMT"}
+    second = cache.resolve(KEY, 304, CaseInsensitiveDict(), b"")
+    assert second.content == SCORES_CSV
+    assert not second.changed and second.not_modified
+    assert cache.stats()["bytes_saved"] == len(SCORES_CSV)
+
+
+def test_download_cache_compares_digests_without_validators(cache):
+    """
+    Test that a server that ignores conditional requests still has unchanged downloads detected by their digest.
+    """
+    cache.resolve(KEY, 200, CaseInsensitiveDict(), SCORES_CSV)
+
+    assert cache.request_headers(KEY) == {}
+    assert not cache.resolve(KEY, 200, CaseInsensitiveDict(), SCORES_CSV).changed
+    assert cache.resolve(KEY, 200, CaseInsensitiveDict(), SCORES_CSV + b"Student2,s2@berkeley.edu,85\n").changed
+    stats = cache.stats()
+    assert (stats["not_modified"], stats["unchanged"], stats["changed"], stats["bytes_saved"]) == (0, 1, 2, 0)
+
+
+def test_download_cache_failures_and_persistence(cache):
+    """
+    Test that failed downloads and a 304 without a cached body are not cached, and that the cache survives a restart.
+    """
+    assert cache.resolve(KEY, 500, CaseInsensitiveDict(), b"error") is None
+    assert cache.resolve(KEY, 304, CaseInsensitiveDict(), b"") is None
+    cache.resolve(KEY, 200, CaseInsensitiveDict({"ETag": '"abc"'}), SCORES_CSV)
+
+    restarted = DownloadCache(cache.directory)
+
+    assert restarted.request_headers(KEY) == {"If-None-Match": '"abc"'}
+    assert restarted.resolve(KEY, 304, CaseInsensitiveDict(), b"").content == SCORES_CSV
+
+
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_unchanged_download_is_not_saved_again(mock_client, mock_get_assignment_info, tmp_path, monkeypatch):
+    """
+    Test that grades downloaded again and answered with a 304 are served from the grade store without being saved again.
+    """
+    app_module = importlib.import_module("api.app")
+    monkeypatch.setattr(app_module, "SCORES_DOWNLOAD_CACHE", DownloadCache(str(tmp_path / "scores_downloads")))
+    monkeypatch.setattr(app_module, "GRADE_STORE_MAX_AGE_SECONDS", 0)
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+    }
+    mock_client.session.get.side_effect = [
+        MagicMock(ok=True, status_code=200, headers=CaseInsensitiveDict({"ETag": '"abc"'}), content=SCORES_CSV),
+        MagicMock(ok=True, status_code=304, headers=CaseInsensitiveDict({"ETag": '"abc"'}), content=b""),
+    ]
+    client = TestClient(app)
+
+    first_response = client.get("/fetchAllGrades", params={"class_id": "902165"})
+    with patch.object(app_module.GRADE_STORE, "save_assignment") as save_assignment:
+        second_response = client.get("/fetchAllGrades", params={"class_id": "902165"})
+
+    expected = {"Lecture Quiz 1: Intro": [{"Name": "Student1", "Email": "s1@berkeley.edu", "Total Score": "90"}]}
+    assert first_response.json() == expected
+    assert second_response.json() == expected
+    assert mock_client.session.get.call_args.kwargs["headers"] == {"If-None-Match": '"abc"'}
+    save_assignment.assert_not_called()
+    assert client.get("/getCacheStats").json()["scores_downloads"]["bytes_saved"] == len(SCORES_CSV)
@@ -0,0 +1,78 @@
+"""
+These are unit tests for gradeAggregation.py
+"""
+
+import math
+import numpy as np
+from api.gradeAggregation import ScoreMatrix, compute_course_grades
+from gradescopeCronJob.assignment_classifier import AssignmentClassifier, DEFAULT_CATEGORY_RULES
+
+ASSIGNMENTS = [
+    ("q1", "Lecture Quiz 1"),
+    ("q2", "Lecture Quiz 2"),
+    ("l0", "Lab 0: Welcome"),
+    ("l2a", "Lab 2 (Conceptual)"),
+    ("l2b", "Lab 2 (Code)"),
+    ("l3", "Lab 3"),
+    ("d1", "Discussion 1"),
+    ("p1", "Project 1"),
+]
+CLASSIFIER = AssignmentClassifier(DEFAULT_CATEGORY_RULES)
+
+ROWS = [
+    ("q1", "a@berkeley.edu", 1.0, 1.0, "Graded"),
+    ("q2", "a@berkeley.edu", None, 1.0, "Missing"),
+    ("q1", "b@berkeley.edu", 0.0, 1.0, "Graded"),
+    ("l0", "a@berkeley.edu", 0.0, 2.0, "Graded"),
+    ("l2a", "a@berkeley.edu", 2.0, 2.0, "Graded"),
+    ("l2b", "a@berkeley.edu", 3.0, 3.0, "Graded"),
+    ("l2a", "b@berkeley.edu", 2.0, 2.0, "Graded"),
+    ("l3", "a@berkeley.edu", 1.0, 2.0, "Graded"),
+    ("l3", "b@berkeley.edu", 2.0, 2.0, "Graded"),
+    ("d1", "a@berkeley.edu", None, 1.0, "Missing"),
+    ("d1", "b@berkeley.edu", 1.0, 1.0, "Graded"),
+    ("p1", "a@berkeley.edu", 15.0, 20.0, "Graded"),
+]
+ALL_IDS = ["q1", "q2", "l0", "l2a", "l2b", "l3", "d1", "p1"]
+
+
+def test_score_matrix_from_rows():
+    """
+    Test that rows are joined into one matrix, with students who have no row treated as missing.
+    """
+    matrix = ScoreMatrix.from_rows(["q1", "q2"], ROWS)
+
+    assert matrix.emails.tolist() == ["a@berkeley.edu", "b@berkeley.edu"]
+    assert np.array_equal(matrix.scores, [[1.0, np.nan], [0.0, np.nan]], equal_nan=True)
+    assert matrix.missing.tolist() == [[False, True], [False, True]]
+    assert matrix.max_points.tolist() == [1.0, 1.0]
+
+
+def test_compute_course_grades():
+    """
+    Test the course policy: lab parts are combined, ungraded labs are skipped, and lecture drops are capped.
+    """
+    matrix = ScoreMatrix.from_rows(ALL_IDS, ROWS)
+
+    grades = compute_course_grades(matrix, ASSIGNMENTS, CLASSIFIER, num_lecture_drops=1, ungraded_labs=[0],
+                                   special_case_labs=[], total_lab_points=80)
+
+    # Student a: lab 2 is 5/5 and lab 3 is 1/2; student b: lab 2 is 2/5 and lab 3 is 2/2
+    assert grades["full_credit_labs"].tolist() == [1, 1]
+    assert grades["lab_score"].tolist() == [40.0, 40.0]
+    assert grades["average_lab_score"].tolist() == [0.75, 0.7]
+    assert grades["lecture_attendance"].tolist() == [1.0, 0.5]
+    assert grades["discussions_completed"].tolist() == [0, 1]
+    assert grades["average_project_score"][0] == 0.75
+    # Student b has no row for the project, which counts as no points
+    assert grades["average_project_score"][1] == 0.0
+    assert math.isnan(compute_course_grades(matrix, ASSIGNMENTS, CLASSIFIER, 1, [0, 2, 3], [], 80)["lab_score"][0])
+
+
+def test_compute_course_grades_without_scores():
+    """
+    Test that an empty matrix produces no students instead of failing.
+    """
+    grades = compute_course_grades(ScoreMatrix.from_rows(ALL_IDS, []), ASSIGNMENTS, CLASSIFIER, 1, [0], [], 80)
+
+    assert all(len(values) == 0 for values in grades.values())
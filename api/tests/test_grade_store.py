@@ -0,0 +1,106 @@
+"""
+These are unit tests for gradeStore.py
+"""
+
+import pytest
+from api.gradeStore import GradeStore, format_timestamp
+
+SCORES_CSV = """Name,SID,Email,Total Score,Max Points,Status
+Student1,3031,student1@berkeley.edu,3.0,4.0,Graded
+Student2,3032,student2@berkeley.edu,,4.0,Missing
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    return GradeStore(str(tmp_path / "grades.sqlite3"))
+
+
+def test_save_and_get_assignment(store):
+    """
+    Test that a saved scores.csv is returned row for row, exactly as csv_to_json would parse it.
+    """
+    store.save_assignment("902165", "5211613", SCORES_CSV, title="Lecture Quiz 1: Intro", fetched_at=1000.0)
+
+    stored = store.get_assignment("902165", "5211613")
+
+    assert stored == {
+        "assignment_id": "5211613",
+        "title": "Lecture Quiz 1: Intro",
+        "fetched_at": 1000.0,
+        "grades": [
+            {"Name": "Student1", "SID": "3031", "Email": "student1@berkeley.edu", "Total Score": "3.0", "Max Points": "4.0", "Status": "Graded"},
+            {"Name": "Student2", "SID": "3032", "Email": "student2@berkeley.edu", "Total Score": "", "Max Points": "4.0", "Status": "Missing"},
+        ],
+    }
+
+
+def test_save_assignment_replaces_previous_rows(store):
+    """
+    Test that saving an assignment again replaces its rows and keeps its title if none is given.
+    """
+    store.save_assignment("902165", "5211613", SCORES_CSV, title="Lecture Quiz 1: Intro", fetched_at=1000.0)
+    store.save_assignment("902165", "5211613", "Name,Email\nStudent3,student3@berkeley.edu\n", fetched_at=2000.0)
+
+    stored = store.get_assignment("902165", "5211613")
+
+    assert stored["title"] == "Lecture Quiz 1: Intro"
+    assert stored["fetched_at"] == 2000.0
+    assert stored["grades"] == [{"Name": "Student3", "Email": "student3@berkeley.edu"}]
+
+
+def test_get_fetched_at(store):
+    """
+    Test that only saved assignments of the requested class are reported.
+    """
+    store.save_assignment("902165", "5211613", SCORES_CSV, fetched_at=1000.0)
+    store.save_assignment("831412", "5211612", SCORES_CSV, fetched_at=2000.0)
+
+    assert store.get_fetched_at("902165", ["5211613", "5211612"]) == {"5211613": 1000.0}
+    assert store.get_fetched_at("902165", []) == {}
+
+
+def test_iter_grades_and_columns(store):
+    """
+    Test that stored rows can be streamed one at a time along with the original CSV header.
+    """
+    store.save_assignment("902165", "5211613", SCORES_CSV)
+
+    rows = store.iter_grades("902165", "5211613")
+
+    assert next(rows)["Name"] == "Student1"
+    assert [row["Name"] for row in rows] == ["Student2"]
+    assert store.get_columns("902165", "5211613") == ["Name", "SID", "Email", "Total Score", "Max Points", "Status"]
+    assert store.get_columns("902165", "0") is None
+
+
+def test_get_scores_and_students(store):
+    """
+    Test that the typed score columns of several assignments are returned with one call.
+    """
+    store.save_assignment("902165", "5211613", SCORES_CSV)
+    store.save_assignment("902165", "5211612", "Name,Email,Total Score\nStudent3,,1.0\n")
+
+    assert sorted(store.get_scores("902165", ["5211613", "5211612"])) == [
+        ("5211613", "student1@berkeley.edu", 3.0, 4.0, "Graded"),
+        ("5211613", "student2@berkeley.edu", None, 4.0, "Missing"),
+    ]
+    assert store.get_scores("902165", []) == []
+    assert store.get_students("902165") == {
+        "student1@berkeley.edu": ("Student1", "3031"),
+        "student2@berkeley.edu": ("Student2", "3032"),
+    }
+
+
+def test_get_missing_assignment(store):
+    """
+    Test that an assignment that was never saved is reported as missing.
+    """
+    assert store.get_assignment("902165", "5211613") is None
+
+
+def test_format_timestamp():
+    """
+    Test that fetch timestamps are formatted as ISO 8601 UTC strings.
+    """
+    assert format_timestamp(0) == "1970-01-01T00:00:00+00:00"
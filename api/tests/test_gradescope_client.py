@@ -0,0 +1,136 @@
+"""
+These are unit tests for gradescopeClient.py. Gradescope is never contacted: logins and responses are mocked.
+"""
+
+import asyncio
+import time
+import httpx
+import requests
+from unittest.mock import patch, MagicMock
+from api.asyncSession import AsyncSession
+from api.gradescopeClient import GradescopeClient, is_auth_failure
+
+
+def mock_response(url, status_code=200, redirected_from=None):
+    response = MagicMock()
+    response.url = url
+    response.status_code = status_code
+    response.history = [MagicMock(url=redirected_from)] if redirected_from else []
+    return response
+
+
+def test_is_auth_failure():
+    """
+    Test that a 401 or a redirect to the login page is an auth failure, except for requests to the login page.
+    """
+    scores_url = "https://www.gradescope.com/courses/12345/assignments/67890/scores.csv"
+    assert is_auth_failure(scores_url, "https://www.gradescope.com/login", 200)
+    assert is_auth_failure(scores_url, scores_url, 401)
+    assert not is_auth_failure(scores_url, scores_url, 200)
+    assert not is_auth_failure(scores_url, scores_url, 404)
+    # A logged-in session gets a 401 from the login page
+    assert not is_auth_failure("https://gradescope.com/login", "https://gradescope.com/login", 401)
+
+
+def test_log_in_trusts_recent_login():
+    """
+    Test that log_in only checks the session with Gradescope once it is older than session_ttl_seconds.
+    """
+    client = GradescopeClient(session_ttl_seconds=60)
+    client.logged_in = True
+    client.verified_at = time.time()
+    with patch.object(client, "verify_logged_in", return_value=True) as mock_verify:
+        assert client.log_in("email", "password")
+        mock_verify.assert_not_called()
+
+        client.verified_at = time.time() - 61
+        assert client.log_in("email", "password")
+        mock_verify.assert_called_once()
+        assert time.time() - client.verified_at < 1
+
+
+def test_log_in_again_when_check_fails():
+    """
+    Test that a session that is no longer logged in according to Gradescope logs in again.
+    """
+    client = GradescopeClient(session_ttl_seconds=0)
+    client.logged_in = True
+    with patch.object(client, "verify_logged_in", return_value=False), \
+            patch.object(client, "_submit_login", return_value=True) as mock_submit_login:
+        assert client.log_in("email", "password")
+        mock_submit_login.assert_called_once_with("email", "password")
+
+
+def test_session_logs_in_again_on_auth_failure():
+    """
+    Test that a GET redirected to the login page logs the client in again and is retried once.
+    """
+    client = GradescopeClient()
+    client.credentials = ("email", "password")
+    scores_url = "https://www.gradescope.com/courses/12345/assignments/67890/scores.csv"
+    responses = [mock_response("https://www.gradescope.com/login", redirected_from=scores_url), mock_response(scores_url)]
+
+    def submit_login(email, password):
+        client.login_generation += 1
+        return True
+
+    with patch.object(requests.Session, "request", side_effect=responses) as mock_request, \
+            patch.object(client, "_submit_login", side_effect=submit_login) as mock_submit_login:
+        response = client.session.get(scores_url)
+
+    assert response is responses[1]
+    assert mock_request.call_count == 2
+    mock_submit_login.assert_called_once_with("email", "password")
+
+
+def test_reauthenticate_once_for_concurrent_failures():
+    """
+    Test that a request that saw an expired session does not log in again if another thread already did.
+    """
+    client = GradescopeClient()
+    client.credentials = ("email", "password")
+    client.logged_in = True
+    login_generation = client.login_generation
+    client.login_generation += 1
+    with patch.object(client, "_submit_login") as mock_submit_login:
+        assert client.reauthenticate(login_generation)
+        mock_submit_login.assert_not_called()
+
+
+def test_cookies_persist_across_clients(tmp_path):
+    """
+    Test that a new client reads the cookies saved by the last login and trusts them without logging in.
+    """
+    cookie_path = str(tmp_path / "gradescope_cookies.json")
+    client = GradescopeClient(cookie_path=cookie_path)
+    client.session.cookies.set("signed_token", "abc", domain="www.gradescope.com", path="/")
+    client.logged_in = True
+    client.verified_at = time.time()
+    client._save_cookies()
+
+    restarted_client = GradescopeClient(cookie_path=cookie_path)
+    assert restarted_client.logged_in
+    assert restarted_client.session.cookies.get("signed_token", domain="www.gradescope.com") == "abc"
+    with patch.object(restarted_client, "verify_logged_in") as mock_verify, \
+            patch.object(restarted_client, "_submit_login") as mock_submit_login:
+        assert restarted_client.log_in("email", "password")
+        mock_verify.assert_not_called()
+        mock_submit_login.assert_not_called()
+
+
+def test_async_session_logs_in_again_on_auth_failure():
+    """
+    Test that an AsyncSession sharing a client's session logs the client in again on a 401 and retries.
+    """
+    client = GradescopeClient()
+    statuses = [401, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), text="Name,Total Score\nStudent1,90")
+
+    async_session = AsyncSession(lambda: client.session, transport=httpx.MockTransport(handler))
+    with patch.object(client, "reauthenticate", return_value=True) as mock_reauthenticate:
+        response = asyncio.run(async_session.get("https://www.gradescope.com/courses/12345/assignments/67890/scores.csv"))
+
+    assert response.status_code == 200
+    mock_reauthenticate.assert_called_once_with(0)
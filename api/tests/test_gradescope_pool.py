@@ -0,0 +1,75 @@
+"""
+These are unit tests for gradescopePool.py. Gradescope is never contacted: logins and responses are mocked.
+"""
+
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from api.gradescopeClient import GradescopeClient
+from api.gradescopePool import GradescopeClientPool, SessionPoolTimeout
+
+
+def test_checkout_lends_each_client_to_one_request():
+    """
+    Test that concurrent checkouts get different clients, and that a checkout waits once every client is in use.
+    """
+    pool = GradescopeClientPool(size=2, checkout_timeout_seconds=0.05)
+    with pool.checkout() as first, pool.checkout() as second:
+        assert first is not second
+        assert pool.stats()["in_use"] == 2
+        with pytest.raises(SessionPoolTimeout):
+            with pool.checkout():
+                pass
+    # The most recently returned client is lent first
+    with pool.checkout() as third:
+        assert third is first
+
+    stats = pool.stats()
+    assert stats["size"] == 2
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 3
+    assert stats["waited_checkouts"] == 0
+    assert stats["max_wait_ms"] >= 0
+
+
+def test_checkout_waits_for_a_returned_client():
+    """
+    Test that a checkout made while the pool is empty gets the next client that is returned, and counts the wait.
+    """
+    pool = GradescopeClientPool(size=1, checkout_timeout_seconds=5)
+    returned = threading.Event()
+
+    def hold_client():
+        with pool.checkout():
+            returned.wait(timeout=5)
+
+    holder = threading.Thread(target=hold_client)
+    holder.start()
+    while pool.stats()["in_use"] < 1:
+        returned.wait(0.01)
+    threading.Timer(0.05, returned.set).start()
+    with pool.checkout() as client:
+        assert client is pool.primary
+    holder.join()
+
+    stats = pool.stats()
+    assert stats["waited_checkouts"] == 1
+    assert stats["max_wait_ms"] > 0
+
+
+@patch.object(GradescopeClient, "log_in", return_value=True)
+def test_pooled_session_logs_in_and_uses_a_checked_out_client(mock_log_in):
+    """
+    Test that requests over `pool.session` log the checked-out client in with the pool's credentials, and are sent
+    with the pool's request timeout.
+    """
+    pool = GradescopeClientPool(size=2, request_timeout_seconds=12)
+    assert pool.log_in("email", "password")
+    response = MagicMock(status_code=200, history=[], url="https://www.gradescope.com/courses/12345/assignments")
+
+    with patch("requests.Session.request", return_value=response) as mock_request:
+        assert pool.session.get("https://www.gradescope.com/courses/12345/assignments") is response
+
+    assert mock_log_in.call_count == 2  # once by log_in, once by the checkout
+    assert mock_request.call_args.kwargs["timeout"] == 12
+    assert pool.stats()["checkouts"] == 1
@@ -3,10 +3,16 @@ These unit tests do not directly interact with Gradescope and PraireLearn.
 The return values from these services must be mocked.
 """
 
+import importlib
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
+from requests.exceptions import RequestException
 from api.app import app
+from api.asyncSession import AsyncSession
+from api.gradescopeClient import GradescopeClient
+import httpx
 
 @pytest.fixture
 def client():
@@ -90,6 +96,132 @@ def test_get_assignment_info_dummy_class(mock_client, client):
         print(response.json())
         assert response.json() == expected_json
 
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_fetch_all_grades_concurrent(mock_client, mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint downloads every assignment and reports failures per assignment.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+        "labs": {"2": {"conceptual": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"}}},
+    }
+
+    def mock_get(url):
+        mock_response = MagicMock()
+        if "5211616" in url:
+            mock_response.ok = False
+            mock_response.raise_for_status.side_effect = RequestException("500 Server Error")
+        mock_response.content = b"Name,Total Score\nStudent1,90"
+        return mock_response
+    mock_client.session.get.side_effect = mock_get
+
+    response = client.get("/fetchAllGrades", params={"class_id": "12345", "max_workers": 4})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "Lecture Quiz 1: Intro": [{"Name": "Student1", "Total Score": "90"}],
+        "Lab 2: Basics (Conceptual)": {"error": "Gradescope Error", "message": "500 Server Error"},
+    }
+    assert mock_client.session.get.call_count == 2
+
+
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_fetch_all_grades_served_from_grade_store(mock_client, mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint only downloads assignments that are not already in the grade store.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+    }
+    mock_client.session.get.return_value.content = b"Name,Total Score\nStudent1,90"
+
+    first_response = client.get("/fetchAllGrades", params={"class_id": "12345"})
+    second_response = client.get("/fetchAllGrades", params={"class_id": "12345", "with_metadata": True})
+
+    assert first_response.json() == {"Lecture Quiz 1: Intro": [{"Name": "Student1", "Total Score": "90"}]}
+    assert mock_client.session.get.call_count == 1
+    second_json = second_response.json()["Lecture Quiz 1: Intro"]
+    assert second_json["assignment_id"] == "5211613"
+    assert second_json["grades"] == [{"Name": "Student1", "Total Score": "90"}]
+    assert "fetched_at" in second_json
+
+
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_fetch_all_grades_stream_ndjson(mock_client, mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint streams one NDJSON line per assignment.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+        "labs": {"2": {"conceptual": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"}}},
+    }
+
+    def mock_get(url):
+        mock_response = MagicMock()
+        if "5211616" in url:
+            mock_response.ok = False
+            mock_response.raise_for_status.side_effect = RequestException("500 Server Error")
+        mock_response.content = b"Name,Total Score\nStudent1,90\nStudent2,85"
+        return mock_response
+    mock_client.session.get.side_effect = mock_get
+
+    response = client.get("/fetchAllGrades", params={"class_id": "12345", "stream": "ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["title"] for line in lines] == ["Lecture Quiz 1: Intro", "Lab 2: Basics (Conceptual)"]
+    assert lines[0]["grades"] == [{"Name": "Student1", "Total Score": "90"}, {"Name": "Student2", "Total Score": "85"}]
+    assert lines[1]["error"] == "Gradescope Error"
+
+
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_fetch_all_grades_stream_csv(mock_client, mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint streams a long-format CSV with one line per student per assignment.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+    }
+    mock_client.session.get.return_value.content = b"Name,Email,Total Score\nStudent1,s1@berkeley.edu,90"
+
+    response = client.get("/fetchAllGrades", params={"class_id": "12345", "stream": "csv"})
+
+    assert response.status_code == 200
+    assert response.text.splitlines() == [
+        "Assignment,Assignment ID,Name,SID,Email,Total Score,Max Points,Status",
+        "Lecture Quiz 1: Intro,5211613,Student1,,s1@berkeley.edu,90,,",
+    ]
+
+
+@patch("api.app.get_assignment_info")
+def test_fetch_all_grades_invalid_stream(mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint rejects an unknown stream format.
+    """
+    mock_get_assignment_info.return_value = {}
+
+    response = client.get("/fetchAllGrades", params={"stream": "xml"})
+
+    assert response.status_code == 400
+
+
+@patch("api.app.get_assignment_info")
+def test_fetch_all_grades_invalid_worker_count(mock_get_assignment_info, client):
+    """
+    Test the /fetchAllGrades endpoint rejects a worker count below 1.
+    """
+    mock_get_assignment_info.return_value = {}
+
+    response = client.get("/fetchAllGrades", params={"max_workers": 0})
+
+    assert response.status_code == 400
+
+
 @patch("api.app.client.open_by_key")  # Mock the Google Sheets client
 def test_write_to_sheet_success(mock_open_by_key, client):
     """
@@ -156,4 +288,112 @@ def test_write_to_sheet_failure(mock_open_by_key, client):
     # Verify that the mock methods were called correctly
     mock_open_by_key.assert_called_once_with("test_spreadsheet_id")
     mock_open_by_key.return_value.worksheet.assert_called_once_with("Sheet1")
-    mock_worksheet.update_acell.assert_called_once_with("A1", "Hello, World!")
\ No newline at end of file
+    mock_worksheet.update_acell.assert_called_once_with("A1", "Hello, World!")
+
+
+@patch("api.app.get_assignment_info")
+@patch("api.app.GRADESCOPE_CLIENT")
+def test_compute_grades(mock_client, mock_get_assignment_info, client):
+    """
+    Test the /computeGrades endpoint aggregates every student's scores and reports failed assignments.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+        "labs": {"2": {"conceptual": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"}}},
+    }
+
+    def mock_get(url):
+        mock_response = MagicMock()
+        if "5211616" in url:
+            mock_response.ok = False
+            mock_response.raise_for_status.side_effect = RequestException("500 Server Error")
+        mock_response.content = b"Name,SID,Email,Total Score,Max Points,Status\nStudent1,3031,student1@berkeley.edu,1.0,1.0,Graded"
+        return mock_response
+    mock_client.session.get.side_effect = mock_get
+
+    response = client.get("/computeGrades", params={"class_id": "12345"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["failed"] == {"5211616": "500 Server Error"}
+    assert len(body["students"]) == 1
+    student = body["students"][0]
+    assert (student["Name"], student["SID"], student["Email"]) == ("Student1", "3031", "student1@berkeley.edu")
+    assert student["full_credit_lecture_quizzes"] == 1
+    # No lab could be downloaded, so there is no lab score
+    assert student["lab_score"] is None
+
+
+def mock_async_gradescope(scores_csv: bytes, failing_assignment_id: str = None) -> AsyncSession:
+    """
+    Returns an AsyncSession whose Gradescope answers every scores.csv request with `scores_csv`,
+    except for `failing_assignment_id`, which gets a 500.
+    """
+    def handler(request):
+        if failing_assignment_id and failing_assignment_id in request.url.path:
+            return httpx.Response(500)
+        return httpx.Response(200, content=scores_csv)
+    return AsyncSession(transport=httpx.MockTransport(handler))
+
+
+@patch.object(GradescopeClient, "log_in", return_value=True)
+def test_fetch_grades_async(mock_log_in, client):
+    """
+    Test the /async/getGrades endpoint downloads grades without the blocking Gradescope session.
+    """
+    with patch("api.app.ASYNC_GRADESCOPE_SESSION", mock_async_gradescope(b"Name,Total Score\nStudent1,90\nStudent2,85", "67891")):
+        response = client.get("/async/getGrades", params={"class_id": "12345", "assignment_id": "67890"})
+        columnar = client.get("/async/getGrades", params={"class_id": "12345", "assignment_id": "67892",
+                                                          "file_type": "columnar"})
+        failure = client.get("/async/getGrades", params={"class_id": "12345", "assignment_id": "67891"})
+
+    assert response.status_code == 200
+    assert response.json() == [{"Name": "Student1", "Total Score": "90"}, {"Name": "Student2", "Total Score": "85"}]
+    assert columnar.json()["data"]["Total Score"] == [90.0, 85.0]
+    assert failure.status_code == 500
+    assert failure.json() == {"message": "Failed to fetch grades."}
+
+
+@patch.object(GradescopeClient, "log_in", return_value=True)
+def test_fetch_grades_serves_stored_grades_when_download_fails(mock_log_in, client, monkeypatch):
+    """
+    Test /getGrades and /async/getGrades return the stored grades of an assignment, with the time they were fetched,
+    when downloading them again fails, as /fetchAllGrades does.
+    """
+    monkeypatch.setattr(importlib.import_module("api.app"), "GRADE_STORE_MAX_AGE_SECONDS", 0)
+    params = {"class_id": "12345", "assignment_id": "67890", "with_metadata": True}
+    with patch("api.app.GRADESCOPE_CLIENT") as mock_client:
+        mock_client.session.get.return_value.content = b"Name,Total Score\nStudent1,90"
+        stored = client.get("/getGrades", params=params).json()
+        mock_client.session.get.return_value.ok = False
+        mock_client.session.get.return_value.status_code = 500
+        failed_refresh = client.get("/getGrades", params=params)
+        mock_client.session.get.side_effect = RequestException("Connection refused")
+        failed_connection = client.get("/getGrades", params=params)
+    with patch("api.app.ASYNC_GRADESCOPE_SESSION", mock_async_gradescope(b"", "67890")):
+        failed_async_refresh = client.get("/async/getGrades", params=params)
+
+    assert stored["grades"] == [{"Name": "Student1", "Total Score": "90"}]
+    for response in [failed_refresh, failed_connection, failed_async_refresh]:
+        assert response.status_code == 200
+        assert response.json() == stored
+
+
+@patch("api.app.get_assignment_info_async")
+def test_fetch_all_grades_async(mock_get_assignment_info, client):
+    """
+    Test the /async/fetchAllGrades endpoint downloads every assignment and reports failures per assignment.
+    """
+    mock_get_assignment_info.return_value = {
+        "lecture_quizzes": {"1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"}},
+        "labs": {"2": {"conceptual": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"}}},
+    }
+
+    with patch("api.app.ASYNC_GRADESCOPE_SESSION", mock_async_gradescope(b"Name,Total Score\nStudent1,90", "5211616")):
+        response = client.get("/async/fetchAllGrades", params={"class_id": "12345", "max_workers": 4})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["Lecture Quiz 1: Intro"] == [{"Name": "Student1", "Total Score": "90"}]
+    assert body["Lab 2: Basics (Conceptual)"]["error"] == "Gradescope Error"
+    assert "500 Internal Server Error" in body["Lab 2: Basics (Conceptual)"]["message"]
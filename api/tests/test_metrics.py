@@ -0,0 +1,98 @@
+"""
+These are unit tests for metrics.py and the /metrics endpoint. No upstream service is contacted: responses are mocked.
+"""
+
+import asyncio
+import httpx
+import pytest
+import requests
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from api.app import app
+from api.asyncSession import AsyncSession
+from api.gradescopeClient import GradescopeClient
+from api.metrics import time_upstream_request
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_time_upstream_request_records_latency_and_rate_limits():
+    """
+    Test that each request is counted under its status code, and that 429s and failed requests are counted too.
+    """
+    before_ok = sample("gradesync_upstream_request_seconds_count", upstream="sheets", status="200")
+    before_429 = sample("gradesync_upstream_rate_limited_total", upstream="sheets")
+    before_error = sample("gradesync_upstream_request_seconds_count", upstream="sheets", status="error")
+
+    with time_upstream_request("sheets") as request:
+        request["status"] = 200
+    with pytest.raises(requests.HTTPError):
+        with time_upstream_request("sheets"):
+            raise requests.HTTPError(response=MagicMock(status_code=429))
+    with pytest.raises(ConnectionError):
+        with time_upstream_request("sheets"):
+            raise ConnectionError()
+
+    assert sample("gradesync_upstream_request_seconds_count", upstream="sheets", status="200") == before_ok + 1
+    assert sample("gradesync_upstream_rate_limited_total", upstream="sheets") == before_429 + 1
+    assert sample("gradesync_upstream_request_seconds_count", upstream="sheets", status="error") == before_error + 1
+
+
+def test_gradescope_session_records_requests_and_reauthentication():
+    """
+    Test that requests over a client's session are timed, and that a retry after logging in again is counted.
+    """
+    client = GradescopeClient()
+    client.credentials = ("email", "password")
+    scores_url = "https://www.gradescope.com/courses/12345/assignments/67890/scores.csv"
+    expired = MagicMock(url="https://www.gradescope.com/login", status_code=200, history=[MagicMock(url=scores_url)])
+    ok = MagicMock(url=scores_url, status_code=200, history=[])
+    before_requests = sample("gradesync_upstream_request_seconds_count", upstream="gradescope", status="200")
+    before_retries = sample("gradesync_upstream_retries_total", upstream="gradescope", reason="reauthenticated")
+
+    with patch.object(requests.Session, "request", side_effect=[expired, ok]), \
+            patch.object(client, "reauthenticate", return_value=True):
+        assert client.session.get(scores_url) is ok
+
+    assert sample("gradesync_upstream_request_seconds_count", upstream="gradescope", status="200") == before_requests + 2
+    assert sample("gradesync_upstream_retries_total", upstream="gradescope", reason="reauthenticated") == before_retries + 1
+
+
+def test_async_session_counts_retries():
+    """
+    Test that an AsyncSession counts the connection errors it retries, under its upstream.
+    """
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("Connection refused")
+        return httpx.Response(200, json={"gradebook": []})
+
+    session = AsyncSession(transport=httpx.MockTransport(handler), upstream="prairielearn")
+    before = sample("gradesync_upstream_retries_total", upstream="prairielearn", reason="connection error")
+    with patch("api.asyncSession.strategies.Exponential") as mock_strategy, patch("random.random", return_value=0):
+        mock_strategy.return_value.time_to_sleep = 0
+        response = asyncio.run(session.get_with_backoff("https://us.prairielearn.com/pl/api/v1/gradebook"))
+
+    assert response.status_code == 200
+    assert sample("gradesync_upstream_retries_total", upstream="prairielearn", reason="connection error") == before + 1
+
+
+def test_metrics_endpoint():
+    """
+    Test that /metrics serves the Prometheus text format, including the counters of /getCacheStats.
+    """
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'gradesync_cache_lookups_total{cache="assignment_catalog",result="hit"}' in response.text
+    assert 'gradesync_upstream_calls_total{coalesced="true",upstream="gradescope"}' in response.text
+    assert "gradesync_session_pool_size 8.0" in response.text
+    # The cron job exports gradesync_sync_stage_seconds as a gauge; the API's histogram has its own name
+    assert "# TYPE gradesync_api_store_load_seconds histogram" in response.text
+    assert "gradesync_sync_stage_seconds" not in response.text
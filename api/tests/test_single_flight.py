@@ -0,0 +1,101 @@
+"""
+These are unit tests for singleFlight.py
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from api.singleFlight import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """
+    Test that callers arriving while a call is in flight share its result, and later callers make a new call.
+    """
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def download():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "Name,Total Score\nStudent1,90"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do(("scores.csv", "12345", "67890"), download)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    # Wait until every caller has joined the call in flight
+    while flights.stats()["calls"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["Name,Total Score\nStudent1,90"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"calls": 5, "coalesced_calls": 4, "in_flight": 0, "coalesced_rate": 0.8}
+
+    flights.do(("scores.csv", "12345", "67890"), download)
+    assert len(calls) == 2
+
+
+def test_single_flight_shares_exceptions():
+    """
+    Test that an exception raised by the call in flight is raised to every caller, and nothing is remembered.
+    """
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def download():
+        release.wait(timeout=5)
+        raise ConnectionError("Gradescope is down")
+
+    errors = []
+
+    def call():
+        try:
+            flights.do("key", download)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()["calls"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [str(error) for error in errors] == ["Gradescope is down"] * 3
+    assert flights.do("key", lambda: "recovered") == "recovered"
+
+
+def test_single_flight_do_async():
+    """
+    Test that concurrent coroutines share one call, and a cancelled caller does not cancel it for the others.
+    """
+    flights = SingleFlight()
+    calls = []
+
+    async def download():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"gradebook": []}
+
+    async def main():
+        cancelled = asyncio.ensure_future(flights.do_async("gradebook", download))
+        others = [asyncio.ensure_future(flights.do_async("gradebook", download)) for _ in range(3)]
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await asyncio.gather(*others)
+
+    assert asyncio.run(main()) == [{"gradebook": []}] * 3
+    assert len(calls) == 1
+    assert flights.stats()["coalesced_calls"] == 3
+    assert flights.stats()["in_flight"] == 0
@@ -2,9 +2,11 @@
 These are unit tests for utils.py
 """
 
+import asyncio
 import csv
 import pytest
-from api.utils import csv_to_json, handle_errors
+from api.utils import csv_to_json, handle_errors, run_concurrently, run_concurrently_async, convert_course_info_to_json
+from gradescopeCronJob.assignment_classifier import AssignmentClassifier
 from fastapi import HTTPException
 from requests.exceptions import RequestException
 
@@ -139,3 +141,147 @@ def test_handle_errors_unexpected_error():
         sample_function(trigger_error="unexpected_error")
     assert excinfo.value.status_code == 500
     assert excinfo.value.detail == "An unexpected server error occurred."
+
+
+def test_run_concurrently_collects_results_and_errors():
+    """
+    Test run_concurrently keeps going after one call fails and reports each outcome by key.
+    """
+    outcomes = run_concurrently(int, ["1", "x", "3", "1"], max_workers=2)
+
+    assert set(outcomes) == {"1", "x", "3"}
+    assert outcomes["1"] == (1, None)
+    assert outcomes["3"] == (3, None)
+    result, error = outcomes["x"]
+    assert result is None
+    assert isinstance(error, ValueError)
+
+
+def test_run_concurrently_invalid_worker_count():
+    """
+    Test run_concurrently rejects a worker count below 1.
+    """
+    with pytest.raises(ValueError):
+        run_concurrently(int, ["1"], max_workers=0)
+
+
+def test_run_concurrently_async_invalid_concurrency():
+    """
+    Test run_concurrently_async rejects a concurrency below 1, naming its own parameter.
+    """
+    async def parse(key):
+        return int(key)
+
+    with pytest.raises(ValueError, match="max_concurrency"):
+        asyncio.run(run_concurrently_async(parse, ["1"], max_concurrency=0))
+
+
+# An assignments page as downloaded from Gradescope, whose assignments are embedded as escaped JSON
+ASSIGNMENTS_PAGE = (
+    b'<div data-react-props="{\\"table_data\\":['
+    b'{\\"id\\":5211617,\\"title\\":\\"Lab 2: Basics (Code)\\"},'
+    b'{\\"id\\":5211616,\\"title\\":\\"Lab 2: Basics (Conceptual)\\"},'
+    b'{\\"id\\":5211615,\\"title\\":\\"Lab 10: Recursion\\"},'
+    b'{\\"id\\":5211614,\\"title\\":\\"Lecture Quiz 3: Lists\\"},'
+    b'{\\"id\\":5211613,\\"title\\":\\"Lecture Quiz 1: Intro\\"},'
+    b'{\\"id\\":5211618,\\"title\\":\\"Discussion 1: Lab Review\\"},'
+    b'{\\"id\\":5211619,\\"title\\":\\"Practice Midterm\\"},'
+    b'{\\"id\\":5211620,\\"title\\":\\"Midterm\\"},'
+    b'{\\"id\\":5211621,\\"title\\":\\"Project 1: Game\\"},'
+    b'{\\"id\\":5211622,\\"title\\":\\"Postterm 1\\"},'
+    b'{\\"id\\":5211623,\\"title\\":\\"Course Survey\\"}]}"></div>'
+)
+
+
+def test_convert_course_info_to_json_default_rules():
+    """
+    Test that the CS10 rules categorize, key and sort assignments, with the first matching rule winning.
+    """
+    catalog = convert_course_info_to_json(ASSIGNMENTS_PAGE)
+
+    assert catalog["lecture_quizzes"] == {
+        "1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"},
+        "3": {"title": "Lecture Quiz 3: Lists", "assignment_id": "5211614"},
+    }
+    assert catalog["labs"] == {
+        "2": {
+            "code": {"title": "Lab 2: Basics (Code)", "assignment_id": "5211617"},
+            "conceptual": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"},
+        },
+        "10": {"title": "Lab 10: Recursion", "assignment_id": "5211615"},
+    }
+    # "Discussion" comes before "Lab" in the rules
+    assert catalog["discussions"] == {"1": {"title": "Discussion 1: Lab Review", "assignment_id": "5211618"}}
+    assert catalog["midterms"] == {
+        "1": {"title": "Practice Midterm", "assignment_id": "5211619"},
+        "2": {"title": "Midterm", "assignment_id": "5211620"},
+    }
+    assert catalog["projects"] == {"1": {"title": "Project 1: Game", "assignment_id": "5211621"}}
+    assert catalog["postterms"] == {"1": {"title": "Postterm 1", "assignment_id": "5211622"}}
+    assert catalog["other"] == {"5211623": "Course Survey"}
+
+
+def test_convert_course_info_to_json_catalog_shape():
+    """
+    Test the categories of the catalog that /getAssignmentJSON returns with the CS10 rules: "postterms" has its own
+    category, and a title that mentions a lecture without being a "Lecture Quiz" is in "other".
+    """
+    page = ASSIGNMENTS_PAGE.replace(b'{\\"id\\":5211623', b'{\\"id\\":5211624,\\"title\\":\\"Lecture 5 Attendance\\"},{\\"id\\":5211623')
+
+    catalog = convert_course_info_to_json(page)
+
+    assert list(catalog) == ["lecture_quizzes", "discussions", "postterms", "midterms", "projects", "labs", "other"]
+    assert catalog["other"] == {"5211624": "Lecture 5 Attendance", "5211623": "Course Survey"}
+
+
+def test_convert_course_info_to_json_ignores_case():
+    """
+    Test that the CS10 rules ignore case, as the cron job's gradebook subsheets always have.
+    """
+    page = ASSIGNMENTS_PAGE.replace(b'{\\"id\\":5211623', b'{\\"id\\":5211633,\\"title\\":\\"lab 11: trees (code)\\"},'
+                                    b'{\\"id\\":5211634,\\"title\\":\\"DISCUSSION 7\\"},{\\"id\\":5211623')
+
+    catalog = convert_course_info_to_json(page)
+
+    assert catalog["labs"]["11"] == {"code": {"title": "lab 11: trees (code)", "assignment_id": "5211633"}}
+    assert catalog["discussions"]["7"] == {"title": "DISCUSSION 7", "assignment_id": "5211634"}
+
+
+def test_convert_course_info_to_json_keeps_parts_with_the_same_number():
+    """
+    Test that assignments with the same number and no part of their own, e.g. the four parts of a special case lab, are
+    all kept, named by their title.
+    """
+    page = ASSIGNMENTS_PAGE.replace(b'{\\"id\\":5211623', b'{\\"id\\":5211631,\\"title\\":\\"Lab 16: Python Part 1\\"},'
+                                    b'{\\"id\\":5211632,\\"title\\":\\"Lab 16: Python Part 2\\"},{\\"id\\":5211623')
+
+    catalog = convert_course_info_to_json(page)
+
+    assert catalog["labs"]["16"] == {
+        "Lab 16: Python Part 1": {"title": "Lab 16: Python Part 1", "assignment_id": "5211631"},
+        "Lab 16: Python Part 2": {"title": "Lab 16: Python Part 2", "assignment_id": "5211632"},
+    }
+
+
+def test_convert_course_info_to_json_configured_rules():
+    """
+    Test that a course's ASSIGNMENT_CATEGORIES replace the CS10 rules.
+    """
+    classifier = AssignmentClassifier.from_config({"ASSIGNMENT_CATEGORIES": [
+        {"category": "homeworks", "pattern": r"quiz \d+|lab \d+", "ignore_case": True,
+         "parts": {"written": "conceptual", "programming": "code"}},
+    ]})
+
+    catalog = convert_course_info_to_json(ASSIGNMENTS_PAGE, classifier)
+
+    assert list(catalog) == ["homeworks", "other"]
+    assert catalog["homeworks"] == {
+        "1": {"title": "Lecture Quiz 1: Intro", "assignment_id": "5211613"},
+        "2": {
+            "programming": {"title": "Lab 2: Basics (Code)", "assignment_id": "5211617"},
+            "written": {"title": "Lab 2: Basics (Conceptual)", "assignment_id": "5211616"},
+        },
+        "3": {"title": "Lecture Quiz 3: Lists", "assignment_id": "5211614"},
+        "10": {"title": "Lab 10: Recursion", "assignment_id": "5211615"},
+    }
+    assert "5211621" in catalog["other"]
@@ -10,11 +10,19 @@ import json
 from pydantic import BaseModel
 import logging
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import inspect
+import anyio
+import httpx
+from gradescopeCronJob.assignment_classifier import AssignmentClassifier, DEFAULT_CATEGORY_RULES, extract_assignments
 
 logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
 load_dotenv()
 GRADESCOPE_EMAIL = os.getenv("GRADESCOPE_EMAIL")
 GRADESCOPE_PASSWORD = os.getenv("GRADESCOPE_PASSWORD")
+GRADESCOPE_BASE_URL = "https://www.gradescope.com"
+DEFAULT_ASSIGNMENT_CLASSIFIER = AssignmentClassifier(DEFAULT_CATEGORY_RULES)
 
 def csv_to_json(csv_content: str):
     """
@@ -29,13 +37,77 @@ def csv_to_json(csv_content: str):
     csv_reader = csv.DictReader(io.StringIO(csv_content))
     return [row for row in csv_reader]
 
+def to_csv_line(values: list) -> str:
+    """
+    Formats one row of values as a CSV line, quoting values where needed.
+
+    Parameters:
+        values (list): The cell values of the row.
+
+    Returns:
+        str: The CSV line, including the trailing line terminator.
+    """
+    output = io.StringIO()
+    csv.writer(output).writerow(values)
+    return output.getvalue()
+
+def run_concurrently(func, keys: list, max_workers: int) -> dict:
+    """
+    Calls `func(key)` for every key on a bounded thread pool.
+
+    A failure for one key does not cancel the others; it is recorded next to that key instead.
+
+    Parameters:
+        func (function): A function of one argument. It is called from worker threads.
+        keys (list): The arguments to call `func` with. Duplicate keys are fetched once.
+        max_workers (int): The maximum number of calls in flight at the same time. Must be at least 1.
+
+    Returns:
+        dict: Maps each key to a `(result, error)` tuple. Exactly one of the two is `None`.
+
+    Example:
+        >>> run_concurrently(int, ["1", "x"], max_workers=2)
+        {"1": (1, None), "x": (None, ValueError("invalid literal for int() with base 10: 'x'"))}
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+    unique_keys = list(dict.fromkeys(keys))
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: executor.submit(func, key) for key in unique_keys}
+        for key, future in futures.items():
+            error = future.exception()
+            outcomes[key] = (None, error) if error is not None else (future.result(), None)
+    return outcomes
+
+async def run_concurrently_async(func, keys: list, max_concurrency: int) -> dict:
+    """
+    Awaits `func(key)` for every key on the event loop, with at most `max_concurrency` calls in flight.
+    Same as `run_concurrently`, but for coroutine functions, so no thread is held while a call waits.
+
+    Returns:
+        dict: Maps each key to a `(result, error)` tuple. Exactly one of the two is `None`.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(key):
+        async with semaphore:
+            try:
+                return key, (await func(key), None)
+            except Exception as e:
+                return key, (None, e)
+
+    return dict(await asyncio.gather(*(run_one(key) for key in dict.fromkeys(keys))))
+
 def handle_errors(func):
     """
     Decorator to handle common exceptions in API endpoints.
 
     This decorator wraps an API endpoint function to provide standardized error handling. 
     It catches specific exceptions, such as client-side errors (e.g., `ValueError`, `TypeError`, `AttributeError`) 
-    and network-related errors (`RequestException`), and returns appropriate HTTP responses with 
+    and network-related errors (`RequestException`, or `httpx.HTTPError` from async endpoints), and returns appropriate HTTP responses with 
     meaningful error messages. If an unexpected error occurs, it returns a 500 Internal Server Error.
 
     Parameters:
@@ -61,37 +133,59 @@ def handle_errors(func):
         Apply this decorator to any FastAPI endpoint to handle errors consistently, without needing
         to duplicate error-handling logic across multiple endpoints.
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                raise error_to_http_exception(e)
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             # Execute the wrapped function
             return func(*args, **kwargs)
-        
-        except (ValueError, TypeError, AttributeError) as e:
-            # Handle client-side errors (400-level)
-            tb = traceback.format_exc()
-            logging.error(f"Client-side error: {e}\nTraceback:\n{tb}")
-            raise HTTPException(status_code=400, detail="Invalid request: missing or incorrect parameters.")
-        
-        except RequestException as e:
-            # Handle network-related errors (503-level)
-            tb = traceback.format_exc()
-            logging.error(f"Network error: {e}\nTraceback:\n{tb}")
-            raise HTTPException(status_code=503, detail="Service unavailable: network error while connecting to Gradescope.")
-        
         except Exception as e:
-            # Handle all other unexpected server-side errors (500-level)
-            tb = traceback.format_exc()
-            logging.error(f"Unexpected server error: {e}\nTraceback:\n{tb}")
-            raise HTTPException(status_code=500, detail="An unexpected server error occurred.")
+            raise error_to_http_exception(e)
     return wrapper
 
+def error_to_http_exception(e: Exception) -> HTTPException:
+    """
+    Logs an error raised by an endpoint and converts it to the `HTTPException` described in `handle_errors`.
+    """
+    tb = traceback.format_exc()
+    if isinstance(e, (ValueError, TypeError, AttributeError)):
+        # Handle client-side errors (400-level)
+        logging.error(f"Client-side error: {e}\nTraceback:\n{tb}")
+        return HTTPException(status_code=400, detail="Invalid request: missing or incorrect parameters.")
+    if isinstance(e, (RequestException, httpx.HTTPError)):
+        # Handle network-related errors (503-level)
+        logging.error(f"Network error: {e}\nTraceback:\n{tb}")
+        return HTTPException(status_code=503, detail="Service unavailable: network error while connecting to Gradescope.")
+    # Handle all other unexpected server-side errors (500-level)
+    logging.error(f"Unexpected server error: {e}\nTraceback:\n{tb}")
+    return HTTPException(status_code=500, detail="An unexpected server error occurred.")
+
 def gradescope_session(client):
     """
     A decorator to log in and log out to GradeScope.
     After `GRADESCOPE_TIMEOUT` seconds of inactivity, the client automatically logs out.
+    A login that is still trusted (see `GradescopeClient.session_ttl_seconds`) costs no request to Gradescope.
     """
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    # fullGSapi logs in with blocking requests, so this one step runs on a worker thread
+                    await anyio.to_thread.run_sync(client.log_in, GRADESCOPE_EMAIL, GRADESCOPE_PASSWORD)
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    return {"message": "Unknown error: " + str(e)}
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
@@ -106,7 +200,7 @@ def gradescope_session(client):
     return decorator
 
 
-def convert_course_info_to_json(course_info_response: str):
+def convert_course_info_to_json(course_info_response, classifier: AssignmentClassifier = None):
     """
     Parses course assignment information from a JSON-formatted string and categorizes assignments into
     structured dictionaries based on assignment types such as lecture quizzes, labs, discussions, etc.
@@ -121,15 +215,19 @@ def convert_course_info_to_json(course_info_response: str):
     # TODO: Or statically cache this in a config file to avoid constant API calls to GradeScope
     # TODO: This JSON will be needed to periodically update grades (CRON job) for 1 particular assignment by inputting the assignmentID.
 
-    Each assignment is identified by its "id" and "title" and is categorized accordingly:
+    Each assignment is identified by its "id" and "title" and is categorized by the rules of `classifier`
+    (see gradescopeCronJob/assignment_classifier.py). With the default CS10 rules:
     - "lecture_quizzes": Contains lecture quizzes organized by numeric keys.
     - "labs": Contains labs, which may have "conceptual" and "code" subcategories.
     - "discussions": Contains discussions organized by numeric keys.
-    - Other categories can be added to the structure as needed.
+    - "midterms" and "postterms": Numbered in the order they appear.
+    - "projects": Contains projects organized by numeric keys.
+    - "other": Maps the IDs of all other assignments to their titles.
+    Courses with other assignment names configure their own rules with ASSIGNMENT_CATEGORIES.
 
     Parameters:
-    - course_info_response (str): A JSON-formatted string containing assignment details, including 
-      unique "id" and "title" fields for each assignment.
+    - course_info_response (bytes or str): The assignments page, containing the "id" and "title" of each assignment.
+    - classifier (AssignmentClassifier): The course's rules. Defaults to the CS10 rules.
 
     Returns:
     - dict: A dictionary with categorized assignments. Each category is structured as a dictionary
@@ -155,83 +253,8 @@ def convert_course_info_to_json(course_info_response: str):
         }
     }
     """
-    pattern = '{"id":[0-9]+,"title":"[^}"]+?"}'
-    info_for_all_assignments = re.findall(pattern, course_info_response)
-    assignment_to_categories = {
-        "lecture_quizzes": {},
-        "labs": {},
-        "discussions": {},
-        "midterms": {},
-        "projects": {},
-        "other": {}
-    }
-
-    for assignment in info_for_all_assignments:
-        assignment_as_json = json.loads(assignment)
-        assignment_id = str(assignment_as_json["id"])
-        title = assignment_as_json["title"]
-
-        # Categorize based on assignment title
-        if "Lecture Quiz" in title:
-            quiz_number = re.search(r'\d+', title)
-            if quiz_number:
-                key = quiz_number.group()
-                assignment_to_categories["lecture_quizzes"][key] = {
-                    "title": title,
-                    "assignment_id": assignment_id
-                }
-        elif "Discussion" in title:
-            discussion_number = re.search(r'\d+', title)
-            if discussion_number:
-                key = discussion_number.group()
-                assignment_to_categories["discussions"][key] = {
-                    "title": title,
-                    "assignment_id": assignment_id
-                }
-        elif "Midterm" in title or "Practice Midterm" in title:
-            midterm_key = len(assignment_to_categories["midterms"]) + 1
-            assignment_to_categories["midterms"][str(midterm_key)] = {
-                "title": title,
-                "assignment_id": assignment_id
-            }
-        elif "Project" in title:
-            project_number = re.search(r'\d+', title)
-            if project_number:
-                key = project_number.group()
-                assignment_to_categories["projects"][key] = {
-                    "title": title,
-                    "assignment_id": assignment_id
-                }
-        elif "Lab" in title:
-            lab_number = re.search(r'\d+', title)
-            if lab_number:
-                key = lab_number.group()
-                if key not in assignment_to_categories["labs"]:
-                    assignment_to_categories["labs"][key] = {}
-                if "Conceptual" in title:
-                    assignment_to_categories["labs"][key]["conceptual"] = {
-                        "title": title,
-                        "assignment_id": assignment_id
-                    }
-                elif "Code" in title:
-                    assignment_to_categories["labs"][key]["code"] = {
-                        "title": title,
-                        "assignment_id": assignment_id
-                    }
-                else:
-                    assignment_to_categories["labs"][key] = {
-                        "title": title,
-                        "assignment_id": assignment_id
-                    }
-        else:
-            assignment_to_categories["other"][assignment_id] = title
-
-    # Sort categories with numbers by extracting numbers
-    for category in ["lecture_quizzes", "labs", "projects", "discussions", "midterms"]:
-        sorted_items = dict(sorted(assignment_to_categories[category].items(), key=lambda item: int(item[0])))
-        assignment_to_categories[category] = sorted_items
-
-    return assignment_to_categories
+    classifier = classifier or DEFAULT_ASSIGNMENT_CLASSIFIER
+    return classifier.to_catalog(classifier.classify(extract_assignments(course_info_response)))
 
 def extract_assignment_ids(sub_dict: dict):
     """
@@ -0,0 +1,126 @@
+"""
+Times categorizing the assignments page of a synthetic 5,000-assignment course with the shared AssignmentClassifier
+(`convert_course_info_to_json`), against the previous implementation, which parsed every assignment with json.loads
+and tested each title against a chain of substring checks.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_assignment_classifier --assignments 5000
+
+Results in a Linux container (Python 3.11, one core), 5,000 assignments (a 0.3 MB page). The CS10 rules are plain
+keywords, so titles are classified with substring checks and a title's number is found with one precompiled regex.
+    stage                              ms
+    extract (one findall)             4.5
+    classify (one match per title)    8.6
+    to_catalog                        5.9
+    total                            19.0
+    previous implementation          24.6
+"""
+import argparse
+import json
+import re
+import time
+
+from benchmarks import stubs
+from gradescopeCronJob.assignment_classifier import AssignmentClassifier, DEFAULT_CATEGORY_RULES, extract_assignments
+
+TITLE_TEMPLATES = [
+    "Lecture Quiz {number}: Topic {number}",
+    "Lab {number}: Basics (Conceptual)",
+    "Lab {number}: Basics (Code)",
+    "Discussion {number}: Overview",
+    "Project {number}: Build Your Own Game",
+    "Midterm {number}",
+    "Postterm {number}",
+    "Survey {number}",
+]
+
+
+def make_assignments_page(num_assignments: int) -> bytes:
+    """
+    Returns a page shaped like a Gradescope assignments page, whose assignments are embedded as escaped JSON.
+    """
+    titles = {}
+    for index in range(num_assignments):
+        template = TITLE_TEMPLATES[index % len(TITLE_TEMPLATES)]
+        titles[5200000 + index] = template.format(number=index // len(TITLE_TEMPLATES) + 1)
+    return stubs.make_assignments_page(titles)
+
+
+def previous_convert_course_info_to_json(course_info_response: str) -> dict:
+    """
+    The implementation of convert_course_info_to_json before AssignmentClassifier, kept for comparison.
+    """
+    info_for_all_assignments = re.findall('{"id":[0-9]+,"title":"[^}"]+?"}', course_info_response)
+    categories = {"lecture_quizzes": {}, "labs": {}, "discussions": {}, "midterms": {}, "projects": {}, "other": {}}
+    for assignment in info_for_all_assignments:
+        assignment_as_json = json.loads(assignment)
+        assignment_id, title = str(assignment_as_json["id"]), assignment_as_json["title"]
+        entry = {"title": title, "assignment_id": assignment_id}
+        number = re.search(r'\d+', title)
+        if "Lecture Quiz" in title:
+            if number:
+                categories["lecture_quizzes"][number.group()] = entry
+        elif "Discussion" in title:
+            if number:
+                categories["discussions"][number.group()] = entry
+        elif "Midterm" in title or "Practice Midterm" in title:
+            categories["midterms"][str(len(categories["midterms"]) + 1)] = entry
+        elif "Project" in title:
+            if number:
+                categories["projects"][number.group()] = entry
+        elif "Lab" in title:
+            if number:
+                lab = categories["labs"].setdefault(number.group(), {})
+                if "Conceptual" in title:
+                    lab["conceptual"] = entry
+                elif "Code" in title:
+                    lab["code"] = entry
+                else:
+                    categories["labs"][number.group()] = entry
+        else:
+            categories["other"][assignment_id] = title
+    for category in ["lecture_quizzes", "labs", "projects", "discussions", "midterms"]:
+        categories[category] = dict(sorted(categories[category].items(), key=lambda item: int(item[0])))
+    return categories
+
+
+def best_time(function, repeats: int):
+    """
+    Returns the result of the last call and the fastest of `repeats` calls, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start_time)
+    return result, min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assignments", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    page = make_assignments_page(args.assignments)
+    classifier = AssignmentClassifier(DEFAULT_CATEGORY_RULES)
+    assignments, extract_time = best_time(lambda: extract_assignments(page), args.repeats)
+    classified, classify_time = best_time(lambda: classifier.classify(assignments), args.repeats)
+    catalog, catalog_time = best_time(lambda: classifier.to_catalog(classified), args.repeats)
+    previous, previous_time = best_time(
+        lambda: previous_convert_course_info_to_json(str(page).replace("\\", "")), args.repeats)
+    # The previous implementation had no postterms category, so postterms were in "other"
+    assert {category: assignments for category, assignments in catalog.items() if category not in ("postterms", "other")} \
+        == {category: assignments for category, assignments in previous.items() if category != "other"}
+
+    print(f"{len(assignments)} assignments, {len(page) / 1e6:.1f} MB page")
+    print(f"{'stage':<31} {'ms':>5}")
+    print(f"{'extract (one findall)':<31} {extract_time:>5.1f}")
+    print(f"{'classify (one match per title)':<31} {classify_time:>5.1f}")
+    print(f"{'to_catalog':<31} {catalog_time:>5.1f}")
+    print(f"{'total':<31} {extract_time + classify_time + catalog_time:>5.1f}")
+    print(f"{'previous implementation':<31} {previous_time:>5.1f}")
+
+
+if __name__ == "__main__":
+    main()
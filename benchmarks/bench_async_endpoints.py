@@ -0,0 +1,104 @@
+"""
+Load-tests `/getGrades` against `/async/getGrades` with many concurrent clients. The API runs under uvicorn and
+downloads every request's `scores.csv` from a local stub Gradescope server that sleeps `--latency` seconds per request.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_async_endpoints --concurrency 50,100,200 --latency 1.0
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`).
+Nothing is sent to Gradescope: the login is skipped and the Gradescope host is replaced by the stub, which runs in a
+separate process.
+
+Results in a Linux container (Python 3.11, one core shared by the load generator, the API and the stub), 20 students,
+1.0 s stub latency, one request per client. The sync endpoint holds one of the 40 threadpool workers for each
+download, so beyond 40 clients requests wait in line for a worker. The async endpoint starts every download at once,
+but each response is still saved to the grade store, whose SQLite writes are serialized; with that single core, this
+is what limits both endpoints here (with the saves skipped, the async endpoint served 33.7 / 51.9 / 45.6 req/s
+against 21.8 / 28.0 / 32.5).
+    endpoint            clients  req/s  p50 ms  p95 ms  max ms
+    /getGrades               50   20.9  1403.0  2343.0  2348.3
+    /async/getGrades         50   24.1  1561.3  1865.0  2062.0
+    /getGrades              100   26.3  2655.7  3700.4  3726.7
+    /async/getGrades        100   35.3  2061.2  2607.8  2812.1
+    /getGrades              200   29.7  4262.5  6628.3  6640.6
+    /async/getGrades        200   35.5  3943.3  5396.9  5614.4
+"""
+import argparse
+import asyncio
+import importlib
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import uvicorn
+
+from api.gradeStore import GradeStore
+from api.gradescopeClient import GradescopeClient
+from benchmarks.stubs import StubGradescopeHandler, start_stub_server_process
+
+CLASS_ID = "831412"
+
+
+async def load_test(base_url: str, path: str, num_clients: int) -> tuple:
+    """
+    Sends `num_clients` concurrent requests for different assignments.
+    Returns the wall-clock time in seconds and the sorted latency of every request in milliseconds.
+    """
+    limits = httpx.Limits(max_connections=num_clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one_request(number):
+            start_time = time.perf_counter()
+            response = await client.get(path, params={"class_id": CLASS_ID, "assignment_id": str(5200000 + number)})
+            response.raise_for_status()
+            return (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        latencies = await asyncio.gather(*(one_request(number) for number in range(num_clients)))
+        return time.perf_counter() - start_time, sorted(latencies)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Returns the value below which `fraction` of the sorted values lie (nearest rank).
+    """
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="50,100,200", help="Comma-separated numbers of concurrent clients.")
+    parser.add_argument("--students", type=int, default=20, help="Number of rows in each scores.csv.")
+    parser.add_argument("--latency", type=float, default=1.0, help="Seconds the stub sleeps per request.")
+    args = parser.parse_args()
+
+    app_module = importlib.import_module("api.app")
+    stub_process, stub_url = start_stub_server_process(StubGradescopeHandler, latency=args.latency, num_students=args.students)
+    api_server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=0, log_level="warning",
+                                               backlog=4096))
+    with tempfile.TemporaryDirectory() as directory, \
+            patch.object(GradescopeClient, "log_in", return_value=True), \
+            patch.object(app_module, "GRADESCOPE_BASE_URL", stub_url), \
+            patch.object(app_module, "GRADE_STORE", GradeStore(f"{directory}/grades.sqlite3")), \
+            patch.object(app_module, "GRADE_STORE_MAX_AGE_SECONDS", 0):
+        threading.Thread(target=api_server.run, daemon=True).start()
+        while not api_server.started:
+            time.sleep(0.05)
+        port = api_server.servers[0].sockets[0].getsockname()[1]
+        api_url = f"http://127.0.0.1:{port}"
+        try:
+            print(f"{args.students} students, {args.latency}s stub latency")
+            print(f"{'endpoint':<18} {'clients':>8} {'req/s':>6} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7}")
+            for num_clients in [int(level) for level in args.concurrency.split(",")]:
+                for path in ["/getGrades", "/async/getGrades"]:
+                    elapsed, latencies = asyncio.run(load_test(api_url, path, num_clients))
+                    print(f"{path:<18} {num_clients:>8} {num_clients / elapsed:>6.1f} {percentile(latencies, 0.5):>7.1f} "
+                          f"{percentile(latencies, 0.95):>7.1f} {latencies[-1]:>7.1f}")
+        finally:
+            api_server.should_exit = True
+            stub_process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares parsing a Gradescope `scores.csv` with `csv_to_json` (a list of `csv.DictReader` rows) against
+`ColumnarGrades.from_csv`: parse time, memory retained by the parsed result, and JSON response size.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_columnar --students 200,1500,20000
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`).
+
+Results in a Linux container (Python 3.11), 10 question columns. Columnar parsing is somewhat slower,
+because of the transpose and type detection, but the result holds ~7.5x less memory, the response is
+~4x smaller, and scores arrive as numbers so consumers do not parse them again.
+    students parser       parse ms  retained MB  JSON MB
+         200 DictReader        0.8         0.29     0.13
+         200 columnar          1.7         0.05     0.03
+        1500 DictReader       11.6         2.21     0.95
+        1500 columnar         13.3         0.29     0.23
+       20000 DictReader      140.7        29.17    12.74
+       20000 columnar        221.0         3.86     3.05
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from api.columnar import ColumnarGrades
+from api.utils import csv_to_json
+from benchmarks.stubs import make_scores_csv
+
+
+def best_time(parse, csv_content: str, repeats: int) -> float:
+    """
+    Returns the fastest of `repeats` parses, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        parse(csv_content)
+        timings.append(time.perf_counter() - start_time)
+    return min(timings) * 1000
+
+
+def retained_memory(parse, csv_content: str) -> float:
+    """
+    Returns the memory held by the parsed result once parsing is finished, in MB.
+    """
+    tracemalloc.start()
+    result = parse(csv_content)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", default="200,1500,20000", help="Comma-separated course sizes.")
+    parser.add_argument("--questions", type=int, default=10, help="Number of question columns.")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of timed parses per measurement.")
+    args = parser.parse_args()
+
+    parsers = [
+        ("DictReader", csv_to_json, lambda rows: json.dumps(rows)),
+        ("columnar", ColumnarGrades.from_csv, lambda grades: json.dumps(grades.to_json())),
+    ]
+    print(f"{'students':>8} {'parser':<11} {'parse ms':>9} {'retained MB':>12} {'JSON MB':>8}")
+    for num_students in [int(size) for size in args.students.split(",")]:
+        csv_content = make_scores_csv("5211613", num_students, num_questions=args.questions)
+        for name, parse, serialize in parsers:
+            parse_time = best_time(parse, csv_content, args.repeats)
+            memory = retained_memory(parse, csv_content)
+            json_size = len(serialize(parse(csv_content))) / 1e6
+            print(f"{num_students:>8} {name:<11} {parse_time:>9.1f} {memory:>12.2f} {json_size:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Times `/computeGrades` on a synthetic course whose scores are already in the grade store: building the
+student x assignment matrix from SQLite (first call), and a repeated call that reuses the cached matrix.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_compute_grades --students 2000 --assignments 100
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`).
+
+Results in a Linux container (Python 3.11, one core), 2,000 students x 100 assignments (200,000 scores).
+Most of a first call is reading 200,000 rows from SQLite; the policy itself takes a few milliseconds.
+    stage                          ms
+    first call (matrix + policy)  883.2
+    repeated call (cached)         12.6
+      of which the policy           3.4
+"""
+import argparse
+import importlib
+import tempfile
+import time
+from unittest.mock import patch
+
+from api.gradeAggregation import ScoreMatrix, compute_course_grades
+from api.gradeStore import GradeStore
+from benchmarks.stubs import make_scores_csv
+
+CLASS_ID = "831412"
+
+
+def make_catalog(num_assignments: int) -> dict:
+    """
+    Splits `num_assignments` into two-part labs, lecture quizzes, discussions and projects, shaped like
+    the output of `get_assignment_info`.
+    """
+    catalog = {"lecture_quizzes": {}, "labs": {}, "discussions": {}, "projects": {}}
+    for index in range(num_assignments):
+        assignment_id = str(5200000 + index)
+        number = str(index // 4 + 1)
+        kind = index % 4
+        if kind == 0:
+            catalog["lecture_quizzes"][number] = {"title": f"Lecture Quiz {number}", "assignment_id": assignment_id}
+        elif kind == 1:
+            catalog["labs"].setdefault(number, {})["conceptual"] = {"title": f"Lab {number} (Conceptual)", "assignment_id": assignment_id}
+        elif kind == 2:
+            catalog["labs"].setdefault(number, {})["code"] = {"title": f"Lab {number} (Code)", "assignment_id": assignment_id}
+        elif int(number) % 3 == 0:
+            catalog["projects"][number] = {"title": f"Project {number}", "assignment_id": assignment_id}
+        else:
+            catalog["discussions"][number] = {"title": f"Discussion {number}", "assignment_id": assignment_id}
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--assignments", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    app_module = importlib.import_module("api.app")
+    catalog = make_catalog(args.assignments)
+    assignments = [(assignment_id, title) for title, assignment_id in app_module.get_ids_for_all_assignments(catalog)]
+    assignment_ids = [assignment_id for assignment_id, _ in assignments]
+    with tempfile.TemporaryDirectory() as directory:
+        store = GradeStore(f"{directory}/grades.sqlite3")
+        for assignment_id in assignment_ids:
+            store.save_assignment(CLASS_ID, assignment_id, make_scores_csv(assignment_id, args.students))
+        with patch.object(app_module, "GRADE_STORE", store), \
+                patch.object(app_module, "get_assignment_info", lambda class_id: catalog), \
+                patch.object(app_module, "SCORE_MATRIX_CACHE", {}):
+            start_time = time.perf_counter()
+            first = app_module.compute_grades(CLASS_ID)
+            first_call = time.perf_counter() - start_time
+            timings = []
+            for _ in range(args.repeats):
+                start_time = time.perf_counter()
+                app_module.compute_grades(CLASS_ID)
+                timings.append(time.perf_counter() - start_time)
+            matrix = ScoreMatrix.from_rows(assignment_ids, store.get_scores(CLASS_ID, assignment_ids))
+            policy_timings = []
+            for _ in range(args.repeats):
+                start_time = time.perf_counter()
+                compute_course_grades(matrix, assignments, app_module.ASSIGNMENT_CLASSIFIER, 3, [0], [], 80)
+                policy_timings.append(time.perf_counter() - start_time)
+
+    print(f"{len(first['students'])} students x {args.assignments} assignments")
+    print(f"{'stage':<30} {'ms':>6}")
+    print(f"{'first call (matrix + policy)':<30} {first_call * 1000:>6.1f}")
+    print(f"{'repeated call (cached)':<30} {min(timings) * 1000:>6.1f}")
+    print(f"{'  of which the policy':<30} {min(policy_timings) * 1000:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Runs a whole cron sync (`push_all_grade_data_to_sheets`) and the API's endpoints end-to-end against local stub Gradescope,
+PrairieLearn and Google Sheets servers (see `stubs.py`), and reports throughput and latency percentiles.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_end_to_end --students 200 --assignments 78 --latency 0.05 --rate-limit 0.02
+
+Nothing is sent to the live services, but `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`), because importing
+the cron job and the API requires it, and the cron job logs to /var/log/cron.log, which must be writable. Both logins
+are skipped. The stubs run in separate processes, each sleeping `--latency` seconds per request and answering a
+`--rate-limit` fraction of requests with a 429:
+- The cron job's Gradescope session is redirected to the stub with a `RedirectAdapter`, its PrairieLearn requests with
+  `PL_SERVER`, and its Sheets client is built against the stub spreadsheet. Every run of the sync is a cold start
+  (subsheet ids are looked up again), but digests persist between runs as they do between cron runs, so with
+  `SKIP_UNCHANGED_ASSIGNMENTS` every run after the first skips the unchanged assignments.
+- The API runs under uvicorn, with Gradescope and PrairieLearn replaced by the stubs, an empty grade store, and
+  `GRADE_STORE_MAX_AGE_SECONDS` of 0 so that every request downloads from the stub.
+
+Results in a Linux container (Python 3.11, one core shared by the three stubs, the sync, the API and the load
+generator), 200 students, 78 assignments, 0.05 s stub latency, 2% of requests rate limited, 3 sync runs and 20
+concurrent API clients. The first sync pastes every assignment; the later ones find every assignment unchanged, so they
+only scrape the catalog, look up the subsheet ids and gradebook columns, and download. Most of the first run is spent
+waiting for the Sheets write quota (one batch chunk per second, `SHEETS_WRITE_REQUESTS_PER_MINUTE`) and backing off
+after the 429. On the API side, the single core is the limit: the stub answers in 50 ms, but /getGrades waits about
+650 ms for the API, the stubs and the SQLite saves to get their turn.
+    sync run  seconds  assignments/s  requests
+           1     6.08           12.8  gradescope 79, prairielearn 1, sheets 88
+           2     2.06           37.9  gradescope 79, prairielearn 1, sheets 9
+           3     2.02           38.7  gradescope 79, prairielearn 1, sheets 9
+    upstream      requests  429s  p50 ms  p95 ms  p99 ms  max ms
+    gradescope         237     5    80.8   118.7   142.9   146.7
+    prairielearn         3     0    64.3    71.3    71.3    71.3
+    sheets             106     1    52.7    76.6   114.7   150.2
+    endpoint              requests  errors  req/s  p50 ms  p95 ms  p99 ms  max ms
+    /getGrades                 200       0   22.9   656.8  1672.4  2068.4  2076.5
+    /async/getGrades           200       4   25.2   732.3  1011.1  2322.6  2659.8
+    /getAssignmentJSON         200       0  143.0   107.8   308.3   412.4   519.6
+    /getPLGrades               200       0   15.3  1183.7  2160.0  2355.8  2496.6
+    /fetchAllGrades             20       0    0.8 24588.8 24635.6 24635.6 24635.6
+Errors are responses with an error status. A rate-limited download fails /async/getGrades with a 503, but /getGrades
+reports it in the "message" of a 200 response (see `gradescope_session`), and /fetchAllGrades logs it and returns the
+other assignments. Concurrent /getPLGrades and /getAssignmentJSON requests share one upstream call, so few of them
+meet a 429.
+"""
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import httplib2
+import httpx
+import uvicorn
+from googleapiclient.discovery import build
+
+from api.cache import TTLCache
+from api.gradeStore import GradeStore
+from api.gradescopeClient import GradescopeClient
+from benchmarks.bench_async_endpoints import percentile
+from benchmarks.stubs import (RedirectAdapter, StubGradescopeHandler, StubPrairieLearnHandler, StubSheetsHandler,
+                              make_course_titles, start_stub_server_process)
+
+CRON_JOB_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gradescopeCronJob")
+GRADESCOPE_URL = "https://www.gradescope.com"
+CLASS_ID = "831412"
+
+
+def import_cron_job():
+    """
+    Imports gradescope_to_spreadsheet.py the way cron runs it: as a script next to its sibling modules, without arguments.
+    """
+    sys.path.insert(0, CRON_JOB_DIRECTORY)
+    with patch.object(sys, "argv", [sys.argv[0]]):
+        cron_job = importlib.import_module("gradescope_to_spreadsheet")
+    cron_job.logger.setLevel(logging.WARNING)
+    # Every Sheets 429 is retried, and counted in the results
+    logging.getLogger("backoff").setLevel(logging.WARNING)
+    return cron_job
+
+
+def run_syncs(cron_job, num_runs: int, gradescope_url: str, pl_url: str, sheets_url: str) -> tuple:
+    """
+    Runs the sync `num_runs` times against the stubs.
+    Returns the (seconds, assignments, {upstream: requests}) of every run, and {upstream: [(seconds, status), ...]}.
+    """
+    upstream_requests = {}
+    observe_upstream_request = cron_job.sync_metrics.observe_upstream_request
+
+    def record_request(upstream, seconds, status):
+        upstream_requests.setdefault(upstream, []).append((seconds, status))
+        observe_upstream_request(upstream, seconds, status)
+
+    def log_in(gradescope_client, email, password):
+        gradescope_client.logged_in = True
+        return True
+
+    initialize_gs_client = cron_job.initialize_gs_client
+
+    def initialize_stub_gs_client():
+        gradescope_client = initialize_gs_client()
+        gradescope_client.session.mount(GRADESCOPE_URL, RedirectAdapter(gradescope_url, pool_maxsize=cron_job.DOWNLOAD_WORKERS))
+        return gradescope_client
+
+    def create_stub_sheet_api_instance():
+        return build("sheets", "v4", http=httplib2.Http(), client_options={"api_endpoint": sheets_url},
+                     static_discovery=True).spreadsheets()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as state_directory, \
+            patch.object(cron_job.GradescopeClient.GradescopeClient, "log_in", log_in), \
+            patch.object(cron_job, "initialize_gs_client", initialize_stub_gs_client), \
+            patch.object(cron_job, "create_sheet_api_instance", create_stub_sheet_api_instance), \
+            patch.object(cron_job, "PL_SERVER", pl_url + "/pl/api/v1"), \
+            patch.object(cron_job, "STATE_DIRECTORY", state_directory), \
+            patch.object(cron_job, "ASSIGNMENT_DIGESTS_PATH", os.path.join(state_directory, "assignment_digests.json")), \
+            patch.object(cron_job, "SYNC_CHECKPOINT_PATH", os.path.join(state_directory, "sync_checkpoint.json")), \
+            patch.object(cron_job, "ASSIGNMENT_ACTIVITY_PATH", os.path.join(state_directory, "assignment_activity.json")), \
+            patch.object(cron_job, "assignment_activity",
+                         cron_job.sync_tiers.AssignmentActivity(os.path.join(state_directory, "assignment_activity.json"))), \
+            patch.object(cron_job, "DOWNLOAD_CACHE_DIRECTORY", os.path.join(state_directory, "download_cache")), \
+            patch.object(cron_job, "download_cache", None), \
+            patch.object(cron_job.sync_metrics, "observe_upstream_request", record_request):
+        for _ in range(num_runs):
+            # Every cron run is a new process, which looks the subsheet ids up again
+            cron_job.subsheet_titles_to_ids = None
+            requests_before = {upstream: len(requests) for upstream, requests in upstream_requests.items()}
+            start_time = time.perf_counter()
+            cron_job.push_all_grade_data_to_sheets()
+            elapsed = time.perf_counter() - start_time
+            requests_made = {upstream: len(requests) - requests_before.get(upstream, 0)
+                             for upstream, requests in upstream_requests.items()}
+            runs.append((elapsed, len(cron_job.run_profile.assignments), requests_made))
+    return runs, upstream_requests
+
+
+async def load_test_endpoint(base_url: str, path: str, make_params, num_requests: int, concurrency: int) -> tuple:
+    """
+    Sends `num_requests` requests, at most `concurrency` at a time, with the parameters `make_params(number)`.
+    Returns the wall-clock time in seconds, the number of failed requests, and the sorted latencies in milliseconds.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def one_request(number):
+            async with semaphore:
+                start_time = time.perf_counter()
+                response = await client.get(path, params=make_params(number))
+                return (time.perf_counter() - start_time) * 1000, response.is_error
+
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*(one_request(number) for number in range(num_requests)))
+        elapsed = time.perf_counter() - start_time
+    return elapsed, sum(failed for _, failed in results), sorted(latency for latency, _ in results)
+
+
+def run_api_load_tests(num_requests: int, concurrency: int, num_assignments: int, gradescope_url: str, pl_url: str) -> list:
+    """
+    Load-tests the API's endpoints against the stubs. Returns (path, requests, errors, seconds, sorted latencies) tuples.
+    """
+    app_module = importlib.import_module("api.app")
+    assignment_ids = list(make_course_titles(num_assignments))
+    # (path, parameters of the n-th request, number of requests)
+    endpoints = [
+        ("/getGrades", lambda number: {"class_id": CLASS_ID, "assignment_id": assignment_ids[number % len(assignment_ids)]}, num_requests),
+        ("/async/getGrades", lambda number: {"class_id": CLASS_ID, "assignment_id": assignment_ids[number % len(assignment_ids)]}, num_requests),
+        ("/getAssignmentJSON", lambda number: {"class_id": CLASS_ID}, num_requests),
+        ("/getPLGrades", lambda number: {}, num_requests),
+        # Every request downloads the whole course
+        ("/fetchAllGrades", lambda number: {"class_id": CLASS_ID}, max(1, num_requests // 10)),
+    ]
+    api_server = uvicorn.Server(uvicorn.Config(app_module.app, host="127.0.0.1", port=0, log_level="error", backlog=4096))
+    results = []
+    with tempfile.TemporaryDirectory() as directory, \
+            patch.object(GradescopeClient, "log_in", return_value=True), \
+            patch.object(app_module, "GRADESCOPE_BASE_URL", gradescope_url), \
+            patch.object(app_module, "PL_SERVER", pl_url + "/pl/api/v1"), \
+            patch.object(app_module, "GRADE_STORE", GradeStore(f"{directory}/grades.sqlite3")), \
+            patch.object(app_module, "ASSIGNMENT_CATALOG_CACHE", TTLCache(ttl_seconds=app_module.ASSIGNMENT_CATALOG_TTL_SECONDS)), \
+            patch.object(app_module, "GRADE_STORE_MAX_AGE_SECONDS", 0):
+        threading.Thread(target=api_server.run, daemon=True).start()
+        while not api_server.started:
+            time.sleep(0.05)
+        port = api_server.servers[0].sockets[0].getsockname()[1]
+        try:
+            for path, make_params, endpoint_requests in endpoints:
+                elapsed, errors, latencies = asyncio.run(load_test_endpoint(
+                    f"http://127.0.0.1:{port}", path, make_params, endpoint_requests, concurrency))
+                results.append((path, endpoint_requests, errors, elapsed, latencies))
+        finally:
+            api_server.should_exit = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=200, help="Number of students in the course.")
+    parser.add_argument("--assignments", type=int, default=78, help="Number of assignments in the course.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each stub sleeps per request.")
+    parser.add_argument("--rate-limit", type=float, default=0.02, help="Fraction of requests the stubs answer with a 429.")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cron syncs to run.")
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per API endpoint.")
+    parser.add_argument("--concurrency", type=int, default=20, help="Number of concurrent API clients.")
+    parser.add_argument("--skip-sync", action="store_true", help="Only load-test the API.")
+    parser.add_argument("--skip-api", action="store_true", help="Only run the cron syncs.")
+    args = parser.parse_args()
+
+    stub_attributes = {"latency": args.latency, "rate_limit_fraction": args.rate_limit, "num_students": args.students}
+    stubs = [
+        start_stub_server_process(StubGradescopeHandler, num_assignments=args.assignments, **stub_attributes),
+        start_stub_server_process(StubPrairieLearnHandler, **stub_attributes),
+        start_stub_server_process(StubSheetsHandler, **stub_attributes),
+    ]
+    (_, gradescope_url), (_, pl_url), (_, sheets_url) = stubs
+    print(f"{args.students} students, {args.assignments} assignments, {args.latency}s stub latency, "
+          f"{args.rate_limit:.0%} of requests rate limited")
+    try:
+        if not args.skip_sync:
+            runs, upstream_requests = run_syncs(import_cron_job(), args.runs, gradescope_url, pl_url, sheets_url)
+            print(f"{'sync run':>8} {'seconds':>8} {'assignments/s':>14}  requests")
+            for number, (elapsed, num_assignments, requests_made) in enumerate(runs, start=1):
+                print(f"{number:>8} {elapsed:>8.2f} {num_assignments / elapsed:>14.1f}  "
+                      + ", ".join(f"{upstream} {count}" for upstream, count in sorted(requests_made.items())))
+            print(f"{'upstream':<12} {'requests':>9} {'429s':>5} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+            for upstream, requests in sorted(upstream_requests.items()):
+                latencies = sorted(seconds * 1000 for seconds, _ in requests)
+                rate_limited = sum(status == 429 for _, status in requests)
+                print(f"{upstream:<12} {len(requests):>9} {rate_limited:>5} {percentile(latencies, 0.5):>7.1f} "
+                      f"{percentile(latencies, 0.95):>7.1f} {percentile(latencies, 0.99):>7.1f} {latencies[-1]:>7.1f}")
+        if not args.skip_api:
+            results = run_api_load_tests(args.requests, args.concurrency, args.assignments, gradescope_url, pl_url)
+            print(f"{'endpoint':<20} {'requests':>9} {'errors':>7} {'req/s':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+            for path, num_requests, errors, elapsed, latencies in results:
+                print(f"{path:<20} {num_requests:>9} {errors:>7} {num_requests / elapsed:>6.1f} {percentile(latencies, 0.5):>7.1f} "
+                      f"{percentile(latencies, 0.95):>7.1f} {percentile(latencies, 0.99):>7.1f} {latencies[-1]:>7.1f}")
+    finally:
+        for process, _ in stubs:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures how long /fetchAllGrades takes to download every assignment's `scores.csv` at different
+concurrency levels, against a local stub Gradescope server.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_fetch_all_grades --assignments 60 --students 200 --latency 0.25
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`),
+exactly as for the tests. No request is sent to Gradescope or Google.
+"""
+import argparse
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.utils import csv_to_json, run_concurrently
+from benchmarks.stubs import StubGradescopeHandler, start_stub_server
+
+CLASS_ID = "902165"
+
+
+def time_fetch_all(base_url: str, assignment_ids: list, max_workers: int) -> float:
+    """
+    Downloads and parses every assignment with `max_workers` concurrent requests.
+    Returns the wall-clock time in seconds.
+    """
+    session = requests.Session()
+    # Size the connection pool to the worker count so that connections are reused, not discarded
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+
+    def fetch_one_assignment(assignment_id):
+        result = session.get(f"{base_url}/courses/{CLASS_ID}/assignments/{assignment_id}/scores.csv")
+        result.raise_for_status()
+        return csv_to_json(result.content.decode("utf-8"))
+
+    start_time = time.perf_counter()
+    outcomes = run_concurrently(fetch_one_assignment, assignment_ids, max_workers)
+    elapsed = time.perf_counter() - start_time
+    session.close()
+    failures = [key for key, (_, error) in outcomes.items() if error is not None]
+    assert not failures, f"Failed to download {failures}"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assignments", type=int, default=60, help="Number of assignments in the course.")
+    parser.add_argument("--students", type=int, default=200, help="Number of rows in each scores.csv.")
+    parser.add_argument("--latency", type=float, default=0.25, help="Seconds the stub sleeps per request.")
+    parser.add_argument("--workers", default="1,2,4,8,16,32", help="Comma-separated concurrency levels.")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(StubGradescopeHandler, latency=args.latency, num_students=args.students)
+    assignment_ids = [str(5200000 + number) for number in range(args.assignments)]
+    try:
+        print(f"{args.assignments} assignments x {args.students} students, {args.latency}s stub latency")
+        print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+        baseline = None
+        for max_workers in [int(level) for level in args.workers.split(",")]:
+            elapsed = time_fetch_all(base_url, assignment_ids, max_workers)
+            baseline = baseline or elapsed
+            print(f"{max_workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
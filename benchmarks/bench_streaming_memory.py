@@ -0,0 +1,88 @@
+"""
+Compares the peak Python memory of /fetchAllGrades when the whole gradebook is built and serialized
+as one JSON response, against the `stream=ndjson` and `stream=csv` modes.
+
+All grades are pre-loaded into a temporary grade store, so no download happens while measuring; the
+numbers only reflect building and serializing the response.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_streaming_memory --assignments 60 --students 1500
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`).
+
+Results in a Linux container (Python 3.11), 60 assignments x 1,500 students x 10 questions (13.1 MB of CSV).
+Timings are inflated by tracemalloc; only compare them with each other.
+    mode          peak MB   seconds
+    json            411.4     58.52
+    ndjson            9.8     15.47
+    csv               0.1      8.72
+"""
+import argparse
+import importlib
+import json
+import tempfile
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+
+from api.gradeStore import GradeStore
+from benchmarks.stubs import make_scores_csv
+
+app_module = importlib.import_module("api.app")
+CLASS_ID = "902165"
+
+
+def measure(build_response) -> tuple:
+    """
+    Runs `build_response` under tracemalloc. Returns the peak traced memory in MB and the elapsed seconds.
+    """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    build_response()
+    elapsed = time.perf_counter() - start_time
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assignments", type=int, default=60, help="Number of assignments in the course.")
+    parser.add_argument("--students", type=int, default=1500, help="Number of students in the course.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app_module.GRADE_STORE = store = GradeStore(f"{directory}/grades.sqlite3")
+        catalog = {"other": {}}
+        csv_bytes = 0
+        for number in range(args.assignments):
+            assignment_id = str(5200000 + number)
+            csv_content = make_scores_csv(assignment_id, args.students, num_questions=10)
+            csv_bytes += len(csv_content)
+            store.save_assignment(CLASS_ID, assignment_id, csv_content, title=f"Assignment {number}")
+            catalog["other"][assignment_id] = {"title": f"Assignment {number}", "assignment_id": assignment_id}
+        app_module.get_assignment_info = lambda class_id: catalog
+        titles_and_ids = app_module.get_ids_for_all_assignments(catalog)
+
+        def buffered_json():
+            # What FastAPI does with the dictionary returned by the endpoint
+            all_grades = app_module.fetchAllGrades(class_id=CLASS_ID)
+            json.dumps(jsonable_encoder(all_grades)).encode("utf-8")
+
+        def streamed(stream):
+            def consume():
+                outcomes = app_module.load_grades_into_store(CLASS_ID, titles_and_ids, 1, app_module.GRADE_STORE_MAX_AGE_SECONDS)
+                for chunk in app_module.stream_all_grades(CLASS_ID, titles_and_ids, outcomes, stream):
+                    chunk.encode("utf-8")
+            return consume
+
+        print(f"{args.assignments} assignments x {args.students} students ({csv_bytes / 1e6:.1f} MB of CSV)")
+        print(f"{'mode':<10} {'peak MB':>10} {'seconds':>9}")
+        for mode, build_response in [("json", buffered_json), ("ndjson", streamed("ndjson")), ("csv", streamed("csv"))]:
+            peak, elapsed = measure(build_response)
+            print(f"{mode:<10} {peak:>10.1f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
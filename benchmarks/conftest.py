@@ -0,0 +1,164 @@
+"""
+The `benchmark` fixture of the microbenchmark suite (test_hot_paths.py), which compares each measurement against a
+stored baseline and fails when it regressed.
+
+Timings depend on the machine, so they are stored relative to a fixed reference workload (`reference_workload`),
+which is timed on the same machine right before each measurement: a baseline recorded on a laptop then still holds, roughly,
+on a CI runner. Baselines are kept in BASELINES_PATH and are only rewritten with `--update-baselines`.
+
+Usage (from the repository root):
+    python -m pytest benchmarks --no-cov                      # fail on regressions beyond the threshold
+    python -m pytest benchmarks --no-cov --update-baselines   # record the current timings as the new baselines
+    python -m pytest benchmarks --no-cov --benchmark-threshold 0.25 -k csv_to_json
+"""
+import csv
+import io
+import json
+import os
+import time
+
+import pytest
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+# A hot path fails when it takes this fraction longer than its baseline (relative to the reference workload)
+DEFAULT_THRESHOLD = 0.5
+REPEATS = 5
+# Each timed repeat runs the function enough times to last at least this long, so that timer resolution does not matter
+MIN_REPEAT_SECONDS = 0.05
+# Baselines are the median of this many measurements, and a check measures up to this many times before failing
+ATTEMPTS = 3
+
+REFERENCE_CSV = "".join(f"{row},student{row}@berkeley.edu,{row % 10},{row * 0.5}\n" for row in range(2000))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmarks")
+    group.addoption("--update-baselines", action="store_true",
+                    help="Record the timings of this run as the baselines instead of comparing against them.")
+    group.addoption("--benchmark-threshold", type=float, default=DEFAULT_THRESHOLD,
+                    help=f"Fraction by which a hot path may exceed its baseline before failing (default {DEFAULT_THRESHOLD}).")
+
+
+def reference_workload():
+    """
+    A fixed mix of CSV parsing and dict building, the same kind of work as the hot paths.
+    """
+    rows = list(csv.reader(io.StringIO(REFERENCE_CSV)))
+    return {row[1]: float(row[3]) for row in rows}
+
+
+def best_time(func, *args) -> float:
+    """
+    Returns the fastest time of one call of `func(*args)` over REPEATS repeats, in seconds.
+    """
+    loops = 1
+    while True:
+        start_time = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= MIN_REPEAT_SECONDS:
+            break
+        loops *= 2
+    timings = [elapsed / loops]
+    for _ in range(REPEATS - 1):
+        start_time = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        timings.append((time.perf_counter() - start_time) / loops)
+    return min(timings)
+
+
+def measure_relative(func, *args) -> tuple:
+    """
+    Returns the best time of `func(*args)` in seconds, and that time relative to the reference workload, which is timed
+    right before it so that both see the same machine load.
+    """
+    reference_seconds = best_time(reference_workload)
+    seconds = best_time(func, *args)
+    return seconds, seconds / reference_seconds
+
+
+class BenchmarkSession:
+    """
+    The baselines, the timings measured so far and the options of one pytest session.
+    """
+
+    def __init__(self, update_baselines: bool, threshold: float):
+        self.update_baselines = update_baselines
+        self.threshold = threshold
+        self.baselines = {}
+        if os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH) as baselines_file:
+                self.baselines = json.load(baselines_file)
+        self.results = {}
+
+    def measure(self, name: str, func, *args):
+        """
+        Times `func(*args)`, and fails the calling test if it regressed beyond the threshold.
+
+        A baseline is the median of ATTEMPTS measurements, so that one lucky run does not set the bar. A check passes
+        if any of ATTEMPTS measurements is within the limit, so that one noisy run does not fail it.
+        """
+        if self.update_baselines:
+            measurements = sorted((measure_relative(func, *args) for _ in range(ATTEMPTS)), key=lambda result: result[1])
+            self.record(name, *measurements[len(measurements) // 2])
+            return
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            pytest.skip(f"No baseline for {name}; record one with --update-baselines")
+        limit = baseline["relative"] * (1 + self.threshold)
+        best = None
+        for _ in range(ATTEMPTS):
+            seconds, relative = measure_relative(func, *args)
+            if best is None or relative < best[1]:
+                best = (seconds, relative)
+            if relative <= limit:
+                break
+        self.record(name, *best)
+        seconds, relative = best
+        if relative > limit:
+            pytest.fail(f"{name} regressed: {relative:.3f} reference units ({seconds * 1000:.2f} ms), "
+                        f"baseline {baseline['relative']:.3f}, limit {limit:.3f}")
+
+    def record(self, name: str, seconds: float, relative: float):
+        self.results[name] = {"ms": round(seconds * 1000, 3), "relative": round(relative, 3)}
+
+    def save(self):
+        baselines = dict(self.baselines, **self.results)
+        with open(BASELINES_PATH, "w") as baselines_file:
+            json.dump(dict(sorted(baselines.items())), baselines_file, indent=2)
+            baselines_file.write("\n")
+
+
+benchmark_session_key = pytest.StashKey[BenchmarkSession]()
+
+
+@pytest.fixture(scope="session")
+def benchmark_session(request):
+    session = BenchmarkSession(request.config.getoption("--update-baselines"),
+                               request.config.getoption("--benchmark-threshold"))
+    request.config.stash[benchmark_session_key] = session
+    yield session
+    if session.update_baselines and session.results:
+        session.save()
+
+
+@pytest.fixture
+def benchmark(benchmark_session):
+    """
+    Returns `measure(name, func, *args)`, which times `func(*args)` against the baseline stored under `name`.
+    """
+    return benchmark_session.measure
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    session = config.stash.get(benchmark_session_key, None)
+    if session is None or not session.results:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(f"{'hot path':<50} {'ms':>10} {'relative':>10} {'baseline':>10}")
+    for name, result in session.results.items():
+        baseline = session.baselines.get(name, {}).get("relative")
+        baseline = f"{baseline:>10.3f}" if baseline is not None else f"{'-':>10}"
+        terminalreporter.write_line(f"{name:<50} {result['ms']:>10.3f} {result['relative']:>10.3f} {baseline}")
@@ -0,0 +1,64 @@
+"""
+Microbenchmarks of the parsing and CSV-building functions that run on every API request or sync, at several course
+sizes, checked against the baselines in baselines.json (see conftest.py for the options).
+
+Usage (from the repository root):
+    python -m pytest benchmarks --no-cov
+
+Importing `api` loads the FastAPI app, so `SERVICE_ACCOUNT_CREDENTIALS` must be set (e.g. in `.env`).
+These are not part of the default test run (`testpaths` in pytest.ini), because their timings depend on the machine.
+"""
+import pytest
+
+from api.utils import convert_course_info_to_json, csv_to_json, get_ids_for_all_assignments
+from benchmarks.bench_end_to_end import import_cron_job
+from benchmarks.stubs import (make_assessment_instances, make_assignments_page, make_course_titles, make_gradebook_export,
+                              make_scores_csv)
+
+STUDENTS = [200, 1500, 20000]
+ASSIGNMENTS = [80, 400, 2000]
+# The size of one gradebook category, e.g. the labs of a semester
+GRADEBOOK_COLUMNS = 15
+
+
+@pytest.fixture(scope="module")
+def cron_job():
+    return import_cron_job()
+
+
+@pytest.mark.parametrize("num_students", STUDENTS)
+def test_csv_to_json(benchmark, num_students):
+    csv_content = make_scores_csv("5200000", num_students, num_questions=10)
+    benchmark(f"csv_to_json[{num_students} students]", csv_to_json, csv_content)
+
+
+@pytest.mark.parametrize("num_assignments", ASSIGNMENTS)
+def test_convert_course_info_to_json(benchmark, num_assignments):
+    page = make_assignments_page(make_course_titles(num_assignments))
+    benchmark(f"convert_course_info_to_json[{num_assignments} assignments]", convert_course_info_to_json, page)
+
+
+@pytest.mark.parametrize("num_assignments", ASSIGNMENTS)
+def test_get_ids_for_all_assignments(benchmark, num_assignments):
+    catalog = convert_course_info_to_json(make_assignments_page(make_course_titles(num_assignments)))
+    benchmark(f"get_ids_for_all_assignments[{num_assignments} assignments]", get_ids_for_all_assignments, catalog)
+
+
+@pytest.mark.parametrize("num_students", STUDENTS)
+def test_make_csv_for_one_PL_assignment(benchmark, cron_job, num_students):
+    instances = make_assessment_instances("700000", num_students)
+    benchmark(f"make_csv_for_one_PL_assignment[{num_students} students]", cron_job.make_csv_for_one_PL_assignment, instances)
+
+
+@pytest.mark.parametrize("num_students", STUDENTS)
+def test_make_gradebook_csv(benchmark, cron_job, num_students):
+    titles = [f"Lab {number}" for number in range(1, GRADEBOOK_COLUMNS + 1)]
+    formula_list = [cron_job.GRADE_RETRIEVAL_SPREADSHEET_FORMULA] * num_students
+    benchmark(f"make_gradebook_csv[{num_students} students]", cron_job.make_gradebook_csv, titles, formula_list)
+
+
+@pytest.mark.parametrize("num_students", STUDENTS)
+def test_split_gradebook_export(benchmark, cron_job, num_students):
+    titles = make_course_titles(GRADEBOOK_COLUMNS)
+    export = make_gradebook_export(titles, num_students)
+    benchmark(f"split_gradebook_export[{num_students} students]", cron_job.split_gradebook_export, export, list(titles.values()))
@@ -0,0 +1,264 @@
+"""
+Classifies Gradescope assignments into categories (labs, lecture quizzes, discussions, ...) by their titles.
+
+The rules are read from the ASSIGNMENT_CATEGORIES list of a course config file, so a course whose assignments are named
+differently only needs a config change. Each rule is a dictionary with:
+- "category": the category name, e.g. "labs".
+- "pattern": a regular expression searched for in the title. Rules are tried in order and the first match wins.
+- "key" (optional): "number" (the default) keys assignments by the first number in their title, and leaves out titles
+  without one. "sequence" numbers the assignments of the category 1, 2, 3, ... in the order they appear.
+- "parts" (optional): maps part names to regular expressions, e.g. {"conceptual": "Conceptual", "code": "Code"}, for
+  categories whose assignments are split into several parts with the same number.
+- "ignore_case" (optional): match "pattern" and "parts" case-insensitively.
+Titles that match no rule are put in the "other" category.
+
+The rules are compiled once, when the classifier is built (see PriorityPattern), and every title is classified in
+the same pass over the assignments. This module only uses the standard library: the cron job imports it directly, and the API imports it as
+gradescopeCronJob.assignment_classifier.
+"""
+import datetime
+import re
+from collections import namedtuple
+
+# One assignment in the JSON embedded in a course's assignments page, once backslashes have been removed
+ASSIGNMENT_PATTERN = re.compile(r'{"id":([0-9]+),"title":"([^}"]+)"}')
+# The dates of an assignment, found in the part of the page between it and the next assignment, by AssignmentDates field
+DATE_PATTERNS = {
+    "release_date": re.compile(r'"release_date":"([^"]+)"'),
+    "due_date": re.compile(r'"due_date":"([^"]+)"'),
+    "late_due_date": re.compile(r'"hard_due_date":"([^"]+)"'),
+}
+NUMBER_PATTERN = re.compile(r"\d+")
+# A rule pattern without special characters other than "|", which is matched with substring checks
+LITERAL_ALTERNATION = re.compile(r"[^\\.^$*+?{}\[\]()|]+(?:\|[^\\.^$*+?{}\[\]()|]+)*")
+OTHER_CATEGORY = "other"
+
+# The CS10 rules, used when a config file has no ASSIGNMENT_CATEGORIES. They ignore case, as the gradebook subsheets
+# always have (e.g. "lab 3" is a lab)
+DEFAULT_CATEGORY_RULES = [
+    {"category": "lecture_quizzes", "pattern": "Lecture Quiz", "ignore_case": True},
+    {"category": "discussions", "pattern": "Discussion", "ignore_case": True},
+    {"category": "postterms", "pattern": "Postterm|Posterm", "key": "sequence", "ignore_case": True},
+    {"category": "midterms", "pattern": "Midterm", "key": "sequence", "ignore_case": True},
+    {"category": "projects", "pattern": "Project", "ignore_case": True},
+    {"category": "labs", "pattern": "Lab", "parts": {"conceptual": "Conceptual", "code": "Code"}, "ignore_case": True},
+]
+
+# number is the first number in the title (or None), and part is the name of the matching part (or None)
+ClassifiedAssignment = namedtuple("ClassifiedAssignment", ["assignment_id", "title", "category", "number", "part"])
+
+
+class AssignmentDates(namedtuple("AssignmentDates", ["release_date", "due_date", "late_due_date"])):
+    """
+    When an assignment is released, due, and due at the latest with late submissions, as timezone-aware datetimes
+    (None if the assignments page does not say).
+    """
+
+    def is_released(self, now: datetime.datetime) -> bool:
+        return self.release_date is None or self.release_date <= now
+
+    @property
+    def closes_at(self):
+        """
+        When the assignment stops accepting submissions, or None if it has no due date.
+        """
+        return self.late_due_date or self.due_date
+
+
+def extract_assignments(page_content) -> list:
+    """
+    Finds every assignment on a course's assignments page.
+
+    Parameters:
+        page_content (bytes or str): The page as downloaded from Gradescope. Bytes are stringified the way the
+            assignment titles used as sheet names and JSON keys always have been, e.g. "&" stays "u0026".
+
+    Returns:
+        list: (assignment_id, title) tuples in page order.
+    """
+    return ASSIGNMENT_PATTERN.findall(str(page_content).replace("\\", ""))
+
+
+def extract_assignment_dates(page_content) -> dict:
+    """
+    Finds the release date, due date and late due date of every assignment on a course's assignments page.
+
+    Parameters:
+        page_content (bytes or str): The page as downloaded from Gradescope.
+
+    Returns:
+        dict: {assignment_id: AssignmentDates} for the assignments with at least one date. Dates that cannot be parsed
+            are None.
+    """
+    page = str(page_content).replace("\\", "")
+    matches = list(ASSIGNMENT_PATTERN.finditer(page))
+    assignment_dates = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(page)
+        dates = AssignmentDates(**{field: parse_date(pattern.search(page, match.end(), end))
+                                   for field, pattern in DATE_PATTERNS.items()})
+        if any(dates):
+            assignment_dates[match.group(1)] = dates
+    return assignment_dates
+
+
+def parse_date(match):
+    """
+    Parses the ISO 8601 date captured by `match` as a timezone-aware datetime (UTC if it has no offset), or returns None.
+    """
+    if match is None:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(match.group(1))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+class PriorityPattern:
+    """
+    Finds which of several regular expressions is the first (in list order) to occur anywhere in a string.
+
+    When every pattern is a plain keyword (or keywords separated by "|"), as in the CS10 rules, they are tested with
+    substring checks, which are the fastest. Otherwise the patterns are compiled into one alternation, so a string is
+    usually scanned once. An alternation finds the leftmost occurrence, which is only the answer if no earlier pattern
+    occurs further right; that is checked by searching the rest of the string for the earlier patterns only.
+    """
+
+    def __init__(self, patterns: list, ignore_case: list):
+        if all(LITERAL_ALTERNATION.fullmatch(pattern) for pattern in patterns):
+            # (keyword, pattern index, whether to compare lowercase) in pattern order
+            self.keywords = [(keyword.lower() if ignore else keyword, index, ignore)
+                             for index, (pattern, ignore) in enumerate(zip(patterns, ignore_case))
+                             for keyword in pattern.split("|")]
+            self.any_ignore_case = any(ignore_case)
+            return
+        self.keywords = None
+        patterns = [f"(?i:{pattern})" if ignore else f"(?:{pattern})" for pattern, ignore in zip(patterns, ignore_case)]
+        self.search_all = self.compile(patterns)
+        self.search_earlier = [None] + [self.compile(patterns[:count]) for count in range(1, len(patterns))]
+
+    @staticmethod
+    def compile(patterns: list):
+        """
+        Compiles the patterns into one alternation whose match.lastgroup is the position of the matching pattern.
+        """
+        # Group names must be identifiers, so patterns are named by their position
+        pattern = re.compile("|".join(f"(?P<p{index}>{pattern})" for index, pattern in enumerate(patterns)))
+        return pattern.search
+
+    def first(self, string: str):
+        """
+        Returns the index of the first pattern that occurs in the string, or None if none does.
+        """
+        if self.keywords is not None:
+            if not self.any_ignore_case:
+                for keyword, index, _ in self.keywords:
+                    if keyword in string:
+                        return index
+                return None
+            lowercase_string = string.lower()
+            for keyword, index, ignore in self.keywords:
+                if keyword in (lowercase_string if ignore else string):
+                    return index
+            return None
+        match = self.search_all(string)
+        if match is None:
+            return None
+        index = int(match.lastgroup[1:])
+        while index:
+            earlier = self.search_earlier[index](string, match.start() + 1)
+            if earlier is None:
+                break
+            match, index = earlier, int(earlier.lastgroup[1:])
+        return index
+
+
+class AssignmentClassifier:
+    """
+    Sorts assignment titles into categories with a precompiled rule table (see the module docstring).
+
+    Example:
+        >>> classifier = AssignmentClassifier(DEFAULT_CATEGORY_RULES)
+        >>> classifier.classify([("5211616", "Lab 2: Basics (Conceptual)")])
+        [ClassifiedAssignment(assignment_id='5211616', title='Lab 2: Basics (Conceptual)', category='labs', number=2, part='conceptual')]
+    """
+
+    def __init__(self, rules: list):
+        self.rules = [dict(rule) for rule in rules]
+        self.rule_pattern = PriorityPattern([rule["pattern"] for rule in self.rules],
+                                            [rule.get("ignore_case", False) for rule in self.rules])
+        self.categories = [rule["category"] for rule in self.rules]
+        # For rules with parts: (the parts' PriorityPattern, the part names)
+        self.part_patterns = [
+            (PriorityPattern(list(rule["parts"].values()), [rule.get("ignore_case", False)] * len(rule["parts"])),
+             list(rule["parts"])) if rule.get("parts") else None
+            for rule in self.rules
+        ]
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Builds the classifier of a course from the ASSIGNMENT_CATEGORIES of its config file, or the CS10 rules.
+        """
+        return cls(config.get("ASSIGNMENT_CATEGORIES", DEFAULT_CATEGORY_RULES))
+
+    def classify(self, assignments) -> list:
+        """
+        Classifies (assignment_id, title) pairs in one pass.
+        Returns a list of ClassifiedAssignment in the same order.
+        """
+        classified = []
+        first_rule = self.rule_pattern.first
+        for assignment_id, title in assignments:
+            rule = first_rule(title)
+            if rule is None:
+                classified.append(ClassifiedAssignment(assignment_id, title, OTHER_CATEGORY, None, None))
+                continue
+            number = NUMBER_PATTERN.search(title)
+            part = None
+            if self.part_patterns[rule] is not None:
+                part_pattern, part_names = self.part_patterns[rule]
+                part_index = part_pattern.first(title)
+                part = part_names[part_index] if part_index is not None else None
+            classified.append(ClassifiedAssignment(assignment_id, title, self.categories[rule],
+                                                   int(number.group()) if number else None, part))
+        return classified
+
+    def to_catalog(self, classified: list) -> dict:
+        """
+        Arranges classified assignments into the catalog returned by the API's /getAssignmentJSON: one dictionary per
+        category mapping keys (see "key" in the module docstring) to {"title", "assignment_id"}, or for categories with
+        parts, to {part: {"title", "assignment_id"}}. "other" maps assignment IDs to titles.
+        Assignments with the same key (e.g. the four parts of a lab without "parts" rules) are all kept, as parts named
+        by their part or, without one, by their title.
+        """
+        catalog = {rule["category"]: {} for rule in self.rules}
+        catalog[OTHER_CATEGORY] = {}
+        key_types = {rule["category"]: rule.get("key", "number") for rule in self.rules}
+        for assignment in classified:
+            category = assignment.category
+            if category == OTHER_CATEGORY:
+                catalog[OTHER_CATEGORY][assignment.assignment_id] = assignment.title
+                continue
+            if key_types[category] == "sequence":
+                key = str(len(catalog[category]) + 1)
+            elif assignment.number is not None:
+                # The key is the number as written in the title, e.g. "02" stays "02"
+                key = NUMBER_PATTERN.search(assignment.title).group()
+            else:
+                continue
+            entry = {"title": assignment.title, "assignment_id": assignment.assignment_id}
+            existing = catalog[category].get(key)
+            if assignment.part is None and existing is None:
+                catalog[category][key] = entry
+                continue
+            if existing is not None and "assignment_id" in existing:
+                catalog[category][key] = {existing["title"]: existing}
+            parts = catalog[category].setdefault(key, {})
+            parts[assignment.title if assignment.part is None or assignment.part in parts else assignment.part] = entry
+        for category in catalog:
+            if category != OTHER_CATEGORY:
+                catalog[category] = dict(sorted(catalog[category].items(), key=lambda item: int(item[0])))
+        return catalog
+
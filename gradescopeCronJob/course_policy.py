@@ -0,0 +1,127 @@
+"""
+Applies the CS10 course policy to a students x assignments matrix of scores, so that the instructor dashboard of the
+cron job (dashboard_engine.py) and the API's /computeGrades give every student the same grades.
+
+- Labs: every lab assignment with the same number (e.g. the conceptual and code parts of a lab, or the four parts of a
+  SPECIAL_CASE_LABS lab) forms one lab, whose score is the sum of its parts' scores over the sum of their max points.
+  Labs in UNGRADED_LABS are left out. A lab counts towards the final lab score only if it earned full credit.
+- Lecture quizzes: the number of full-credit quizzes plus NUM_LECTURE_DROPS, over the number of quizzes, capped at 1.
+- Discussions: a discussion is complete (1) unless its status is "Missing" or the student has no row for it (0).
+- Projects: each project's score over its max points, and the average over all projects.
+Assignments are categorized by the course's AssignmentClassifier (see assignment_classifier.py). Assignments with
+"optional" in their title are ignored, as in populate_spreadsheet_gradebook.
+
+This module only uses the standard library and NumPy: the cron job imports it directly, and the API imports it as
+gradescopeCronJob.course_policy.
+"""
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Categories of the classifier that the policy uses
+POLICY_CATEGORIES = ["labs", "discussions", "projects", "lecture_quizzes"]
+# Parts of a SPECIAL_CASE_LABS lab
+SPECIAL_CASE_LAB_PARTS = 4
+
+# aggregates maps each aggregate name to an array with one value per student (NaN where undefined). labs maps each lab
+# number to the students' lab scores, and projects, lecture_quizzes and discussions map titles to the students' scores
+# of each assignment (1 or 0 for discussions)
+CourseGrades = namedtuple("CourseGrades", ["aggregates", "labs", "projects", "lecture_quizzes", "discussions"])
+
+
+def select_policy_assignments(classified) -> dict:
+    """
+    Groups classified assignments (see AssignmentClassifier.classify) by the categories in POLICY_CATEGORIES, leaving
+    out optional assignments. Each category is sorted by the number in the titles (0 if there is none).
+    """
+    categories = {category: [] for category in POLICY_CATEGORIES}
+    for assignment in classified:
+        if assignment.category in categories and "optional" not in assignment.title.lower():
+            categories[assignment.category].append(assignment)
+    for assignments in categories.values():
+        assignments.sort(key=lambda assignment: assignment.number or 0)
+    return categories
+
+
+def divide(numerator, denominator):
+    """
+    Divides element-wise, with NaN wherever the denominator is 0 or NaN.
+    """
+    numerator, denominator = np.broadcast_arrays(np.asarray(numerator, dtype=float), np.asarray(denominator, dtype=float))
+    result = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=result, where=np.nan_to_num(denominator) != 0)
+    return result
+
+
+def row_mean(values):
+    """
+    Returns the mean of each row, ignoring NaN, and NaN for a row without any values.
+    """
+    counts = (~np.isnan(values)).sum(axis=1)
+    return divide(np.nansum(values, axis=1), counts)
+
+
+def compute_course_policy(scores, max_points, missing, column_index: dict, categories: dict, ungraded_labs,
+                          special_case_labs, num_lecture_drops, total_lab_points) -> CourseGrades:
+    """
+    Applies the course policy to every student at once.
+
+    Parameters:
+        scores (numpy.ndarray): Students x assignments matrix of total scores, NaN where a student is ungraded or has
+            no row. An ungraded score earns no points.
+        max_points (numpy.ndarray): The max points of each assignment, NaN if unknown.
+        missing (numpy.ndarray): Students x assignments, True where the status is "Missing" or the student has no row.
+        column_index (dict): Maps assignment ids to their column. Assignments without a column are left out.
+        categories (dict): The assignments of each category, as returned by select_policy_assignments.
+        ungraded_labs (list): Numbers of the labs that are not graded (UNGRADED_LABS).
+        special_case_labs (list): Numbers of the labs with four parts (SPECIAL_CASE_LABS).
+        num_lecture_drops (int): Number of lecture quizzes a student may miss (NUM_LECTURE_DROPS).
+        total_lab_points (float): Lab points of a student with full credit on every lab (TOTAL_LAB_POINTS).
+    """
+    points = np.nan_to_num(np.asarray(scores, dtype=float))
+    num_students = points.shape[0]
+
+    def in_matrix(assignments):
+        return [assignment for assignment in assignments if assignment.assignment_id in column_index]
+
+    def ratio(assignment_ids):
+        # The summed points of the assignments over their summed known max points
+        columns = [column_index[assignment_id] for assignment_id in assignment_ids]
+        lab_max = np.nansum(max_points[columns])
+        return divide(points[:, columns].sum(axis=1), np.full(num_students, lab_max))
+
+    lab_numbers_to_ids = {}
+    for lab in in_matrix(categories["labs"]):
+        lab_number = lab.number or 0
+        if lab_number not in ungraded_labs:
+            lab_numbers_to_ids.setdefault(lab_number, []).append(lab.assignment_id)
+    for lab_number, ids in lab_numbers_to_ids.items():
+        if lab_number in special_case_labs and len(ids) != SPECIAL_CASE_LAB_PARTS:
+            logger.warning(f"Lab {lab_number} is a special case lab with {SPECIAL_CASE_LAB_PARTS} parts, but "
+                           f"{len(ids)} parts were found")
+    labs = {lab_number: ratio(ids) for lab_number, ids in lab_numbers_to_ids.items()}
+    projects = {project.title: ratio([project.assignment_id]) for project in in_matrix(categories["projects"])}
+    lecture_quizzes = {quiz.title: ratio([quiz.assignment_id]) for quiz in in_matrix(categories["lecture_quizzes"])}
+    discussions = {discussion.title: (~missing[:, column_index[discussion.assignment_id]]).astype(int)
+                   for discussion in in_matrix(categories["discussions"])}
+
+    def stack(columns):
+        # Students x assignments matrix of one category
+        return np.column_stack(list(columns.values())) if columns else np.empty((num_students, 0))
+
+    lab_scores, quiz_scores = stack(labs), stack(lecture_quizzes)
+    full_credit_labs = (lab_scores >= 1).sum(axis=1)
+    full_credit_quizzes = (quiz_scores >= 1).sum(axis=1)
+    aggregates = {
+        "lab_score": divide(full_credit_labs * total_lab_points, len(labs)),
+        "full_credit_labs": full_credit_labs,
+        "average_lab_score": row_mean(lab_scores),
+        "lecture_attendance": np.minimum(1, divide(full_credit_quizzes + num_lecture_drops, len(lecture_quizzes))),
+        "full_credit_lecture_quizzes": full_credit_quizzes,
+        "discussions_completed": stack(discussions).sum(axis=1).astype(int),
+        "average_project_score": row_mean(stack(projects)),
+    }
+    return CourseGrades(aggregates, labs, projects, lecture_quizzes, discussions)
@@ -0,0 +1,138 @@
+"""
+Computes the instructor dashboard from downloaded Gradescope scores with pandas/NumPy, so that the spreadsheet
+receives plain values instead of thousands of XLOOKUP(INDIRECT(...)) formulas that Google Sheets has to recalculate on
+every edit.
+
+This module only transforms data; it does not talk to Gradescope or Google Sheets, so it can be imported and timed on
+its own (see benchmarks/bench_dashboard_engine.py).
+
+The course policy, the same one the formula dashboard implemented and /computeGrades applies, is in course_policy.py.
+"""
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+import course_policy
+
+# Columns of a Gradescope scores.csv export used by the engine; exports have either "Name" or "First Name"/"Last Name"
+SCORE_COLUMNS = {"Name", "First Name", "Last Name", "SID", "Email", "Total Score", "Max Points", "Status"}
+
+
+def parse_scores(assignment_scores):
+    """
+    Parses a scores.csv export into a DataFrame indexed by student email, with the columns Name, SID, score (float, NaN
+    if ungraded), max_points (float) and missing (True if the submission status is "Missing").
+    """
+    header = next(csv.reader(io.StringIO(assignment_scores.split("\n", 1)[0])), [])
+    # Only the needed columns are parsed, and scores are parsed as floats directly, which is much faster than
+    # reading every cell as a string
+    frame = pd.read_csv(io.StringIO(assignment_scores), usecols=[column for column in header if column in SCORE_COLUMNS],
+                        dtype={"Total Score": float, "Max Points": float}, keep_default_na=False,
+                        na_values={"Total Score": [""], "Max Points": [""]})
+    if "Name" not in frame and {"First Name", "Last Name"} <= set(frame.columns):
+        frame["Name"] = frame["First Name"].astype(str) + " " + frame["Last Name"].astype(str)
+    frame = frame[frame["Email"] != ""].drop_duplicates("Email").set_index("Email")
+    return pd.DataFrame({
+        "Name": frame["Name"].astype(str) if "Name" in frame else "",
+        "SID": frame["SID"].astype(str) if "SID" in frame else "",
+        "score": frame["Total Score"],
+        "max_points": frame["Max Points"],
+        "missing": frame["Status"].eq("Missing") if "Status" in frame else False,
+    }, index=frame.index)
+
+
+def build_roster(frames):
+    """
+    Returns the Name and SID of every student in any of the parsed exports, indexed by email in order of first appearance.
+    Exports of one course usually list the same students in the same order, so only exports that differ are merged.
+    """
+    roster = None
+    for frame in frames.values():
+        if roster is None:
+            roster = frame[["Name", "SID"]]
+        elif not frame.index.equals(roster.index):
+            new_students = roster.index.get_indexer(frame.index) == -1
+            if new_students.any():
+                roster = pd.concat([roster, frame.loc[new_students, ["Name", "SID"]]])
+    return roster if roster is not None else pd.DataFrame(columns=["Name", "SID"])
+
+
+def align_to_roster(roster_index, frame, column, fill_value):
+    """
+    Returns one column of a parsed export as a NumPy array in roster order, with fill_value for students who have no row.
+    """
+    values = frame[column].to_numpy()
+    if frame.index.equals(roster_index):
+        return values
+    aligned = np.full(len(roster_index), fill_value, dtype=values.dtype)
+    aligned[roster_index.get_indexer(frame.index)] = values
+    return aligned
+
+
+def compute_dashboard(assignment_id_to_names, assignment_id_to_scores, classifier, ungraded_labs, special_case_labs,
+                      num_lecture_drops, total_lab_points):
+    """
+    Computes one row per student with the aggregate dashboard columns followed by one column per lab, project, lecture
+    quiz and discussion.
+
+    Parameters:
+        assignment_id_to_names (dict): Maps assignment ids to their Gradescope titles.
+        assignment_id_to_scores (dict): Maps assignment ids to their scores.csv exports. Assignments without scores
+            (e.g. failed downloads) are left out of the dashboard.
+        classifier (AssignmentClassifier): Categorizes the assignments (ASSIGNMENT_CATEGORIES).
+        ungraded_labs (list): Numbers of the labs that are not graded (UNGRADED_LABS).
+        special_case_labs (list): Numbers of the labs with four parts (SPECIAL_CASE_LABS).
+        num_lecture_drops (int): Number of lecture quizzes a student may miss (NUM_LECTURE_DROPS).
+        total_lab_points (float): Lab points of a student with full credit on every lab (TOTAL_LAB_POINTS).
+
+    Returns:
+        pandas.DataFrame: Indexed by email and sorted by name. Students who appear in any export are included; a student
+        without a row in some export gets no points for that assignment.
+    """
+    frames = {id: parse_scores(scores) for id, scores in assignment_id_to_scores.items() if id in assignment_id_to_names}
+    return compute_dashboard_from_frames(assignment_id_to_names, frames, classifier, ungraded_labs, special_case_labs,
+                                         num_lecture_drops, total_lab_points)
+
+
+def compute_dashboard_from_frames(assignment_id_to_names, frames, classifier, ungraded_labs, special_case_labs,
+                                  num_lecture_drops, total_lab_points):
+    """
+    Same as compute_dashboard, but takes a dictionary mapping assignment ids to exports already parsed by parse_scores.
+    """
+    ids = list(frames)
+    categories = course_policy.select_policy_assignments(classifier.classify((id, assignment_id_to_names[id]) for id in ids))
+    roster = build_roster(frames)
+    scores = np.empty((len(roster), len(ids)))
+    missing = np.empty((len(roster), len(ids)), dtype=bool)
+    for column, id in enumerate(ids):
+        # A student who has no row in the export is ungraded and missing
+        scores[:, column] = align_to_roster(roster.index, frames[id], "score", np.nan)
+        missing[:, column] = align_to_roster(roster.index, frames[id], "missing", True)
+    max_points = np.array([frames[id]["max_points"].max() for id in ids], dtype=float)
+    grades = course_policy.compute_course_policy(scores, max_points, missing, {id: column for column, id in enumerate(ids)},
+                                                 categories, ungraded_labs, special_case_labs, num_lecture_drops,
+                                                 total_lab_points)
+    aggregates = {
+        f"Final Lab Score / {total_lab_points}": grades.aggregates["lab_score"],
+        "# of full credit labs": grades.aggregates["full_credit_labs"],
+        "Avg. Lab Score": grades.aggregates["average_lab_score"],
+        "Avg. Project Score": grades.aggregates["average_project_score"],
+        "Lecture Attendance Score (Drops Included)": grades.aggregates["lecture_attendance"],
+        "Number of Discussion Makeups": grades.aggregates["discussions_completed"],
+    }
+    lab_columns = {f"Lab {lab_number}": lab_scores for lab_number, lab_scores in grades.labs.items()}
+    dashboard = pd.DataFrame({**aggregates, **lab_columns, **grades.projects, **grades.lecture_quizzes,
+                              **grades.discussions}, index=roster.index)
+    return pd.concat([roster, dashboard], axis=1).sort_values("Name", kind="stable")
+
+
+def dashboard_to_csv(dashboard):
+    """
+    Converts a dashboard from compute_dashboard to csv, with the email as the third column and scores rounded to four
+    decimal places.
+    """
+    dashboard = dashboard.reset_index(names="Email")
+    ordered_columns = ["Name", "SID", "Email"] + [column for column in dashboard.columns if column not in ("Name", "SID", "Email")]
+    return dashboard[ordered_columns].round(4).to_csv(index=False)
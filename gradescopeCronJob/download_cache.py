@@ -0,0 +1,158 @@
+"""
+A cache of the files downloaded from Gradescope (e.g. each assignment's `scores.csv`), so that downloading a file that
+has not changed costs as little as possible.
+
+Each entry keeps the last body downloaded for a key (e.g. (course_id, assignment_id)), with its `ETag` and
+`Last-Modified` headers and its SHA-256 digest:
+- `request_headers` returns the `If-None-Match` and `If-Modified-Since` headers to send with the next download. If the
+  server honors them, it answers an unchanged file with a bodyless 304 (Not Modified), and the cached body is used.
+- `resolve` turns the response into a CachedDownload. A server that ignores the headers sends the whole file again,
+  and comparing its digest with the cached one still tells whether it changed, so that callers can skip parsing and
+  saving an unchanged file.
+
+Bodies are saved in `directory`, named by their digest, next to an index of the entries, so a new process (e.g. the
+next cron run) starts with the cache of the previous one. This module only uses the standard library: the cron job
+imports it directly, and the API imports it as gradescopeCronJob.download_cache.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+
+INDEX_FILE_NAME = "index.json"
+
+# changed is False if the body is the one cached before, whether the server said so (not_modified) or the digests match
+CachedDownload = namedtuple("CachedDownload", ["content", "changed", "not_modified"])
+
+
+class DownloadCache:
+    """
+    A thread-safe cache of downloaded bodies and their validators, persisted in `directory`.
+
+    Example:
+        >>> cache = DownloadCache("cache/scores_downloads")
+        >>> response = session.get(url, headers=cache.request_headers((course_id, assignment_id)))
+        >>> download = cache.resolve((course_id, assignment_id), response.status_code, response.headers, response.content)
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        # "course_id/assignment_id" -> {"etag": ..., "last_modified": ..., "digest": ..., "size": ...}
+        self.entries = {}
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        try:
+            with open(os.path.join(directory, INDEX_FILE_NAME), "r") as index_file:
+                self.entries = json.load(index_file)
+        except (OSError, ValueError):
+            # A missing or unreadable index is an empty cache
+            self.entries = {}
+
+    def request_headers(self, key) -> dict:
+        """
+        Returns the conditional request headers for downloading `key` again, or {} if it is not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(self._key(key))
+            if entry is None or not os.path.exists(self._body_path(entry["digest"])):
+                return {}
+            headers = {}
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            return headers
+
+    def resolve(self, key, status_code: int, headers, content: bytes):
+        """
+        Caches the response to a download of `key` and returns it as a CachedDownload, with the cached body if the
+        server answered 304. Returns None if the download failed (or was answered 304 without a cached body).
+
+        Parameters:
+            key (tuple or str): Identifies the file, e.g. (course_id, assignment_id).
+            status_code (int): The status code of the response.
+            headers (Mapping): The response headers, with case-insensitive lookups (as `requests` and `httpx` have).
+            content (bytes): The response body.
+        """
+        key = self._key(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if status_code == 304:
+                if entry is None:
+                    return None
+                try:
+                    with open(self._body_path(entry["digest"]), "rb") as body_file:
+                        content = body_file.read()
+                except OSError:
+                    return None
+                self.not_modified += 1
+                self.bytes_saved += len(content)
+                return CachedDownload(content, changed=False, not_modified=True)
+            if not 200 <= status_code < 300:
+                return None
+            digest = hashlib.sha256(content).hexdigest()
+            changed = entry is None or entry["digest"] != digest
+            self.bytes_downloaded += len(content)
+            if changed:
+                self.changed += 1
+            else:
+                self.unchanged += 1
+            if changed or not os.path.exists(self._body_path(digest)):
+                self._write_body(digest, content)
+            self.entries[key] = {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified"),
+                                 "digest": digest, "size": len(content)}
+            if changed and entry is not None:
+                self._remove_unused_body(entry["digest"])
+            self._save_index()
+        return CachedDownload(content, changed=changed, not_modified=False)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of entries, how many downloads were answered 304, were unchanged anyway or changed, the bytes
+        downloaded, and the bytes that 304 responses did not need to download.
+        """
+        with self.lock:
+            downloads = self.not_modified + self.unchanged + self.changed
+            return {
+                "entries": len(self.entries),
+                "not_modified": self.not_modified,
+                "unchanged": self.unchanged,
+                "changed": self.changed,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+                "unchanged_rate": round((self.not_modified + self.unchanged) / downloads, 3) if downloads else None,
+            }
+
+    @staticmethod
+    def _key(key) -> str:
+        return key if isinstance(key, str) else "/".join(str(part) for part in key)
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def _write_body(self, digest: str, content: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self._body_path(digest) + ".tmp"
+        with open(temporary_path, "wb") as body_file:
+            body_file.write(content)
+        os.replace(temporary_path, self._body_path(digest))
+
+    def _remove_unused_body(self, digest: str):
+        # Bodies are shared by the entries with the same digest, e.g. two assignments nobody has submitted to
+        if not any(entry["digest"] == digest for entry in self.entries.values()):
+            try:
+                os.remove(self._body_path(digest))
+            except OSError:
+                pass
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILE_NAME)
+        with open(index_path + ".tmp", "w") as index_file:
+            json.dump(self.entries, index_file)
+        os.replace(index_path + ".tmp", index_path)
@@ -0,0 +1,109 @@
+"""
+Splits Gradescope's course gradebook export into the scores.csv of each assignment, so that a sync can download the
+scores of every assignment with one request instead of one per assignment.
+
+The export has one row per student: the student's columns (e.g. First Name, Last Name, SID, Email and Sections), then
+for every assignment a column named after its title with the student's score, followed by "<title> - Max Points",
+"<title> - Submission Time" and "<title> - Lateness (H:M:S)".
+
+The export is parsed once with pandas, and each assignment's CSV is built from whole columns of it: the student's
+columns as the export has them, then the columns of a scores.csv from Total Score up to Lateness (H:M:S). A scores.csv
+starts with the same student columns, so every column is in the same position as in a downloaded scores.csv, and the
+subsheets and the dashboard formulas that read them by column (e.g. SID in C, Total Score in F, Status in H) stay the
+same. The export has no submission-level columns: Submission ID is left empty, and View Count, Submission Count and the
+question scores are left out. Status is derived from the score and the submission time. `trim_scores_csv` trims a
+downloaded scores.csv to the same columns, so that an assignment's scores are the same text whichever way they were
+downloaded.
+
+This module only transforms data; it does not talk to Gradescope, so it can be timed on its own (see
+benchmarks/test_hot_paths.py).
+"""
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+# The columns of a scores.csv that follow the student's columns, up to the last one the export has an equivalent for
+SCORE_COLUMNS = ["Total Score", "Max Points", "Status", "Submission ID", "Submission Time", "Lateness (H:M:S)"]
+# The export's column of each assignment's scores.csv column, after the assignment title
+ASSIGNMENT_COLUMN_SUFFIXES = {
+    "Max Points": " - Max Points",
+    "Submission Time": " - Submission Time",
+    "Lateness (H:M:S)": " - Lateness (H:M:S)",
+}
+
+
+def export_student_columns(header: list) -> list:
+    """
+    Returns the student's columns of a gradebook export, i.e. the columns of `header` before the first assignment's.
+    """
+    columns = set(header)
+    for index, column in enumerate(header):
+        if column + ASSIGNMENT_COLUMN_SUFFIXES["Max Points"] in columns:
+            return header[:index]
+    return header
+
+
+def split_gradebook_export(export_content: str, titles) -> dict:
+    """
+    Builds the scores.csv of each assignment in `titles` from a course gradebook export.
+
+    Parameters:
+        export_content (str): The gradebook export, as downloaded from Gradescope.
+        titles (iterable): The titles of the assignments to split out.
+
+    Returns:
+        dict: {title: csv scores} for the titles that have exactly one score column in the export. Titles that are
+            missing (e.g. renamed since) or ambiguous are left out, so that callers can download them on their own.
+    """
+    header = next(csv.reader(io.StringIO(export_content.split("\n", 1)[0])), [])
+    header_counts = {}
+    for column in header:
+        header_counts[column] = header_counts.get(column, 0) + 1
+    titles = [title for title in titles if header_counts.get(title) == 1]
+    if not titles:
+        return {}
+    # Every cell is kept as the text Gradescope exported, as in a downloaded scores.csv
+    frame = pd.read_csv(io.StringIO(export_content), dtype=str, keep_default_na=False)
+    empty = pd.Series("", index=frame.index)
+    student_columns = export_student_columns(header)
+    # By position: pandas renames repeated column names
+    students = {column: frame.iloc[:, index] for index, column in enumerate(student_columns)}
+    assignment_scores = {}
+    for title in titles:
+        scores = frame[title]
+        submission_times = frame.get(title + ASSIGNMENT_COLUMN_SUFFIXES["Submission Time"], empty)
+        status = np.where(scores != "", "Graded", np.where(submission_times != "", "Ungraded", "Missing"))
+        assignment_frame = pd.DataFrame({
+            **students,
+            "Total Score": scores,
+            "Max Points": frame.get(title + ASSIGNMENT_COLUMN_SUFFIXES["Max Points"], empty),
+            "Status": status,
+            "Submission ID": empty,
+            "Submission Time": submission_times,
+            "Lateness (H:M:S)": frame.get(title + ASSIGNMENT_COLUMN_SUFFIXES["Lateness (H:M:S)"], empty),
+        }, columns=student_columns + SCORE_COLUMNS)
+        assignment_scores[title] = assignment_frame.to_csv(index=False, lineterminator="\n")
+    return assignment_scores
+
+
+def trim_scores_csv(scores_content: str) -> str:
+    """
+    Trims the scores.csv of one assignment to the columns `split_gradebook_export` builds, with an empty Submission ID.
+
+    Parameters:
+        scores_content (str): The scores.csv, as downloaded from Gradescope.
+
+    Returns:
+        str: The trimmed scores.csv, or `scores_content` unchanged if it does not have the columns of a scores.csv.
+    """
+    try:
+        frame = pd.read_csv(io.StringIO(scores_content), dtype=str, keep_default_na=False)
+    except ValueError:
+        return scores_content
+    if not set(SCORE_COLUMNS) <= set(frame.columns):
+        return scores_content
+    student_columns = list(frame.columns[:frame.columns.get_loc("Total Score")])
+    trimmed_frame = frame[student_columns + SCORE_COLUMNS].assign(**{"Submission ID": ""})
+    return trimmed_frame.to_csv(index=False, lineterminator="\n")
@@ -8,8 +8,13 @@ import os.path
 import re
 import io
 import time
+import datetime
 import warnings
 import functools
+import contextlib
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from googleapiclient.errors import HttpError
 import gspread
 from googleapiclient.discovery import build
@@ -19,7 +24,14 @@ import backoff
 import csv
 import pandas as pd
 import backoff_utils
-import requests
+import dashboard_engine
+import sync_metrics
+import sync_profile
+import sync_tiers
+from download_cache import DownloadCache
+from gradebook_export import split_gradebook_export, trim_scores_csv
+import cProfile
+from assignment_classifier import AssignmentClassifier, extract_assignment_dates, extract_assignments
 
 load_dotenv()
 GRADESCOPE_EMAIL = os.getenv("GRADESCOPE_EMAIL")
@@ -73,6 +85,65 @@ INCLUDE_PYTURIS = config["INCLUDE_PYTURIS"]
 
 PYTURIS_ASSIGNMENT_ID = str(config["PYTURIS_ASSIGNMENT_ID"])
 
+# Number of GradeScope score downloads that run concurrently while sheet requests are being assembled
+DOWNLOAD_WORKERS = config.get("DOWNLOAD_WORKERS", 8)
+# "assignment" downloads the scores.csv of every assignment. "bulk" downloads the course's gradebook export once and
+# splits it into the scores of each assignment (see gradebook_export.py); the assignments in PER_ASSIGNMENT_DOWNLOADS
+# (titles), which need the submission-level columns the export lacks, and those missing from the export, are still
+# downloaded one at a time. The latter are trimmed to the columns of the export, so that their scores do not change
+# when they are found in the export again
+GRADESCOPE_DOWNLOAD_MODE = config.get("GRADESCOPE_DOWNLOAD_MODE", "assignment")
+PER_ASSIGNMENT_DOWNLOADS = config.get("PER_ASSIGNMENT_DOWNLOADS", [])
+
+# Local files that persist between runs (e.g. digests of the grades that were last pushed) are kept here
+STATE_DIRECTORY = config.get("STATE_DIRECTORY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state"))
+ASSIGNMENT_DIGESTS_PATH = os.path.join(STATE_DIRECTORY, "assignment_digests.json")
+# If true, an assignment whose downloaded csv is identical to the one pushed in a previous run is not pasted again
+SKIP_UNCHANGED_ASSIGNMENTS = config.get("SKIP_UNCHANGED_ASSIGNMENTS", True)
+# The assignments that a run cut short (by SYNC_DEADLINE_SECONDS, or killed) had already pushed; the next run starts with the others
+SYNC_CHECKPOINT_PATH = os.path.join(STATE_DIRECTORY, "sync_checkpoint.json")
+# Once a run has taken this long, it stops assembling requests, sends those it has, and leaves the other assignments to the
+# next run. This is below the 300 seconds after which cron's `timeout` (or sync_scheduler.py) kills a run
+SYNC_DEADLINE_SECONDS = config.get("SYNC_DEADLINE_SECONDS", 240)
+# If true, each run only downloads the assignments whose scores may have changed, by their tier (see sync_tiers.py): hot
+# ones every run, warm ones every TIER_WARM_INTERVAL_HOURS, and frozen ones every TIER_FROZEN_RECHECK_DAYS or on request
+TIERED_SYNC = config.get("TIERED_SYNC", True)
+TIER_HOT_HOURS = config.get("TIER_HOT_HOURS", 48)
+TIER_WARM_INTERVAL_HOURS = config.get("TIER_WARM_INTERVAL_HOURS", 24)
+TIER_FROZEN_AFTER_DAYS = config.get("TIER_FROZEN_AFTER_DAYS", 14)
+TIER_FROZEN_RECHECK_DAYS = config.get("TIER_FROZEN_RECHECK_DAYS", 7)
+ASSIGNMENT_ACTIVITY_PATH = os.path.join(STATE_DIRECTORY, "assignment_activity.json")
+# If true, scores are downloaded with conditional requests, and the last download of each assignment is kept here, so
+# that an unchanged scores.csv is not downloaded again if Gradescope answers 304 (see download_cache.py)
+CONDITIONAL_DOWNLOADS = config.get("CONDITIONAL_DOWNLOADS", True)
+DOWNLOAD_CACHE_DIRECTORY = os.path.join(STATE_DIRECTORY, "download_cache")
+
+# The requests of a batch are split into chunks of at most this many bytes and requests, so that no single
+# batchUpdate exceeds the Sheets request size limit and a failed chunk can be retried on its own
+SHEETS_BATCH_MAX_BYTES = config.get("SHEETS_BATCH_MAX_BYTES", 2_000_000)
+SHEETS_BATCH_MAX_REQUESTS = config.get("SHEETS_BATCH_MAX_REQUESTS", 100)
+# Number of chunks sent concurrently, and the write quota they share (Sheets allows 60 writes per minute per user)
+SHEETS_BATCH_WORKERS = config.get("SHEETS_BATCH_WORKERS", 4)
+SHEETS_WRITE_REQUESTS_PER_MINUTE = config.get("SHEETS_WRITE_REQUESTS_PER_MINUTE", 60)
+# "paste" overwrites an existing assignment subsheet with the whole csv. "diff" reads the subsheet first and only writes
+# the cells that changed, which sends far fewer bytes and makes Sheets recalculate far fewer dashboard formulas
+SHEETS_WRITE_MODE = config.get("SHEETS_WRITE_MODE", "paste")
+
+# A JSON profile of every run (seconds, upstream calls and bytes per stage and per assignment) is written next to the
+# log in /var/log, and the profiles of the last PROFILE_RUNS_TO_KEEP runs are kept. With PROFILE_WITH_CPROFILE, each run
+# is also profiled with cProfile, and its stats are dumped next to its JSON profile.
+PROFILE_DIRECTORY = config.get("PROFILE_DIRECTORY", "/var/log/gradesync_profiles")
+PROFILE_RUNS_TO_KEEP = config.get("PROFILE_RUNS_TO_KEEP", 48)
+PROFILE_WITH_CPROFILE = config.get("PROFILE_WITH_CPROFILE", False)
+
+# "sheets" fills the gradebook subsheets with XLOOKUP formulas that Google Sheets evaluates. "server" instead computes
+# every student's scores with dashboard_engine and writes them as plain values to the DASHBOARD_SHEET_NAME subsheet
+DASHBOARD_ENGINE = config.get("DASHBOARD_ENGINE", "sheets")
+DASHBOARD_SHEET_NAME = config.get("DASHBOARD_SHEET_NAME", "Dashboard")
+# Categorizes assignments by title with the ASSIGNMENT_CATEGORIES rules of the config file (the CS10 rules by default).
+# The API uses the same rules for /getAssignmentJSON.
+ASSIGNMENT_CLASSIFIER = AssignmentClassifier.from_config(config)
+
 # These constants are depracated. The following explanation is for what their purpose was. ASSIGNMENT_ID constant is for users who wish to generate a sub-sheet (not update the dashboard) for one assignment, passing it as a parameter.
 ASSIGNMENT_ID = (len(sys.argv) > 1) and sys.argv[1]
 ASSIGNMENT_NAME = (len(sys.argv) > 2) and sys.argv[2]
@@ -94,6 +165,41 @@ subsheet_titles_to_ids = None
 number_of_retries_needed_to_update_sheet = 0
 
 request_list = []
+# Value ranges to be written with one values.batchUpdate when SHEETS_WRITE_MODE is "diff"
+value_range_list = []
+
+# Maps assignment ids to their AssignmentDates, as found on the assignments page of the current run; see sync_tiers.py
+assignment_dates = {}
+# When each assignment was last downloaded and last changed, persisted at ASSIGNMENT_ACTIVITY_PATH; loaded every run
+assignment_activity = sync_tiers.AssignmentActivity(ASSIGNMENT_ACTIVITY_PATH)
+# The DownloadCache of the current run if CONDITIONAL_DOWNLOADS is set, loaded from DOWNLOAD_CACHE_DIRECTORY every run
+download_cache = None
+
+# Seconds spent in each stage of the current run, filled in by timed_stage
+stage_timings = {}
+# Upstream calls and bytes of each stage, and the download of each assignment, of the current run; see sync_profile.py
+run_profile = sync_profile.SyncProfile()
+
+# Maps assignment ids to the sha256 digest of the csv scores last pushed to sheets, persisted at ASSIGNMENT_DIGESTS_PATH
+pushed_assignment_digests = {}
+# Digests of the csv scores in request_list; they are only recorded as pushed once the batch request succeeds
+pending_assignment_digests = {}
+# Ids of the assignments of the current run that were unchanged or whose requests were sent, written to SYNC_CHECKPOINT_PATH
+completed_assignment_ids = set()
+# Ids of the assignments that the current run left to the next one, because it reached run_deadline
+deferred_assignment_ids = []
+# When the current run stops assembling requests; see SYNC_DEADLINE_SECONDS
+run_deadline = float("inf")
+
+# Chunk count, bytes and latencies of the batch requests of the current run, filled in by make_batch_request
+batch_metrics = {"batches": 0, "chunks": 0, "failed_chunks": 0, "bytes": 0, "chunk_latencies": [], "changed_cells": 0}
+# Each chunk-sending thread builds its own sheets api instance, because the underlying http client is not thread-safe
+thread_local_sheets = threading.local()
+# The earliest time the next sheets write may be sent without exceeding SHEETS_WRITE_REQUESTS_PER_MINUTE
+next_sheets_write_time = 0
+sheets_write_quota_lock = threading.Lock()
+# PrairieLearn requests are sent over this session, which records their latency in sync_metrics
+prairielearn_session = sync_metrics.TimedSession("prairielearn", on_request=run_profile.record_request)
 
 def deprecated(func):
     @functools.wraps(func)
@@ -115,7 +221,8 @@ client = gspread.authorize(credentials)
 def create_sheet_and__request_to_populate_it(sheet_api_instance, assignment_scores, assignment_name = ASSIGNMENT_NAME):
     """
     Creates a sheet and adds the request that will populate the sheet to request_list.
-    TODO: Add parameters and return value in this docstring.
+    Returns True if the request was added, and False if an error occurred.
+    TODO: Add parameters in this docstring.
     """
     global number_of_retries_needed_to_update_sheet
     try:
@@ -141,10 +248,12 @@ def create_sheet_and__request_to_populate_it(sheet_api_instance, assignment_scor
         assemble_rest_request_for_assignment(assignment_scores, sheet_api_instance, sheet_id)
         logger.info(f"Created sheets request for {assignment_name}")
         number_of_retries_needed_to_update_sheet = 0
+        return True
     except HttpError as err:
         logger.error(f"An HttpError has occurred: {err}")
     except Exception as err:
         logger.error(f"An unknown error has occurred: {err}")
+    return False
 
 
 def create_sheet_api_instance():
@@ -186,8 +295,26 @@ def backoff_handler(backoff_response=None):
     TODO: Add parameters and return value in this docstring.
     """
     global number_of_retries_needed_to_update_sheet
-    number_of_retries_needed_to_update_sheet += 1
-    pass
+    with sheets_write_quota_lock:
+        number_of_retries_needed_to_update_sheet += 1
+    sync_metrics.UPSTREAM_RETRIES.labels("sheets", "rate limited").inc()
+    run_profile.record_retry("sheets")
+
+
+@contextlib.contextmanager
+def timed_stage(stage_name):
+    """
+    Context manager that logs how long the enclosed stage of the sync took and records it in stage_timings.
+    Entering the same stage twice accumulates its time. Upstream requests sent meanwhile are counted in run_profile.
+    """
+    start_time = time.time()
+    try:
+        with run_profile.stage(stage_name):
+            yield
+    finally:
+        elapsed = time.time() - start_time
+        stage_timings[stage_name] = stage_timings.get(stage_name, 0) + elapsed
+        logger.info(f"Stage '{stage_name}' finished in {round(elapsed, 2)} seconds")
 
 
 def store_request(request):
@@ -210,7 +337,26 @@ def make_request(request):
     Makes one request (with backoff logic)
     TODO: Add parameters and return value in this docstring.
     """
-    return request.execute()
+    return execute_timed(request)
+
+
+def execute_timed(request):
+    """
+    Executes one Google Sheets request, records its latency and status code in sync_metrics, and counts it in
+    run_profile. The Sheets client does not expose the size of its responses, so only the bytes sent are counted.
+    """
+    start_time = time.perf_counter()
+    status = "error"
+    try:
+        response = request.execute()
+        status = 200
+        run_profile.record_request("sheets", bytes_sent=len(request.body or ""))
+        return response
+    except HttpError as err:
+        status = err.resp.status
+        raise
+    finally:
+        sync_metrics.observe_upstream_request("sheets", time.perf_counter() - start_time, status)
 
 
 def assemble_rest_request_for_assignment(assignment_scores, sheet_api_instance, sheet_id, rowIndex = 0, columnIndex=0):
@@ -240,7 +386,7 @@ def retrieve_preexisting_columns(assignment_type, sheet_api_instance):
     TODO: Add parameters and return value in this docstring.
     """
     range = f'{assignment_type}!1:1'
-    result = sheet_api_instance.values().get(spreadsheetId=SPREADSHEET_ID, range=range).execute()
+    result = execute_timed(sheet_api_instance.values().get(spreadsheetId=SPREADSHEET_ID, range=range))
     first_row = result.get('values', [])
     return first_row[0][3:]
 
@@ -248,17 +394,61 @@ def retrieve_preexisting_columns(assignment_type, sheet_api_instance):
 def retrieve_grades_from_gradescope(gradescope_client, assignment_id = ASSIGNMENT_ID):
     """
     Retrieves grades for one GradeScope assignment in csv form.
-    TODO: Add parameters and return value in this docstring.
+    With CONDITIONAL_DOWNLOADS, the download is conditional on the scores having changed since they were last
+    downloaded, and the cached scores are returned if Gradescope answers that they have not.
+    Parameters:
+        gradescope_client: A logged-in Gradescope client.
+        assignment_id (str): The id of the assignment in GRADESCOPE_COURSE_ID.
+    Returns:
+        str: The assignment's scores.csv, decoded from UTF-8, to be pasted into its subsheet.
+    Raises:
+        RuntimeError: If the download failed, so that the assignment is skipped instead of its subsheet being
+            overwritten.
     """
-    assignment_scores = str(gradescope_client.download_scores(GRADESCOPE_COURSE_ID, assignment_id)).replace("\\n", "\n")
-    return assignment_scores
+    if download_cache is None:
+        scores = gradescope_client.download_scores(GRADESCOPE_COURSE_ID, assignment_id)
+        # fullGSapi returns False instead of raising when the download fails
+        if not scores:
+            raise RuntimeError(f"Failed to download the scores of assignment {assignment_id}")
+    else:
+        scores = download_scores_conditionally(gradescope_client, assignment_id)
+    return scores.decode("utf-8")
+
+
+def legacy_scores_digest(assignment_scores):
+    """
+    Returns the digest that earlier versions recorded for these scores, which pasted the repr of the downloaded bytes
+    (b'Name,...') instead of the decoded csv.
+    """
+    return hashlib.sha256(str(assignment_scores.encode("utf-8")).replace("\\n", "\n").encode("utf-8")).hexdigest()
+
+
+def download_scores_conditionally(gradescope_client, assignment_id):
+    """
+    Same as gradescope_client.download_scores, with the conditional request headers of download_cache.
+    Raises a RuntimeError if the download failed.
+    """
+    if not gradescope_client.logged_in:
+        raise RuntimeError("You must be logged in to download grades!")
+    key = (GRADESCOPE_COURSE_ID, assignment_id)
+    gradescope_client.last_res = res = gradescope_client.session.get(
+        f"https://www.gradescope.com/courses/{GRADESCOPE_COURSE_ID}/assignments/{assignment_id}/scores.csv",
+        headers=download_cache.request_headers(key))
+    download = download_cache.resolve(key, res.status_code, res.headers, res.content)
+    if download is None:
+        raise RuntimeError(f"Failed to get a response from gradescope! Got: {res}")
+    return download.content
 
 
 def initialize_gs_client():
     """
     Initializes GradeScope API client.
+    Its requests are sent over a sync_metrics.TimedSession, so that they are part of the run's metrics and profile.
     """
     gradescope_client = GradescopeClient.GradescopeClient()
+    headers = gradescope_client.session.headers
+    gradescope_client.session = sync_metrics.TimedSession("gradescope", on_request=run_profile.record_request)
+    gradescope_client.session.headers.update(headers)
     gradescope_client.log_in(GRADESCOPE_EMAIL, GRADESCOPE_PASSWORD)
     return gradescope_client
 
@@ -275,6 +465,11 @@ def get_assignment_info(gs_instance, class_id: str) -> bytes:
     if not res or not res.ok:
         logger.error(f"Failed to get a response from gradescope! Got: {res}")
         return False
+    if "/login" in res.url:
+        # The session expired (e.g. in a client kept between runs by sync_scheduler.py), so log in again next run
+        logger.error("Gradescope redirected to the login page; the session has expired")
+        gs_instance.logged_in = False
+        return False
     return res.content
 
 
@@ -290,54 +485,682 @@ def prepare_request_for_one_assignment(sheet_api_instance, gradescope_client, as
 
 
 
+def load_assignment_digests():
+    """
+    Loads the digests of the csv scores pushed in previous runs into pushed_assignment_digests.
+    A missing or unreadable file is treated as no assignment having been pushed yet.
+    """
+    global pushed_assignment_digests
+    try:
+        with open(ASSIGNMENT_DIGESTS_PATH, "r") as digests_file:
+            pushed_assignment_digests = json.load(digests_file)
+    except FileNotFoundError:
+        pushed_assignment_digests = {}
+    except (OSError, ValueError) as err:
+        logger.warning(f"Ignoring unreadable assignment digests at {ASSIGNMENT_DIGESTS_PATH}: {err}")
+        pushed_assignment_digests = {}
+
+
+def save_assignment_digests():
+    """
+    Records the digests in pending_assignment_digests as pushed, and persists them to ASSIGNMENT_DIGESTS_PATH.
+    This must only be called once the batch request containing those assignments has succeeded.
+    """
+    pushed_assignment_digests.update(pending_assignment_digests)
+    completed_assignment_ids.update(pending_assignment_digests)
+    pending_assignment_digests.clear()
+    os.makedirs(STATE_DIRECTORY, exist_ok=True)
+    # Write to a temporary file first so that a run killed mid-write cannot leave a truncated file behind
+    temporary_path = ASSIGNMENT_DIGESTS_PATH + ".tmp"
+    with open(temporary_path, "w") as digests_file:
+        json.dump(pushed_assignment_digests, digests_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, ASSIGNMENT_DIGESTS_PATH)
+
+
+def load_sync_checkpoint():
+    """
+    Returns the ids of the assignments that the previous run had pushed, if it was cut short, and an empty set otherwise.
+    A missing or unreadable checkpoint is treated as the previous run having finished.
+    """
+    try:
+        with open(SYNC_CHECKPOINT_PATH, "r") as checkpoint_file:
+            return set(json.load(checkpoint_file)["completed_assignment_ids"])
+    except FileNotFoundError:
+        return set()
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        logger.warning(f"Ignoring unreadable sync checkpoint at {SYNC_CHECKPOINT_PATH}: {err}")
+        return set()
+
+
+def save_sync_checkpoint():
+    """
+    Persists completed_assignment_ids to SYNC_CHECKPOINT_PATH, so that a run killed from now on is resumed by the next one.
+    """
+    os.makedirs(STATE_DIRECTORY, exist_ok=True)
+    temporary_path = SYNC_CHECKPOINT_PATH + ".tmp"
+    with open(temporary_path, "w") as checkpoint_file:
+        json.dump({"started_at": sync_profile.format_timestamp(run_profile.started_at),
+                   "completed_assignment_ids": sorted(completed_assignment_ids)}, checkpoint_file, indent=2)
+    os.replace(temporary_path, SYNC_CHECKPOINT_PATH)
+
+
+def clear_sync_checkpoint():
+    """
+    Deletes the checkpoint once a run has processed every assignment.
+    """
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(SYNC_CHECKPOINT_PATH)
+
+
+def flush_requests(sheet_api_instance):
+    """
+    Sends the requests assembled so far, in the middle of a run, so that they are not lost if the run is killed. Once
+    request_list and value_range_list are empty, their assignments are recorded as pushed and checkpointed.
+    The requests of failed chunks are kept and sent again by the next flush; a failure is logged and does not end the run.
+    """
+    with timed_stage("batch request"):
+        for send in (make_batch_request, make_values_batch_request):
+            try:
+                send(sheet_api_instance)
+            except RuntimeError as err:
+                logger.error(f"Failed to flush requests; retrying them with the next batch: {err}")
+    if request_list or value_range_list:
+        return
+    save_assignment_digests()
+    save_sync_checkpoint()
+
+
+def order_for_resuming(assignment_ids):
+    """
+    Moves the assignments that the previous run pushed, if it was cut short, after the others, so that the same slow
+    assignments at the start of the list cannot use up every run's time.
+    """
+    resumed_ids = load_sync_checkpoint()
+    if not resumed_ids:
+        return assignment_ids
+    remaining_ids = [id for id in assignment_ids if id not in resumed_ids]
+    logger.info(f"Resuming the previous run, which was cut short: starting with the {len(remaining_ids)} assignments it did not push")
+    return remaining_ids + [id for id in assignment_ids if id in resumed_ids]
+
+
+def select_assignments_to_sync(assignment_id_to_names, all_tiers=False):
+    """
+    Returns the part of assignment_id_to_names to download in this run: with TIERED_SYNC, the hot assignments, the warm
+    ones not downloaded for TIER_WARM_INTERVAL_HOURS, and the frozen ones not downloaded for TIER_FROZEN_RECHECK_DAYS
+    (see sync_tiers.py). With all_tiers, or when the server-side dashboard needs every assignment's scores, every assignment.
+    """
+    global assignment_activity
+    assignment_activity = sync_tiers.AssignmentActivity(ASSIGNMENT_ACTIVITY_PATH)
+    error = assignment_activity.load()
+    if error:
+        logger.warning(f"Ignoring unreadable assignment activity at {ASSIGNMENT_ACTIVITY_PATH}: {error}")
+    now = datetime.datetime.now(datetime.timezone.utc)
+    selected_ids, tiers = sync_tiers.select_assignments(
+        assignment_id_to_names, assignment_dates, assignment_activity, now,
+        hot_window=datetime.timedelta(hours=TIER_HOT_HOURS),
+        warm_interval=datetime.timedelta(hours=TIER_WARM_INTERVAL_HOURS),
+        frozen_after=datetime.timedelta(days=TIER_FROZEN_AFTER_DAYS),
+        frozen_recheck_interval=datetime.timedelta(days=TIER_FROZEN_RECHECK_DAYS),
+        all_tiers=all_tiers or not TIERED_SYNC or DASHBOARD_ENGINE == "server",
+    )
+    for tier in sync_tiers.TIERS:
+        sync_metrics.ASSIGNMENT_TIERS.labels(tier).set(sum(assignment_tier == tier for assignment_tier in tiers.values()))
+    selected = set(selected_ids)
+    for id, tier in tiers.items():
+        run_profile.record_assignment(id, name=assignment_id_to_names[id], tier=tier)
+        if id not in selected:
+            run_profile.record_assignment(id, outcome="skipped")
+    logger.info(f"Syncing {len(selected_ids)} of {len(tiers)} assignments: "
+                + ", ".join(f"{sum(tiers[id] == tier for id in selected_ids)} of {sum(value == tier for value in tiers.values())} {tier}"
+                            for tier in sync_tiers.TIERS))
+    return {id: assignment_id_to_names[id] for id in selected_ids}
+
+
+def download_scores_in_bulk(gradescope_client, assignment_id_to_names):
+    """
+    Downloads the course's gradebook export with one request, and splits it into the csv scores of each assignment of
+    assignment_id_to_names, except those in PER_ASSIGNMENT_DOWNLOADS.
+    Returns {assignment_id: csv scores} for the assignments found in the export, or {} if it could not be downloaded,
+    so that the others are downloaded one at a time.
+    """
+    start_time = time.time()
+    url = f"https://www.gradescope.com/courses/{GRADESCOPE_COURSE_ID}/gradebook.csv"
+    key = (GRADESCOPE_COURSE_ID, "gradebook.csv")
+    try:
+        if download_cache is None:
+            res = gradescope_client.session.get(url)
+            export = res.content if res.ok and "/login" not in res.url else None
+        else:
+            res = gradescope_client.session.get(url, headers=download_cache.request_headers(key))
+            download = download_cache.resolve(key, res.status_code, res.headers, res.content) if "/login" not in res.url else None
+            export = download.content if download is not None else None
+    except Exception as err:
+        logger.error(f"Failed to download the gradebook export: {err}")
+        return {}
+    if export is None:
+        logger.error(f"Failed to download the gradebook export; downloading every assignment on its own. Got: {res}")
+        return {}
+    titles_to_ids = {}
+    for id, name in assignment_id_to_names.items():
+        if name not in PER_ASSIGNMENT_DOWNLOADS:
+            titles_to_ids.setdefault(name, []).append(id)
+    # Assignments with the same title cannot be told apart in the export
+    titles = [title for title, ids in titles_to_ids.items() if len(ids) == 1]
+    split_scores = split_gradebook_export(export.decode("utf-8"), titles)
+    logger.info(f"Split the gradebook export ({len(export)} bytes) into {len(split_scores)} of {len(assignment_id_to_names)} "
+                f"assignments in {round(time.time() - start_time, 2)} seconds")
+    return {titles_to_ids[title][0]: assignment_scores for title, assignment_scores in split_scores.items()}
+
+
+def split_download(assignment_scores):
+    """
+    Returns a finished download of assignment scores split from the gradebook export, in place of a download future.
+    """
+    download = Future()
+    download.set_result((assignment_scores, 0))
+    return download
+
+
+def download_assignment_scores(gradescope_client, assignment_id, trim=False):
+    """
+    Downloads the grades for one GradeScope assignment and measures how long the download took.
+    This runs on the download worker threads, so it must not touch the Sheets API or request_list.
+    If trim is set, the scores are trimmed to the columns of the gradebook export (see gradebook_export.trim_scores_csv).
+    Returns a tuple of the csv scores and the elapsed seconds.
+    """
+    start_time = time.time()
+    assignment_scores = retrieve_grades_from_gradescope(gradescope_client=gradescope_client, assignment_id=assignment_id)
+    if trim:
+        assignment_scores = trim_scores_csv(assignment_scores)
+    return assignment_scores, time.time() - start_time
+
+
+def prepare_requests_for_all_assignments(sheet_api_instance, gradescope_client, assignment_id_to_names, downloaded_scores=None):
+    """
+    Downloads the grades for every assignment on DOWNLOAD_WORKERS threads, and assembles the sheets request for each
+    one on the calling thread as soon as its download is available.
+    Requests are assembled in the order of assignment_id_to_names regardless of the order in which downloads finish,
+    so request_list is the same as in a serial run. An assignment whose download fails is logged and skipped.
+    If SKIP_UNCHANGED_ASSIGNMENTS is set, an assignment whose scores match the digest of the last pushed scores, and whose
+    subsheet still exists, is skipped as well.
+    If SHEETS_WRITE_MODE is "diff", assignments whose subsheet already exists are diffed against it once every download
+    has finished, instead of being pasted.
+    If downloaded_scores is given, the csv scores of every downloaded assignment (changed or not) are stored in it by id.
+    With GRADESCOPE_DOWNLOAD_MODE "bulk", the scores of the assignments in the gradebook export are split from it instead
+    of being downloaded (see download_scores_in_bulk), and those of the other assignments not in PER_ASSIGNMENT_DOWNLOADS
+    are trimmed to the same columns.
+    Assignments the previous run did not push, if it was cut short, come first. Requests are flushed whenever a full
+    batch chunk has been assembled. Once run_deadline passes, the remaining downloads are cancelled, without waiting for
+    those already running, and their assignments are left to the next run, in deferred_assignment_ids.
+    """
+    assignment_ids = order_for_resuming(list(assignment_id_to_names))
+    assignments_to_diff = []
+    assembled_bytes = 0
+    total_download_time = 0
+    total_assembly_time = 0
+    unchanged_assignments = 0
+    unchanged_bytes = 0
+    download_wall_start_time = time.time()
+    bulk_scores = {}
+    if GRADESCOPE_DOWNLOAD_MODE == "bulk":
+        bulk_scores = download_scores_in_bulk(gradescope_client, {id: assignment_id_to_names[id] for id in assignment_ids})
+    # Not a `with` block: its exit would wait for the downloads still running at the deadline
+    executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+    reached_deadline = False
+    try:
+        downloads = [split_download(bulk_scores[id]) if id in bulk_scores
+                     else executor.submit(download_assignment_scores, gradescope_client, id,
+                                          trim=GRADESCOPE_DOWNLOAD_MODE == "bulk"
+                                          and assignment_id_to_names[id] not in PER_ASSIGNMENT_DOWNLOADS)
+                     for id in assignment_ids]
+        for index, (id, download) in enumerate(zip(assignment_ids, downloads)):
+            time_left = run_deadline - time.time()
+            if time_left <= 0 or not wait([download], timeout=time_left).done:
+                reached_deadline = True
+                deferred_assignment_ids.extend(assignment_ids[index:])
+                logger.warning(f"Reached the deadline of {SYNC_DEADLINE_SECONDS} seconds; leaving {len(assignment_ids) - index} "
+                               f"assignments to the next run")
+                for deferred_id in assignment_ids[index:]:
+                    run_profile.record_assignment(deferred_id, name=assignment_id_to_names[deferred_id], outcome="deferred")
+                break
+            try:
+                assignment_scores, download_time = download.result()
+            except Exception as err:
+                logger.error(f"Failed to download grades for {assignment_id_to_names[id]}: {err}")
+                run_profile.record_assignment(id, name=assignment_id_to_names[id], outcome="download failed")
+                continue
+            total_download_time += download_time
+            assignment_name = assignment_id_to_names[id]
+            if downloaded_scores is not None:
+                downloaded_scores[id] = assignment_scores
+            encoded_scores = assignment_scores.encode("utf-8")
+            digest = hashlib.sha256(encoded_scores).hexdigest()
+            # A first download is not a change: only a different digest than the one pushed before is, e.g. after a regrade.
+            # Scores pushed as the repr of their bytes are pasted again, decoded, but their scores did not change
+            previous_digest = pushed_assignment_digests.get(id)
+            assignment_activity.record_download(id, datetime.datetime.now(datetime.timezone.utc),
+                                                changed=previous_digest not in (None, digest, legacy_scores_digest(assignment_scores)))
+            run_profile.record_assignment(id, name=assignment_name, download_seconds=round(download_time, 3),
+                                          bytes=len(encoded_scores))
+            if (SKIP_UNCHANGED_ASSIGNMENTS and pushed_assignment_digests.get(id) == digest
+                    and assignment_name in get_sub_sheet_titles_to_ids(sheet_api_instance)):
+                unchanged_assignments += 1
+                unchanged_bytes += len(encoded_scores)
+                completed_assignment_ids.add(id)
+                sync_metrics.CACHE_LOOKUPS.labels("assignment_digests", "hit").inc()
+                run_profile.record_assignment(id, outcome="unchanged")
+                continue
+            if SKIP_UNCHANGED_ASSIGNMENTS:
+                sync_metrics.CACHE_LOOKUPS.labels("assignment_digests", "miss").inc()
+            assembly_start_time = time.time()
+            if SHEETS_WRITE_MODE == "diff" and assignment_name in get_sub_sheet_titles_to_ids(sheet_api_instance):
+                assignments_to_diff.append((id, assignment_name, assignment_scores, digest))
+                if len(assignments_to_diff) >= SHEETS_BATCH_MAX_REQUESTS:
+                    request_diff_writes_for_assignments(sheet_api_instance, assignments_to_diff)
+                    assignments_to_diff = []
+            elif create_sheet_and__request_to_populate_it(sheet_api_instance, assignment_scores, assignment_name):
+                pending_assignment_digests[id] = digest
+                assembled_bytes += len(encoded_scores)
+                run_profile.record_assignment(id, outcome="pasted")
+            else:
+                run_profile.record_assignment(id, outcome="request failed")
+            total_assembly_time += time.time() - assembly_start_time
+            if (len(request_list) >= SHEETS_BATCH_MAX_REQUESTS or len(value_range_list) >= SHEETS_BATCH_MAX_REQUESTS
+                    or assembled_bytes >= SHEETS_BATCH_MAX_BYTES):
+                flush_requests(sheet_api_instance)
+                assembled_bytes = 0
+    finally:
+        # Downloads that have not started are cancelled. Those still running at the deadline are left to finish in the
+        # background, and their scores are discarded; their assignments are downloaded again by the next run
+        executor.shutdown(wait=not reached_deadline, cancel_futures=True)
+    stage_timings["download scores"] = time.time() - download_wall_start_time
+    if assignments_to_diff:
+        assembly_start_time = time.time()
+        request_diff_writes_for_assignments(sheet_api_instance, assignments_to_diff)
+        total_assembly_time += time.time() - assembly_start_time
+    stage_timings["assemble requests"] = total_assembly_time
+    logger.info(f"Downloaded {len(assignment_ids) - len(deferred_assignment_ids)} assignments with {DOWNLOAD_WORKERS} workers in "
+                f"{round(stage_timings['download scores'], 2)} seconds ({round(total_download_time, 2)} seconds of download time, "
+                f"{round(total_assembly_time, 2)} seconds assembling requests)")
+    logger.info(f"Skipped {unchanged_assignments} unchanged assignments, avoiding {unchanged_assignments} sheet writes "
+                f"and {unchanged_bytes} bytes of pasted data")
+
+
+def column_index_to_letters(column_index):
+    """
+    Converts a 0-based column index to its A1 notation letters, e.g. 0 -> "A", 26 -> "AA".
+    """
+    letters = ""
+    column_index += 1
+    while column_index:
+        column_index, remainder = divmod(column_index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def quote_sheet_title(sheet_title):
+    """
+    Quotes a subsheet title for use in A1 notation, e.g. "Lab 2: Basics" -> "'Lab 2: Basics'".
+    """
+    return "'" + sheet_title.replace("'", "''") + "'"
+
+
+def cells_are_equal(sheet_value, csv_value):
+    """
+    Compares a cell read back from sheets (as an unformatted value) with the csv text that would be pasted into it.
+    Sheets parses pasted numbers and booleans, so e.g. the csv text "90.0" matches the sheet value 90.
+    """
+    if isinstance(sheet_value, bool):
+        return str(sheet_value).upper() == csv_value.upper()
+    if isinstance(sheet_value, (int, float)):
+        try:
+            return float(csv_value) == sheet_value
+        except ValueError:
+            return False
+    return str(sheet_value) == csv_value
+
+
+def compute_changed_ranges(sheet_title, current_values, new_rows):
+    """
+    Computes the value ranges that turn the current contents of a subsheet into new_rows.
+    current_values is the subsheet as returned by values().get (rows and trailing cells that are empty are omitted), and
+    new_rows is the parsed csv. Cells that no longer exist in new_rows are cleared.
+    Changed cells are grouped into horizontal runs per row, and runs spanning the same columns in consecutive rows are
+    merged into one rectangle, so a regraded column becomes a single range.
+    Returns a list of {"range": A1 range, "values": rows of cell values} dictionaries for values.batchUpdate.
+    """
+    def new_cell(row_index, column_index):
+        new_row = new_rows[row_index] if row_index < len(new_rows) else []
+        return new_row[column_index] if column_index < len(new_row) else ""
+
+    row_runs = []
+    for row_index in range(max(len(current_values), len(new_rows))):
+        current_row = current_values[row_index] if row_index < len(current_values) else []
+        new_row = new_rows[row_index] if row_index < len(new_rows) else []
+        width = max(len(current_row), len(new_row))
+        run_start = None
+        for column_index in range(width + 1):
+            changed = column_index < width and not cells_are_equal(
+                current_row[column_index] if column_index < len(current_row) else "", new_cell(row_index, column_index))
+            if changed and run_start is None:
+                run_start = column_index
+            elif not changed and run_start is not None:
+                row_runs.append((row_index, run_start, column_index - 1))
+                run_start = None
+
+    # Each block is [first row, last row, first column, last column]
+    blocks = []
+    open_blocks = {}
+    for row_index, first_column, last_column in row_runs:
+        block = open_blocks.get((first_column, last_column))
+        if block and block[1] == row_index - 1:
+            block[1] = row_index
+        else:
+            block = [row_index, row_index, first_column, last_column]
+            blocks.append(block)
+            open_blocks[(first_column, last_column)] = block
+
+    value_ranges = []
+    for first_row, last_row, first_column, last_column in blocks:
+        a1_range = (f"{quote_sheet_title(sheet_title)}!{column_index_to_letters(first_column)}{first_row + 1}:"
+                    f"{column_index_to_letters(last_column)}{last_row + 1}")
+        values = [[new_cell(row_index, column_index) for column_index in range(first_column, last_column + 1)]
+                  for row_index in range(first_row, last_row + 1)]
+        value_ranges.append({"range": a1_range, "values": values})
+    return value_ranges
+
+
+def request_diff_writes_for_assignments(sheet_api_instance, assignments_to_diff):
+    """
+    Reads the current values of the subsheets of assignments_to_diff with as few values().batchGet calls as possible, and
+    adds only the cells that differ from the downloaded csv scores to value_range_list.
+    assignments_to_diff is a list of (assignment id, assignment name, csv scores, digest) tuples whose subsheets exist.
+    If a subsheet cannot be read, its assignment is pasted in full instead.
+    """
+    changed_cells = 0
+    changed_range_count = 0
+    changed_bytes = 0
+    full_paste_bytes = 0
+    for start in range(0, len(assignments_to_diff), SHEETS_BATCH_MAX_REQUESTS):
+        group = assignments_to_diff[start:start + SHEETS_BATCH_MAX_REQUESTS]
+        try:
+            request = sheet_api_instance.values().batchGet(
+                spreadsheetId=SPREADSHEET_ID,
+                ranges=[quote_sheet_title(assignment_name) for _, assignment_name, _, _ in group],
+                valueRenderOption="UNFORMATTED_VALUE",
+                dateTimeRenderOption="FORMATTED_STRING",
+            )
+            value_ranges = make_request(request).get("valueRanges", [])
+        except Exception as err:
+            logger.error(f"Failed to read {len(group)} subsheets for diffing; pasting them in full instead: {err}")
+            value_ranges = None
+        for index, (id, assignment_name, assignment_scores, digest) in enumerate(group):
+            if value_ranges is None or index >= len(value_ranges):
+                if create_sheet_and__request_to_populate_it(sheet_api_instance, assignment_scores, assignment_name):
+                    pending_assignment_digests[id] = digest
+                    run_profile.record_assignment(id, outcome="pasted")
+                else:
+                    run_profile.record_assignment(id, outcome="request failed")
+                continue
+            new_rows = list(csv.reader(io.StringIO(assignment_scores)))
+            changed_ranges = compute_changed_ranges(assignment_name, value_ranges[index].get("values", []), new_rows)
+            value_range_list.extend(changed_ranges)
+            changed_range_count += len(changed_ranges)
+            pending_assignment_digests[id] = digest
+            assignment_changed_cells = sum(len(row) for changed_range in changed_ranges for row in changed_range["values"])
+            changed_cells += assignment_changed_cells
+            run_profile.record_assignment(id, outcome="diffed", changed_cells=assignment_changed_cells)
+            changed_bytes += len(json.dumps(changed_ranges))
+            full_paste_bytes += len(assignment_scores.encode("utf-8"))
+    batch_metrics["changed_cells"] += changed_cells
+    logger.info(f"Diffed {len(assignments_to_diff)} existing subsheets: {changed_cells} changed cells in "
+                f"{changed_range_count} ranges, {changed_bytes} bytes instead of {full_paste_bytes} bytes of pasted data")
+
+
 def get_assignment_id_to_names(gradescope_client):
     """
-    This method returns a dictionary mapping assignment IDs to the names (titles) of GradeScope assignments
+    This method returns a dictionary mapping assignment IDs to the names (titles) of GradeScope assignments.
+    The dates on the same page are stored in assignment_dates.
     """
-    # The response cannot be parsed as a json as is.
-    course_info_response = str(get_assignment_info(gradescope_client, GRADESCOPE_COURSE_ID)).replace("\\", "").replace("\\u0026", "&")
-    pattern = '{"id":[0-9]+,"title":"[^}"]+?"}'
-    info_for_all_assignments = re.findall(pattern, course_info_response)
-    assignment_to_names = {}
-    #  = { json.loads(assignment)['id'] : json.loads(assignment)['title'] for assignment in info_for_all_assignments }
-    for assignment in info_for_all_assignments:
-        assignment_as_json = json.loads(assignment)
-        assignment_to_names[str(assignment_as_json["id"])] = assignment_as_json["title"]
-    return assignment_to_names
+    global assignment_dates
+    assignment_info = get_assignment_info(gradescope_client, GRADESCOPE_COURSE_ID)
+    assignment_dates = extract_assignment_dates(assignment_info) if assignment_info else {}
+    return dict(extract_assignments(assignment_info))
 
 
-def make_batch_request(sheet_api_instance):
+def split_requests_into_chunks(requests, max_bytes, max_requests):
     """
-    Executes a batch request including all requests in our running list: request_list
+    Splits a list of sheets requests, in order, into chunks of at most max_requests requests and max_bytes bytes of JSON.
+    A single request larger than max_bytes gets a chunk of its own.
+    Returns a list of (chunk, chunk size in bytes) tuples.
     """
-    global request_list
-    rest_batch_request = {
-        "requests": request_list
-    }
-    batch_request = sheet_api_instance.batchUpdate(spreadsheetId=SPREADSHEET_ID, body=rest_batch_request)
-    logger.info(f"Issuing batch request")
-    make_request(batch_request)
-    logger.info(f"Completing batch request")
+    chunks = []
+    chunk, chunk_bytes = [], 0
+    for request in requests:
+        request_bytes = len(json.dumps(request))
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + request_bytes > max_bytes):
+            chunks.append((chunk, chunk_bytes))
+            chunk, chunk_bytes = [], 0
+        chunk.append(request)
+        chunk_bytes += request_bytes
+    if chunk:
+        chunks.append((chunk, chunk_bytes))
+    return chunks
+
+
+def get_sheet_id_of_request(request):
+    """
+    Returns the id of the subsheet a request writes to, or None if it cannot be determined.
+    """
+    for request_body in request.values():
+        if isinstance(request_body, dict):
+            sheet_id = request_body.get("coordinate", request_body.get("range", {})).get("sheetId")
+            if sheet_id is not None:
+                return sheet_id
+    return None
 
 
-def push_all_grade_data_to_sheets():
+def chunks_are_independent(chunks):
     """
-    Encapsulates the entire process of retrieving grades from GradeScope and Pyturis from PL and pushing to sheets.
+    Chunks may only be sent concurrently if no two chunks write to the same subsheet (and every request's subsheet is
+    known); otherwise two writes to one subsheet could land in the wrong order.
     """
-    gradescope_client = initialize_gs_client()
-    assignment_id_to_names = get_assignment_id_to_names(gradescope_client)
-    sheet_api_instance = create_sheet_api_instance()
-    get_sub_sheet_titles_to_ids(sheet_api_instance)
-    push_pl_assignment_csv_to_gradebook(PYTURIS_ASSIGNMENT_ID, "Pyturis")
+    sheet_id_to_chunk = {}
+    for chunk_index, (chunk, _) in enumerate(chunks):
+        for request in chunk:
+            sheet_id = get_sheet_id_of_request(request)
+            if sheet_id is None or sheet_id_to_chunk.setdefault(sheet_id, chunk_index) != chunk_index:
+                return False
+    return True
+
 
-    populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance)
-    make_batch_request(sheet_api_instance) #
+def wait_for_sheets_write_quota():
+    """
+    Blocks until sending one more write keeps all threads together within SHEETS_WRITE_REQUESTS_PER_MINUTE.
+    """
+    global next_sheets_write_time
+    with sheets_write_quota_lock:
+        now = time.time()
+        wait_time = max(0, next_sheets_write_time - now)
+        next_sheets_write_time = max(now, next_sheets_write_time) + 60 / SHEETS_WRITE_REQUESTS_PER_MINUTE
+    time.sleep(wait_time)
+
+
+def send_batch_chunk(chunk, sheet_api_instance=None):
+    """
+    Sends one chunk of requests as a batchUpdate (with backoff logic), and returns how long it took in seconds.
+    If no sheet_api_instance is given, the calling thread's own instance is used.
+    """
+    if sheet_api_instance is None:
+        if not hasattr(thread_local_sheets, "sheet_api_instance"):
+            thread_local_sheets.sheet_api_instance = create_sheet_api_instance()
+        sheet_api_instance = thread_local_sheets.sheet_api_instance
+    wait_for_sheets_write_quota()
+    start_time = time.time()
+    make_request(sheet_api_instance.batchUpdate(spreadsheetId=SPREADSHEET_ID, body={"requests": chunk}))
+    return time.time() - start_time
 
-    for id in assignment_id_to_names:
-        prepare_request_for_one_assignment(sheet_api_instance, gradescope_client=gradescope_client,
-                                                               assignment_name=assignment_id_to_names[id], assignment_id=id)
 
-    make_batch_request(sheet_api_instance)
+def make_batch_request(sheet_api_instance):
+    """
+    Executes a batch request including all requests in our running list: request_list
+    The requests are split into chunks of at most SHEETS_BATCH_MAX_BYTES and SHEETS_BATCH_MAX_REQUESTS. If the chunks write to different subsheets, up to
+    SHEETS_BATCH_WORKERS of them are sent concurrently; otherwise they are sent one at a time, in order.
+    Only the requests of chunks that still fail after backing off are kept in request_list, and an exception is raised
+    once every chunk has been attempted.
+    """
+    global request_list
+    if not request_list:
+        logger.info("No requests to send; skipping batch request")
+        return
+    chunks = split_requests_into_chunks(request_list, SHEETS_BATCH_MAX_BYTES, SHEETS_BATCH_MAX_REQUESTS)
+    workers = SHEETS_BATCH_WORKERS if len(chunks) > 1 and chunks_are_independent(chunks) else 1
+    total_bytes = sum(chunk_bytes for _, chunk_bytes in chunks)
+    logger.info(f"Issuing batch request: {len(request_list)} requests, {total_bytes} bytes, "
+                f"{len(chunks)} chunks sent by {workers} workers")
+    failed_chunks = []
+    latencies = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if workers == 1:
+            sends = [executor.submit(send_batch_chunk, chunk, sheet_api_instance) for chunk, _ in chunks]
+        else:
+            sends = [executor.submit(send_batch_chunk, chunk) for chunk, _ in chunks]
+        for (chunk, chunk_bytes), send in zip(chunks, sends):
+            try:
+                latencies.append(send.result())
+            except Exception as err:
+                logger.error(f"A batch chunk of {len(chunk)} requests ({chunk_bytes} bytes) failed: {err}")
+                failed_chunks.append(chunk)
+    batch_metrics["batches"] += 1
+    batch_metrics["chunks"] += len(chunks)
+    batch_metrics["failed_chunks"] += len(failed_chunks)
+    batch_metrics["bytes"] += total_bytes
+    batch_metrics["chunk_latencies"].extend(latencies)
+    if latencies:
+        logger.info(f"Completing batch request: {len(latencies)} chunks sent, "
+                    f"latency mean {round(sum(latencies) / len(latencies), 2)}s, max {round(max(latencies), 2)}s, "
+                    f"{number_of_retries_needed_to_update_sheet} retries so far")
+    request_list = [request for chunk in failed_chunks for request in chunk]
+    if failed_chunks:
+        raise RuntimeError(f"{len(failed_chunks)} of {len(chunks)} batch chunks failed; their requests were kept in request_list")
+
+
+def make_values_batch_request(sheet_api_instance):
+    """
+    Writes every value range in value_range_list (see SHEETS_WRITE_MODE) with values.batchUpdate, in chunks of at most
+    SHEETS_BATCH_MAX_BYTES and SHEETS_BATCH_MAX_REQUESTS ranges. Values are entered as if typed by a user, like pasteData.
+    Only the ranges of chunks that still fail after backing off are kept in value_range_list, and an exception is raised
+    once every chunk has been attempted.
+    """
+    global value_range_list
+    if not value_range_list:
+        logger.info("No changed values to write; skipping values batch request")
+        return
+    chunks = split_requests_into_chunks(value_range_list, SHEETS_BATCH_MAX_BYTES, SHEETS_BATCH_MAX_REQUESTS)
+    total_bytes = sum(chunk_bytes for _, chunk_bytes in chunks)
+    logger.info(f"Issuing values batch request: {len(value_range_list)} ranges, {total_bytes} bytes, {len(chunks)} chunks")
+    failed_chunks = []
+    for chunk, chunk_bytes in chunks:
+        wait_for_sheets_write_quota()
+        start_time = time.time()
+        try:
+            make_request(sheet_api_instance.values().batchUpdate(
+                spreadsheetId=SPREADSHEET_ID, body={"valueInputOption": "USER_ENTERED", "data": chunk}))
+            batch_metrics["chunk_latencies"].append(time.time() - start_time)
+        except Exception as err:
+            logger.error(f"A values batch chunk of {len(chunk)} ranges ({chunk_bytes} bytes) failed: {err}")
+            failed_chunks.append(chunk)
+    batch_metrics["batches"] += 1
+    batch_metrics["chunks"] += len(chunks)
+    batch_metrics["failed_chunks"] += len(failed_chunks)
+    batch_metrics["bytes"] += total_bytes
+    value_range_list = [value_range for chunk in failed_chunks for value_range in chunk]
+    if failed_chunks:
+        raise RuntimeError(f"{len(failed_chunks)} of {len(chunks)} values batch chunks failed; their ranges were kept in value_range_list")
+
+
+def push_all_grade_data_to_sheets(clients=None, all_tiers=False):
+    """
+    Encapsulates the entire process of retrieving grades from GradeScope and Pyturis from PL and pushing to sheets.
+    clients is a dict that keeps the logged-in Gradescope client ("gradescope") and the sheets api instance ("sheets")
+    between runs of one process (see sync_scheduler.py). Missing clients are created and stored in it.
+    With all_tiers, every assignment is downloaded, including the frozen ones (see select_assignments_to_sync).
+    Returns whether every assignment was processed, i.e. the run did not reach SYNC_DEADLINE_SECONDS.
+    """
+    global subsheet_titles_to_ids, request_list, value_range_list, run_deadline, download_cache
+    run_deadline = time.time() + SYNC_DEADLINE_SECONDS
+    clients = {} if clients is None else clients
+    stage_timings.clear()
+    run_profile.reset()
+    batch_metrics.update({"batches": 0, "chunks": 0, "failed_chunks": 0, "bytes": 0, "chunk_latencies": [], "changed_cells": 0})
+    # Left over from a failed earlier run of this process; subsheets may have been added or removed since
+    subsheet_titles_to_ids = None
+    request_list = []
+    value_range_list = []
+    pending_assignment_digests.clear()
+    completed_assignment_ids.clear()
+    deferred_assignment_ids.clear()
+    load_assignment_digests()
+    download_cache = DownloadCache(DOWNLOAD_CACHE_DIRECTORY) if CONDITIONAL_DOWNLOADS else None
+    if clients.get("gradescope") is None:
+        with timed_stage("log in"):
+            clients["gradescope"] = initialize_gs_client()
+    gradescope_client = clients["gradescope"]
+    with timed_stage("assignment catalog"):
+        assignment_id_to_names = get_assignment_id_to_names(gradescope_client)
+    with timed_stage("subsheet titles"):
+        if clients.get("sheets") is None:
+            clients["sheets"] = create_sheet_api_instance()
+        sheet_api_instance = clients["sheets"]
+        get_sub_sheet_titles_to_ids(sheet_api_instance)
+    with timed_stage("PrairieLearn scores"):
+        push_pl_assignment_csv_to_gradebook(PYTURIS_ASSIGNMENT_ID, "Pyturis")
+
+    if DASHBOARD_ENGINE != "server":
+        with timed_stage("gradebook columns"):
+            populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance)
+    with timed_stage("batch request"):
+        make_batch_request(sheet_api_instance) #
+
+    # Downloads are timed inside, because they overlap with request assembly
+    downloaded_scores = {} if DASHBOARD_ENGINE == "server" else None
+    assignments_to_sync = select_assignments_to_sync(assignment_id_to_names, all_tiers)
+    with run_profile.stage("download scores"):
+        prepare_requests_for_all_assignments(sheet_api_instance, gradescope_client, assignments_to_sync, downloaded_scores)
+    assignment_activity.save()
+    if download_cache is not None:
+        report_download_cache_stats()
+    if DASHBOARD_ENGINE == "server" and deferred_assignment_ids:
+        logger.error("Not updating the dashboard, because the run reached its deadline before every assignment was downloaded")
+    elif DASHBOARD_ENGINE == "server":
+        with timed_stage("dashboard"):
+            request_dashboard_values(sheet_api_instance, assignment_id_to_names, downloaded_scores)
+
+    with timed_stage("batch request"):
+        make_batch_request(sheet_api_instance)
+        make_values_batch_request(sheet_api_instance)
+    save_assignment_digests()
+    if deferred_assignment_ids:
+        save_sync_checkpoint()
+    else:
+        clear_sync_checkpoint()
+    logger.info(f"Sent {batch_metrics['batches']} batch requests as {batch_metrics['chunks']} chunks, {batch_metrics['bytes']} bytes in total"
+                + (f", {batch_metrics['changed_cells']} changed cells written by diff" if SHEETS_WRITE_MODE == "diff" else ""))
+    logger.info("Stage timings (seconds): " + ", ".join(f"{stage}: {round(seconds, 2)}" for stage, seconds in stage_timings.items()))
+    return not deferred_assignment_ids
+
+
+def report_download_cache_stats():
+    """
+    Logs how many score downloads of the run were unchanged, and the bytes that 304 responses saved, and adds them to
+    the run's metrics.
+    """
+    stats = download_cache.stats()
+    for result in ["not_modified", "unchanged", "changed"]:
+        sync_metrics.CACHE_LOOKUPS.labels("scores_downloads", result).inc(stats[result])
+    sync_metrics.DOWNLOAD_BYTES_SAVED.inc(stats["bytes_saved"])
+    logger.info(f"Score downloads: {stats['not_modified']} not modified (304), {stats['unchanged']} unchanged and "
+                f"{stats['changed']} changed; downloaded {stats['bytes_downloaded']} bytes, saved {stats['bytes_saved']} bytes")
 
 
 def populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance):
@@ -345,36 +1168,29 @@ def populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance):
     Creates the gradebook, ensuring existing columns remain in order, and encapsulates the process of retrieving grades from GradeScope.
     TODO: Add parameters and return value in this docstring.
     """
-    is_not_optional =  lambda assignment: not "optional" in assignment.lower()
-    assignment_names = set(filter(is_not_optional, assignment_id_to_names.values()))
-    # The below code is used to filter assignments by category when populating the instructor dashboard
-    filter_by_assignment_category = lambda category: lambda assignment: category in assignment.lower()
+    # The titles of the assignments of each category that has a gradebook subsheet
+    category_titles = {category: set() for category in ["labs", "discussions", "projects", "lecture_quizzes", "midterms", "postterms"]}
+    for assignment in ASSIGNMENT_CLASSIFIER.classify(assignment_id_to_names.items()):
+        if assignment.category in category_titles and "optional" not in assignment.title.lower():
+            category_titles[assignment.category].add(assignment.title)
 
     preexisting_lab_columns = retrieve_preexisting_columns("Labs", sheet_api_instance)
-    labs = set(filter(filter_by_assignment_category("lab"), assignment_names))
-    new_labs = labs - set(preexisting_lab_columns)
+    new_labs = category_titles["labs"] - set(preexisting_lab_columns)
 
     preexisting_discussion_columns = retrieve_preexisting_columns("Discussions", sheet_api_instance)
-    discussions = set(filter(filter_by_assignment_category("discussion"), assignment_names))
-    new_discussions = discussions - set(preexisting_discussion_columns)
+    new_discussions = category_titles["discussions"] - set(preexisting_discussion_columns)
 
     preexisting_project_columns = retrieve_preexisting_columns("Projects", sheet_api_instance)
-    projects = set(filter(filter_by_assignment_category("project"), assignment_names))
-    new_projects = projects - set(preexisting_project_columns)
+    new_projects = category_titles["projects"] - set(preexisting_project_columns)
 
     preexisting_lecture_quiz_columns = retrieve_preexisting_columns("Lecture Quizzes", sheet_api_instance)
-    lecture_quizzes = set(filter(filter_by_assignment_category("lecture"), assignment_names))
-    new_lecture_quizzes = lecture_quizzes - set(preexisting_lecture_quiz_columns)
+    new_lecture_quizzes = category_titles["lecture_quizzes"] - set(preexisting_lecture_quiz_columns)
 
     preexisting_midterm_columns = retrieve_preexisting_columns("Midterms", sheet_api_instance)
-    midterms = set(filter(filter_by_assignment_category("midterm"), assignment_names))
-    new_midterms = midterms - set(preexisting_midterm_columns)
-
-    filter_postterms = lambda assignment: (("postterm" in assignment.lower()) or ("posterm" in assignment.lower())) and ("discussion" not in assignment.lower())
+    new_midterms = category_titles["midterms"] - set(preexisting_midterm_columns)
 
     preexisting_postterm_columns = retrieve_preexisting_columns("Postterms", sheet_api_instance)
-    postterms = set(filter(filter_postterms, assignment_names))
-    new_postterms = postterms - set(preexisting_postterm_columns)
+    new_postterms = category_titles["postterms"] - set(preexisting_postterm_columns)
 
     def extract_number_from_assignment_title(assignment):
         """
@@ -404,12 +1220,7 @@ def populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance):
         if not sorted_assignment_list:
             return
         global subsheet_titles_to_ids
-        grade_dict = {name : formula_list for name in sorted_assignment_list}
-        grade_df = pd.DataFrame(grade_dict).set_index(sorted_assignment_list[0])
-        output = io.StringIO()
-        grade_df.to_csv(output)
-        grades_as_csv = output.getvalue()
-        output.close()
+        grades_as_csv = make_gradebook_csv(sorted_assignment_list, formula_list)
         assemble_rest_request_for_assignment(grades_as_csv, sheet_api_instance=None, sheet_id=subsheet_titles_to_ids[category], rowIndex=0, columnIndex=3)
 
     sorted_labs = preexisting_lab_columns + sorted_new_labs
@@ -427,6 +1238,38 @@ def populate_spreadsheet_gradebook(assignment_id_to_names, sheet_api_instance):
     produce_gradebook_for_category(sorted_postterms, "Postterms", formula_list)
 
 
+def make_gradebook_csv(sorted_assignment_list, formula_list):
+    """
+    Returns the CSV of one category's gradebook: a header of the assignment titles, in order, and one row per entry of
+    `formula_list`, with that formula under every assignment.
+    """
+    grade_dict = {name : formula_list for name in sorted_assignment_list}
+    grade_df = pd.DataFrame(grade_dict).set_index(sorted_assignment_list[0])
+    output = io.StringIO()
+    grade_df.to_csv(output)
+    grades_as_csv = output.getvalue()
+    output.close()
+    return grades_as_csv
+
+
+def request_dashboard_values(sheet_api_instance, assignment_id_to_names, downloaded_scores):
+    """
+    Computes every student's scores with dashboard_engine and adds the request that pastes them, as plain values, into the
+    DASHBOARD_SHEET_NAME subsheet (which is created if needed).
+    If any assignment failed to download, the dashboard is not written, because its aggregates would silently leave
+    that assignment out.
+    """
+    missing_assignments = [assignment_id_to_names[id] for id in assignment_id_to_names if id not in downloaded_scores]
+    if missing_assignments:
+        logger.error(f"Not updating the dashboard, because {len(missing_assignments)} assignments failed to download: "
+                     f"{', '.join(missing_assignments)}")
+        return
+    dashboard = dashboard_engine.compute_dashboard(assignment_id_to_names, downloaded_scores, ASSIGNMENT_CLASSIFIER,
+                                                   UNGRADED_LABS, SPECIAL_CASE_LABS, NUM_LECTURE_DROPS, TOTAL_LAB_POINTS)
+    logger.info(f"Computed the dashboard for {dashboard.shape[0]} students and {dashboard.shape[1]} columns")
+    create_sheet_and__request_to_populate_it(sheet_api_instance, dashboard_engine.dashboard_to_csv(dashboard), DASHBOARD_SHEET_NAME)
+
+
 def create_request_to_add_assignment_column_titles(assignments, type):
     """
     Creates the request that adds assignment columns to the gradebook for the corresponding type of assignment.
@@ -457,7 +1300,9 @@ def retrieve_PL_scores_for_one_assignment(assignment_id):
     try:
         headers = {'Private-Token': PL_API_TOKEN}
         url = PL_SERVER + f"/course_instances/{PL_COURSE_ID}/assessments/{assignment_id}/assessment_instances"
-        r = backoff_utils.backoff(requests.get, args = [url], kwargs = {'headers': headers}, max_tries = 3,  max_delay = 30, strategy = backoff_utils.strategies.Exponential)
+        get_assessment_instances = sync_metrics.count_retries("prairielearn", "connection error", prairielearn_session.get,
+                                                               on_retry=run_profile.record_retry)
+        r = backoff_utils.backoff(get_assessment_instances, args = [url], kwargs = {'headers': headers}, max_tries = 3,  max_delay = 30, strategy = backoff_utils.strategies.Exponential)
         data = r.json()
         return data
     except Exception as e:
@@ -504,10 +1349,60 @@ TODO: Document the number of Google Sheets API calls made in this script.
 TODO: Make a short documentation comment about the instructor dashboard.
 """
 def main():
+    run_sync()
+
+
+def run_sync(clients=None, all_tiers=False):
+    """
+    Runs one sync (see push_all_grade_data_to_sheets), and writes its metrics and profile, whether or not it succeeded.
+    Exceptions are raised again once they are recorded. Returns whether every assignment was processed.
+    """
     start_time = time.time()
-    push_all_grade_data_to_sheets()
-    end_time = time.time()
+    succeeded = False
+    error = None
+    sync_metrics.reset_run_metrics()
+    profiler = cProfile.Profile() if PROFILE_WITH_CPROFILE else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        complete = push_all_grade_data_to_sheets(clients, all_tiers)
+        succeeded = True
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+        raise
+    finally:
+        end_time = time.time()
+        if profiler is not None:
+            profiler.disable()
+        # Served by server.py at /metrics until the next run ends
+        sync_metrics.write_metrics(STATE_DIRECTORY, stage_timings, end_time - start_time, succeeded, len(deferred_assignment_ids))
+        write_run_profile(end_time - start_time, succeeded, error, profiler)
     logger.info(f"Finished in {round(end_time - start_time, 2)} seconds")
+    return complete
+
+
+def write_run_profile(duration_seconds, succeeded, error, profiler=None):
+    """
+    Writes run_profile to PROFILE_DIRECTORY, and the stats of profiler (if any) next to it. A profile that cannot be
+    written is logged, and does not fail the run.
+    """
+    try:
+        profile_path = run_profile.write(
+            PROFILE_DIRECTORY, PROFILE_RUNS_TO_KEEP, stage_timings,
+            duration_seconds=round(duration_seconds, 3),
+            succeeded=succeeded,
+            error=error,
+            deferred_assignments=len(deferred_assignment_ids),
+            sheets_write_mode=SHEETS_WRITE_MODE,
+            download_workers=DOWNLOAD_WORKERS,
+            batches={key: value for key, value in batch_metrics.items() if key != "chunk_latencies"},
+            chunk_latencies=[round(latency, 3) for latency in batch_metrics["chunk_latencies"]],
+        )
+        if profiler is not None:
+            profiler.dump_stats(os.path.splitext(profile_path)[0] + ".prof")
+        logger.info(f"Wrote the profile of this run to {profile_path}")
+    except OSError as err:
+        logger.error(f"Failed to write the profile of this run to {PROFILE_DIRECTORY}: {err}")
 
 
 @deprecated
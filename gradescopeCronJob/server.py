@@ -1,28 +1,97 @@
 # Just a simple healthcheck server :P
+import hmac
+import json
 import os
+from urllib.parse import parse_qs, urlsplit
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from prometheus_client import CONTENT_TYPE_LATEST
+from sync_metrics import METRICS_FILE_NAME
+
+# The sync runs write their metrics to the same state directory as gradescope_to_spreadsheet.py reads from its config
+class_json_name = 'cs10_fall2024.json'
+config_path = os.path.join(os.path.dirname(__file__), 'config/', class_json_name)
+with open(config_path, "r") as config_file:
+    config = json.load(config_file)
+STATE_DIRECTORY = config.get("STATE_DIRECTORY", os.path.join(os.path.dirname(os.path.abspath(__file__)), "state"))
+METRICS_PATH = os.path.join(STATE_DIRECTORY, METRICS_FILE_NAME)
+# POST /sync must send it as "Authorization: Bearer <token>". If it is not set, POST /sync is refused
+SYNC_TRIGGER_TOKEN = os.getenv("SYNC_TRIGGER_TOKEN")
 
 class HealthCheckHandler(BaseHTTPRequestHandler):
+    # The sync_scheduler.SyncScheduler running in this process, if any (syncs started by cron cannot be triggered)
+    scheduler = None
+
     def do_GET(self):
         # Define the endpoint for health check
         if self.path == "/health":
-            self.send_response(200)  # Send HTTP 200 status
-            self.send_header("Content-type", "text/plain")
+            # A sync that has run for too long is stuck, as one killed by the cron job's `timeout` would have been
+            if self.scheduler is not None and self.scheduler.is_stuck():
+                self.send_text(503, b"A sync has been running for too long")
+                return
+            self.send_text(200, b"Server is healthy!")
+        elif self.path == "/metrics":
+            # The metrics of the most recent sync run, or none if no run has ended since the state directory was created
+            try:
+                with open(METRICS_PATH, "rb") as metrics_file:
+                    metrics = metrics_file.read()
+            except FileNotFoundError:
+                metrics = b""
+            self.send_response(200)
+            self.send_header("Content-type", CONTENT_TYPE_LATEST)
             self.end_headers()
-            self.wfile.write(b"Server is healthy!")
+            self.wfile.write(metrics)
+        elif self.path == "/status" and self.scheduler is not None:
+            self.send_json(200, self.scheduler.status())
         else:
             self.send_response(404)  # Send HTTP 404 for other paths
             self.end_headers()
 
-# Configure the server
-host = "0.0.0.0"
-port = int(os.environ.get('PORT'))
-server = HTTPServer((host, port), HealthCheckHandler)
+    def do_POST(self):
+        # Starts a sync now, or right after the one that is running. ?all_tiers=1 also syncs the frozen assignments
+        url = urlsplit(self.path)
+        if url.path != "/sync" or self.scheduler is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if not SYNC_TRIGGER_TOKEN:
+            self.send_text(403, b"Triggering a sync requires the SYNC_TRIGGER_TOKEN environment variable to be set")
+            return
+        if not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {SYNC_TRIGGER_TOKEN}"):
+            self.send_text(401, b"Missing or wrong sync trigger token")
+            return
+        all_tiers = parse_qs(url.query).get("all_tiers", ["0"])[0].lower() in ("1", "true")
+        self.send_json(202, self.scheduler.trigger(all_tiers))
+
+    def send_text(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-type", "text/plain")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+
+def serve(scheduler=None):
+    """
+    Serves the health check (and, with a scheduler, /status and POST /sync) until interrupted.
+    """
+    HealthCheckHandler.scheduler = scheduler
+    # Configure the server
+    host = "0.0.0.0"
+    port = int(os.environ.get('PORT'))
+    server = HTTPServer((host, port), HealthCheckHandler)
+
+    print(f"Health check server running on http://{host}:{port}/health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down server...")
+        server.server_close()
 
-print(f"Health check server running on http://{host}:{port}/health")
-try:
-    server.serve_forever()
-except KeyboardInterrupt:
-    print("\nShutting down server...")
-    server.server_close()
 
+if __name__ == "__main__":
+    serve()
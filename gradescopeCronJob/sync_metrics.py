@@ -0,0 +1,144 @@
+"""
+Prometheus metrics of a sync run of gradescope_to_spreadsheet.py.
+
+A run ends before /metrics is scraped (with SYNC_MODE=cron, its process is gone by then), so its metrics cannot be
+scraped from it directly. Instead, the run writes them to METRICS_FILE_NAME in the state directory once it ends (in the
+Prometheus text format, as node_exporter's textfile collector expects), and server.py serves that file at /metrics.
+gradesync_sync_last_run_timestamp_seconds tells runs apart.
+
+The gauges describe the most recent run: reset_run_metrics clears them when a run starts, so that a stage the run
+skipped does not keep the time of an earlier run. The counters and histograms add up every run of the process: with
+SYNC_MODE=cron that is the most recent run, and with SYNC_MODE=scheduler (sync_scheduler.py), which runs every sync in
+one process, every run since the process started, as Prometheus expects of counters.
+"""
+import os
+import time
+
+import requests
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, write_to_textfile
+
+METRICS_FILE_NAME = "metrics.prom"
+
+# Upstream requests take from tens of milliseconds (a cached page) to tens of seconds (a large batchUpdate)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# A registry of its own, so that the metrics of the process itself (which is gone by the time they are served) are left out
+REGISTRY = CollectorRegistry()
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    "gradesync_upstream_request_seconds", "Time taken by requests to an upstream service, by upstream and status code.",
+    ["upstream", "status"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+UPSTREAM_RETRIES = Counter(
+    "gradesync_upstream_retries", "Requests to an upstream service that were sent again, by upstream and reason.",
+    ["upstream", "reason"], registry=REGISTRY
+)
+UPSTREAM_RATE_LIMITED = Counter(
+    "gradesync_upstream_rate_limited", "Responses with status 429 (Too Many Requests), by upstream.", ["upstream"],
+    registry=REGISTRY
+)
+CACHE_LOOKUPS = Counter(
+    "gradesync_cache_lookups", "Lookups of the run's caches, by cache and result. An assignment_digests hit is an "
+    "assignment that did not need to be written again; a scores_downloads lookup is not_modified (answered 304), "
+    "unchanged (downloaded again, but identical) or changed.", ["cache", "result"], registry=REGISTRY
+)
+DOWNLOAD_BYTES_SAVED = Counter(
+    "gradesync_download_bytes_saved", "Bytes of scores that were not downloaded again, because Gradescope answered 304.",
+    registry=REGISTRY
+)
+ASSIGNMENT_TIERS = Gauge(
+    "gradesync_assignment_tiers", "Assignments in each sync tier (hot, warm or frozen) in the run.", ["tier"], registry=REGISTRY
+)
+SYNC_STAGE_SECONDS = Gauge(
+    "gradesync_sync_stage_seconds", "Time spent in each stage of the run.", ["stage"], registry=REGISTRY
+)
+SYNC_DURATION_SECONDS = Gauge(
+    "gradesync_sync_duration_seconds", "Time taken by the whole run.", registry=REGISTRY
+)
+SYNC_SUCCEEDED = Gauge(
+    "gradesync_sync_succeeded", "1 if the run finished without raising, 0 otherwise.", registry=REGISTRY
+)
+SYNC_DEFERRED_ASSIGNMENTS = Gauge(
+    "gradesync_sync_deferred_assignments", "Assignments left to the next run, because the run reached SYNC_DEADLINE_SECONDS.",
+    registry=REGISTRY
+)
+SYNC_LAST_RUN_TIMESTAMP = Gauge(
+    "gradesync_sync_last_run_timestamp_seconds", "When the run ended, as a unix timestamp.", registry=REGISTRY
+)
+
+
+def observe_upstream_request(upstream: str, seconds: float, status):
+    """
+    Records one request to `upstream` that took `seconds` and was answered with the status code `status`
+    ("error" if it was never answered).
+    """
+    UPSTREAM_REQUEST_SECONDS.labels(upstream, str(status)).observe(seconds)
+    if status == 429:
+        UPSTREAM_RATE_LIMITED.labels(upstream).inc()
+
+
+class TimedSession(requests.Session):
+    """
+    A `requests.Session` that records the latency and status code of every request it sends.
+    If `on_request` is given, it is also called with the upstream, the bytes of the request body and the bytes of the
+    response of every request that is answered (e.g. `SyncProfile.record_request`).
+    """
+
+    def __init__(self, upstream: str, on_request=None):
+        super().__init__()
+        self.upstream = upstream
+        self.on_request = on_request
+
+    def request(self, method, url, *args, **kwargs):
+        start_time = time.perf_counter()
+        status = "error"
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            status = response.status_code
+            if self.on_request is not None:
+                self.on_request(self.upstream, len(response.request.body or b""), len(response.content))
+            return response
+        finally:
+            observe_upstream_request(self.upstream, time.perf_counter() - start_time, status)
+
+
+def count_retries(upstream: str, reason: str, func, on_retry=None):
+    """
+    Wraps `func` so that every call after the first is counted as a retry, e.g. when it is passed to
+    `backoff_utils.backoff`. If `on_retry` is given, it is also called with the upstream of every retry.
+    """
+    attempts = 0
+
+    def attempt(*args, **kwargs):
+        nonlocal attempts
+        attempts += 1
+        if attempts > 1:
+            UPSTREAM_RETRIES.labels(upstream, reason).inc()
+            if on_retry is not None:
+                on_retry(upstream)
+        return func(*args, **kwargs)
+
+    return attempt
+
+
+def reset_run_metrics():
+    """
+    Clears the gauges of the previous run in this process. Called when a run starts.
+    """
+    for gauge in [ASSIGNMENT_TIERS, SYNC_STAGE_SECONDS]:
+        gauge.clear()
+
+
+def write_metrics(state_directory: str, stage_timings: dict, duration_seconds: float, succeeded: bool,
+                  deferred_assignments: int = 0):
+    """
+    Writes the metrics of the run that is ending to METRICS_FILE_NAME in `state_directory`, replacing those of the
+    previous run. The file is replaced atomically, so server.py never serves a partial file.
+    """
+    for stage, seconds in stage_timings.items():
+        SYNC_STAGE_SECONDS.labels(stage).set(seconds)
+    SYNC_DURATION_SECONDS.set(duration_seconds)
+    SYNC_SUCCEEDED.set(1 if succeeded else 0)
+    SYNC_DEFERRED_ASSIGNMENTS.set(deferred_assignments)
+    SYNC_LAST_RUN_TIMESTAMP.set(time.time())
+    os.makedirs(state_directory, exist_ok=True)
+    write_to_textfile(os.path.join(state_directory, METRICS_FILE_NAME), REGISTRY)
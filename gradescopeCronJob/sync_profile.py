@@ -0,0 +1,156 @@
+"""
+A structured profile of one sync run of gradescope_to_spreadsheet.py, written as JSON when the run ends.
+
+The log of a run only says how long it took in total. The profile also shows where the time went: the seconds, the
+upstream calls and the bytes of every stage (e.g. how many Sheets calls "gradebook columns" made), and the download
+time, size and outcome of every assignment. Requests are attributed to the stage that is active when they are sent
+(see `SyncProfile.stage`), including requests sent by worker threads.
+
+Profiles are written to one file per run, named after the time the run started, and only the newest `runs_to_keep`
+are kept. If the run was also profiled with cProfile, its stats are dumped next to the JSON file (read them with
+`python -m pstats <file>.prof`).
+
+Example Output:
+    {
+        "started_at": "2024-11-04T17:00:01Z", "duration_seconds": 41.2, "succeeded": true, "error": null,
+        "stages": {
+            "gradebook columns": {"seconds": 2.1, "calls": {"sheets": 6}, "retries": {}, "bytes_sent": 0, "bytes_received": 0},
+            ...
+        },
+        "assignments": {
+            "4567890": {"name": "Lab 1: Welcome to Snap!", "download_seconds": 0.8, "bytes": 42311, "outcome": "unchanged"}, ...
+        },
+        ...
+    }
+"""
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+# Requests sent while no stage is active are attributed to this stage
+NO_STAGE = "outside stages"
+PROFILE_FILE_PREFIX = "sync-"
+
+
+class SyncProfile:
+    """
+    Collects the profile of the current run. Every method is thread-safe.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets everything recorded so far, and starts the profile of a new run.
+        """
+        with self.lock:
+            self.started_at = time.time()
+            self.current_stage = None
+            self.stages = {}
+            self.assignments = {}
+
+    @contextlib.contextmanager
+    def stage(self, stage_name: str):
+        """
+        Attributes the requests sent in the `with` block, by any thread, to `stage_name`. Stages are not timed here:
+        their seconds are passed to `write` (see `timed_stage` in gradescope_to_spreadsheet.py).
+        """
+        with self.lock:
+            previous_stage = self.current_stage
+            self.current_stage = stage_name
+            self._get_stage(stage_name)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.current_stage = previous_stage
+
+    def record_request(self, upstream: str, bytes_sent: int = 0, bytes_received: int = 0):
+        """
+        Counts one request to `upstream`, and the bytes of its body and of its response, in the active stage.
+        """
+        with self.lock:
+            stage = self._get_stage(self.current_stage or NO_STAGE)
+            stage["calls"][upstream] = stage["calls"].get(upstream, 0) + 1
+            stage["bytes_sent"] += bytes_sent
+            stage["bytes_received"] += bytes_received
+
+    def record_retry(self, upstream: str):
+        """
+        Counts one retried request to `upstream` (e.g. after a 429) in the active stage.
+        """
+        with self.lock:
+            stage = self._get_stage(self.current_stage or NO_STAGE)
+            stage["retries"][upstream] = stage["retries"].get(upstream, 0) + 1
+
+    def record_assignment(self, assignment_id, **fields):
+        """
+        Adds `fields` (e.g. name, download_seconds, bytes, outcome) to the profile of one assignment.
+        """
+        with self.lock:
+            self.assignments.setdefault(str(assignment_id), {}).update(fields)
+
+    def _get_stage(self, stage_name: str) -> dict:
+        return self.stages.setdefault(stage_name, new_stage())
+
+    def to_dict(self, stage_timings: dict, **summary) -> dict:
+        """
+        Returns the profile, with the seconds of each stage taken from `stage_timings` and `summary` (e.g. the
+        duration of the run) added at the top level.
+        """
+        with self.lock:
+            stages = {name: dict(stage, calls=dict(stage["calls"]), retries=dict(stage["retries"]))
+                      for name, stage in self.stages.items()}
+            for name, seconds in stage_timings.items():
+                stages.setdefault(name, new_stage())["seconds"] = round(seconds, 3)
+            return {
+                "started_at": format_timestamp(self.started_at),
+                **summary,
+                "stages": stages,
+                "assignments": {assignment_id: dict(fields) for assignment_id, fields in self.assignments.items()},
+            }
+
+    def run_name(self) -> str:
+        """
+        The name shared by the files of this run, which sort in the order the runs started.
+        """
+        return PROFILE_FILE_PREFIX + datetime.datetime.fromtimestamp(self.started_at, datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    def write(self, directory: str, runs_to_keep: int, stage_timings: dict, **summary) -> str:
+        """
+        Writes the profile to `directory` as JSON, and deletes the files of all but the newest `runs_to_keep` runs.
+        Returns the path of the JSON file.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.run_name() + ".json")
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as profile_file:
+            json.dump(self.to_dict(stage_timings, **summary), profile_file, indent=2)
+        os.replace(temporary_path, path)
+        prune_profiles(directory, runs_to_keep)
+        return path
+
+
+def new_stage() -> dict:
+    return {"seconds": 0, "calls": {}, "retries": {}, "bytes_sent": 0, "bytes_received": 0}
+
+
+def prune_profiles(directory: str, runs_to_keep: int):
+    """
+    Deletes the profile files (JSON and cProfile dumps) of all but the newest `runs_to_keep` runs in `directory`.
+    """
+    run_names = sorted({os.path.splitext(file_name)[0] for file_name in os.listdir(directory)
+                        if file_name.startswith(PROFILE_FILE_PREFIX) and file_name.endswith((".json", ".prof"))})
+    for run_name in run_names[:max(len(run_names) - runs_to_keep, 0)]:
+        for extension in (".json", ".prof"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, run_name + extension))
+
+
+def format_timestamp(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -0,0 +1,209 @@
+#!/usr/local/bin/python
+"""
+Runs the sync of gradescope_to_spreadsheet.py in one long-running process, instead of starting a new one every hour
+from cron.
+
+Between runs, the process keeps pandas and googleapiclient imported, the Gradescope session logged in, the Sheets
+client built and the PrairieLearn connections open. It logs in to Gradescope again only once the session has expired
+(the assignments page redirects to the login page) or a run failed.
+
+Runs are scheduled adaptively from the due dates (and late due dates) on the assignments page:
+- Within SCHEDULER_DUE_DATE_WINDOW_HOURS before or after a due date, when submissions and regrades arrive, the next run
+  starts SCHEDULER_MIN_INTERVAL_SECONDS after the previous one ended.
+- Otherwise the next run starts after SCHEDULER_MAX_INTERVAL_SECONDS, or when the window of the next due date opens,
+  whichever comes first.
+- After a failed run, or one that reached SYNC_DEADLINE_SECONDS and left assignments to the next, the next one starts
+  after SCHEDULER_MIN_INTERVAL_SECONDS.
+
+The health server (server.py) runs in the same process. POST /sync starts a run now, or right after the one that is
+running; POST /sync?all_tiers=1 also syncs the assignments that tiered sync would skip (see sync_tiers.py). GET /status
+reports the last and next runs. A run that takes longer than SCHEDULER_RUN_TIMEOUT_SECONDS
+is stuck: /health reports it, and the process exits so that the container is restarted, as the cron job's `timeout`
+killed stuck runs.
+
+Usage:
+    python sync_scheduler.py
+"""
+import datetime
+import logging
+import os
+import signal
+import threading
+import time
+
+import gradescope_to_spreadsheet as sync
+import server
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_MIN_INTERVAL_SECONDS = sync.config.get("SCHEDULER_MIN_INTERVAL_SECONDS", 300)
+SCHEDULER_MAX_INTERVAL_SECONDS = sync.config.get("SCHEDULER_MAX_INTERVAL_SECONDS", 10800)
+SCHEDULER_DUE_DATE_WINDOW_HOURS = sync.config.get("SCHEDULER_DUE_DATE_WINDOW_HOURS", 6)
+SCHEDULER_RUN_TIMEOUT_SECONDS = sync.config.get("SCHEDULER_RUN_TIMEOUT_SECONDS", 300)
+
+
+def next_interval(now: datetime.datetime, due_dates, min_interval: float, max_interval: float,
+                  window: datetime.timedelta) -> tuple:
+    """
+    Returns the seconds to wait before the next run, and why.
+
+    Parameters:
+        now (datetime): The current time, timezone-aware.
+        due_dates (iterable): The due dates of the course's assignments, timezone-aware.
+        min_interval (float): The interval near a due date.
+        max_interval (float): The longest interval.
+        window (timedelta): How long before and after a due date counts as near it.
+    """
+    next_window_start = None
+    for due_date in due_dates:
+        if due_date - window <= now <= due_date + window:
+            return min_interval, f"a due date is within {window}"
+        if due_date - window > now and (next_window_start is None or due_date - window < next_window_start):
+            next_window_start = due_date - window
+    if next_window_start is not None:
+        seconds_to_window = (next_window_start - now).total_seconds()
+        if seconds_to_window < max_interval:
+            return max(min_interval, seconds_to_window), "the window of the next due date opens"
+    return max_interval, "no due date is near"
+
+
+class SyncScheduler:
+    """
+    Runs `run_sync(clients, all_tiers)` in a loop, waiting `next_interval` between runs, or less if `trigger` is called.
+    `run_sync` returns False if it left assignments to the next run. `get_due_dates()` returns the due dates found by the
+    last run.
+    """
+
+    def __init__(self, run_sync, get_due_dates, min_interval: float, max_interval: float,
+                 due_date_window: datetime.timedelta, run_timeout: float):
+        self.run_sync = run_sync
+        self.get_due_dates = get_due_dates
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.due_date_window = due_date_window
+        self.run_timeout = run_timeout
+        # Kept between runs; see push_all_grade_data_to_sheets
+        self.clients = {}
+        self.wake = threading.Event()
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.triggers = 0
+        self.all_tiers_requested = False
+        self.running_since = None
+        self.last_run = None
+        self.next_run_at = None
+        self.next_run_reason = None
+
+    def trigger(self, all_tiers: bool = False) -> dict:
+        """
+        Starts a run now, or right after the one that is running. Triggers that arrive before that run starts are
+        served by it. With `all_tiers`, that run syncs every assignment.
+        """
+        with self.lock:
+            self.triggers += 1
+            self.all_tiers_requested = self.all_tiers_requested or all_tiers
+        self.wake.set()
+        logger.info("A sync of every tier was requested" if all_tiers else "A sync was requested")
+        return self.status()
+
+    def stop(self):
+        """
+        Ends the loop once the run in progress, if any, finishes.
+        """
+        self.stopping = True
+        self.wake.set()
+
+    def is_stuck(self) -> bool:
+        running_since = self.running_since
+        return running_since is not None and time.time() - running_since > self.run_timeout
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "runs": self.runs,
+                "triggers": self.triggers,
+                "running_since": self.running_since,
+                "last_run": self.last_run,
+                "next_run_at": self.next_run_at,
+                "next_run_reason": self.next_run_reason,
+                "pending_trigger": self.wake.is_set() and not self.stopping,
+                "all_tiers_requested": self.all_tiers_requested,
+            }
+
+    def run_once(self) -> bool:
+        """
+        Runs one sync with the clients kept from earlier runs. Returns whether it succeeded, and whether it processed
+        every assignment.
+        """
+        self.wake.clear()
+        start_time = time.time()
+        with self.lock:
+            self.running_since = start_time
+            all_tiers = self.all_tiers_requested
+            self.all_tiers_requested = False
+        succeeded = False
+        complete = False
+        try:
+            complete = self.run_sync(self.clients, all_tiers) is not False
+            succeeded = True
+        except Exception as err:
+            logger.exception(f"The sync failed: {err}")
+        finally:
+            gradescope_client = self.clients.get("gradescope")
+            if not succeeded or (gradescope_client is not None and not gradescope_client.logged_in):
+                # Log in and rebuild the Sheets client next run, in case they are what failed
+                self.clients.clear()
+            with self.lock:
+                self.runs += 1
+                self.running_since = None
+                self.last_run = {"started_at": start_time, "duration_seconds": round(time.time() - start_time, 3),
+                                 "succeeded": succeeded, "complete": complete}
+        return succeeded, complete
+
+    def run_forever(self):
+        threading.Thread(target=self.watch_for_stuck_runs, daemon=True).start()
+        while not self.stopping:
+            succeeded, complete = self.run_once()
+            if not succeeded:
+                interval, reason = self.min_interval, "the last run failed"
+            elif not complete:
+                interval, reason = self.min_interval, "the last run left assignments to the next"
+            else:
+                interval, reason = next_interval(datetime.datetime.now(datetime.timezone.utc), self.get_due_dates(),
+                                                 self.min_interval, self.max_interval, self.due_date_window)
+            with self.lock:
+                self.next_run_at = time.time() + interval
+                self.next_run_reason = reason
+            logger.info(f"Next sync in {round(interval)} seconds, because {reason}")
+            self.wake.wait(interval)
+            with self.lock:
+                self.next_run_at = None
+                self.next_run_reason = None
+
+    def watch_for_stuck_runs(self):
+        """
+        Exits the process when a run has taken longer than run_timeout, so that the container is restarted.
+        """
+        while True:
+            time.sleep(min(self.run_timeout, 30))
+            if self.is_stuck():
+                logger.error(f"A sync has been running for more than {self.run_timeout} seconds; exiting")
+                logging.shutdown()
+                os._exit(1)
+
+
+def main():
+    scheduler = SyncScheduler(
+        sync.run_sync,
+        lambda: [date for dates in sync.assignment_dates.values() for date in (dates.due_date, dates.late_due_date) if date],
+        SCHEDULER_MIN_INTERVAL_SECONDS, SCHEDULER_MAX_INTERVAL_SECONDS,
+        datetime.timedelta(hours=SCHEDULER_DUE_DATE_WINDOW_HOURS), SCHEDULER_RUN_TIMEOUT_SECONDS,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    threading.Thread(target=server.serve, args=(scheduler,), daemon=True).start()
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Sorts the assignments of a course into tiers by their dates and recent score changes, so that a sync only downloads the
+assignments whose scores may have changed.
+
+- hot: open for submissions, or closed less than `hot_window` ago (late submissions, autograder reruns). Synced every
+  run. Assignments without dates on the assignments page are hot, as every assignment was before tiers.
+- warm: closed, but graded or regraded recently, i.e. closed or last changed less than `frozen_after` ago. Synced once
+  every `warm_interval`.
+- frozen: closed and unchanged for `frozen_after`, or not released yet. Synced only when every tier is requested (e.g.
+  POST /sync?all_tiers=1), and re-checked once every `frozen_recheck_interval`, so that a regrade of a frozen
+  assignment is still noticed; a changed download makes it warm again.
+An assignment that was never downloaded is synced whatever its tier, so that its subsheet exists.
+
+The time each assignment was last downloaded, and last found changed, is kept in a JSON file in the state directory.
+"""
+import datetime
+import json
+import os
+
+HOT = "hot"
+WARM = "warm"
+FROZEN = "frozen"
+TIERS = [HOT, WARM, FROZEN]
+
+
+def assignment_tier(dates, now: datetime.datetime, last_changed_at, hot_window: datetime.timedelta,
+                    frozen_after: datetime.timedelta) -> str:
+    """
+    Returns the tier of one assignment.
+
+    Parameters:
+        dates (AssignmentDates): Its dates (see assignment_classifier.py), or None if the page has none.
+        now (datetime): The current time, timezone-aware.
+        last_changed_at (datetime): When its downloaded scores last changed, or None if unknown.
+        hot_window (timedelta): How long after closing an assignment stays hot.
+        frozen_after (timedelta): How long after closing, or after its last change, an assignment freezes.
+    """
+    if dates is None:
+        return HOT
+    if not dates.is_released(now):
+        return FROZEN
+    closes_at = dates.closes_at
+    if closes_at is None or now <= closes_at + hot_window:
+        return HOT
+    quiet_since = max(closes_at, last_changed_at) if last_changed_at else closes_at
+    return WARM if now - quiet_since < frozen_after else FROZEN
+
+
+class AssignmentActivity:
+    """
+    When each assignment was last downloaded and last found changed, persisted as JSON at `path` as unix timestamps.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.activity = {}
+
+    def load(self):
+        """
+        Loads the activity saved by previous runs. A missing or unreadable file is treated as no activity.
+        Returns an error message if the file could not be read, and None otherwise.
+        """
+        try:
+            with open(self.path, "r") as activity_file:
+                self.activity = json.load(activity_file)
+        except FileNotFoundError:
+            self.activity = {}
+        except (OSError, ValueError) as err:
+            self.activity = {}
+            return str(err)
+        return None
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as activity_file:
+            json.dump(self.activity, activity_file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def record_download(self, assignment_id: str, now: datetime.datetime, changed: bool):
+        entry = self.activity.setdefault(assignment_id, {})
+        entry["downloaded_at"] = now.timestamp()
+        if changed:
+            entry["changed_at"] = now.timestamp()
+
+    def last_downloaded_at(self, assignment_id: str):
+        return self.get_time(assignment_id, "downloaded_at")
+
+    def last_changed_at(self, assignment_id: str):
+        return self.get_time(assignment_id, "changed_at")
+
+    def get_time(self, assignment_id: str, key: str):
+        timestamp = self.activity.get(assignment_id, {}).get(key)
+        return None if timestamp is None else datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+def select_assignments(assignment_ids, assignment_dates: dict, activity: AssignmentActivity, now: datetime.datetime,
+                       hot_window: datetime.timedelta, warm_interval: datetime.timedelta,
+                       frozen_after: datetime.timedelta, frozen_recheck_interval: datetime.timedelta,
+                       all_tiers: bool = False) -> tuple:
+    """
+    Returns the ids of `assignment_ids` to sync now, in the same order, and {assignment_id: tier} for every assignment.
+    With `all_tiers`, every assignment is synced.
+    """
+    tiers = {}
+    selected_ids = []
+    for assignment_id in assignment_ids:
+        tier = assignment_tier(assignment_dates.get(assignment_id), now, activity.last_changed_at(assignment_id),
+                               hot_window, frozen_after)
+        tiers[assignment_id] = tier
+        last_downloaded_at = activity.last_downloaded_at(assignment_id)
+        if (all_tiers or tier == HOT or last_downloaded_at is None
+                or (tier == WARM and now - last_downloaded_at >= warm_interval)
+                or (tier == FROZEN and now - last_downloaded_at >= frozen_recheck_interval)):
+            selected_ids.append(assignment_id)
+    return selected_ids, tiers
@@ -0,0 +1,72 @@
+"""
+Shared fixtures for the cron job tests.
+"""
+
+import importlib
+import logging
+import os
+import sys
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+
+# The cron job imports its sibling modules as top-level modules, as it does when cron runs it as a script
+CRON_JOB_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CRON_JOB_DIRECTORY)
+
+
+@pytest.fixture(scope="session")
+def cron_job_module(tmp_path_factory):
+    """
+    Imports gradescope_to_spreadsheet.py without arguments. Like the API, importing it requires SERVICE_ACCOUNT_CREDENTIALS.
+    It logs to /var/log/cron.log, which only the container can write to, so the log goes to a temporary file instead.
+    """
+    log_path = str(tmp_path_factory.mktemp("logs") / "cron.log")
+    file_handler = logging.FileHandler
+    with patch.object(sys, "argv", [sys.argv[0]]), \
+            patch.object(logging, "FileHandler", lambda filename, *args, **kwargs: file_handler(log_path, *args, **kwargs)):
+        return importlib.import_module("gradescope_to_spreadsheet")
+
+
+@pytest.fixture
+def cron_job(cron_job_module, tmp_path, monkeypatch):
+    """
+    Gives every test the cron job with an empty state directory and the global state of a new run, so that the digests,
+    checkpoint and requests of one test are never seen by another. Sheets writes are not rate limited.
+    """
+    state_directory = str(tmp_path / "state")
+    monkeypatch.setattr(cron_job_module, "STATE_DIRECTORY", state_directory)
+    monkeypatch.setattr(cron_job_module, "ASSIGNMENT_DIGESTS_PATH", os.path.join(state_directory, "assignment_digests.json"))
+    monkeypatch.setattr(cron_job_module, "SYNC_CHECKPOINT_PATH", os.path.join(state_directory, "sync_checkpoint.json"))
+    monkeypatch.setattr(cron_job_module, "ASSIGNMENT_ACTIVITY_PATH", os.path.join(state_directory, "assignment_activity.json"))
+    monkeypatch.setattr(cron_job_module, "DOWNLOAD_CACHE_DIRECTORY", os.path.join(state_directory, "download_cache"))
+    monkeypatch.setattr(cron_job_module, "assignment_activity",
+                        cron_job_module.sync_tiers.AssignmentActivity(os.path.join(state_directory, "assignment_activity.json")))
+    monkeypatch.setattr(cron_job_module, "download_cache", None)
+    monkeypatch.setattr(cron_job_module, "subsheet_titles_to_ids", None)
+    monkeypatch.setattr(cron_job_module, "request_list", [])
+    monkeypatch.setattr(cron_job_module, "value_range_list", [])
+    monkeypatch.setattr(cron_job_module, "pushed_assignment_digests", {})
+    # Far away, but finite as in a run: waiting for a download with an infinite timeout overflows
+    monkeypatch.setattr(cron_job_module, "run_deadline", time.time() + 3600)
+    monkeypatch.setattr(cron_job_module, "batch_metrics", {"batches": 0, "chunks": 0, "failed_chunks": 0, "bytes": 0,
+                                                           "chunk_latencies": [], "changed_cells": 0})
+    monkeypatch.setattr(cron_job_module, "SHEETS_WRITE_REQUESTS_PER_MINUTE", 60_000)
+    monkeypatch.setattr(cron_job_module, "next_sheets_write_time", 0)
+    for run_state in [cron_job_module.pending_assignment_digests, cron_job_module.completed_assignment_ids,
+                      cron_job_module.deferred_assignment_ids, cron_job_module.stage_timings]:
+        run_state.clear()
+    cron_job_module.run_profile.reset()
+    return cron_job_module
+
+
+@pytest.fixture
+def gradescope_client():
+    """
+    A logged-in Gradescope client whose `download_scores` returns the `scores` of each assignment id, as bytes
+    (or False, as fullGSapi returns for a failed download).
+    """
+    gradescope_client = MagicMock(logged_in=True)
+    gradescope_client.scores = {}
+    gradescope_client.download_scores.side_effect = lambda course_id, assignment_id: gradescope_client.scores[assignment_id]
+    return gradescope_client
@@ -0,0 +1,114 @@
+"""
+These are unit tests for course_policy.py, and for the agreement of the two places that apply it: the cron job's
+instructor dashboard (dashboard_engine.py) and the API's /computeGrades (api/gradeAggregation.py).
+"""
+
+import csv
+import io
+import logging
+import numpy as np
+
+import dashboard_engine
+from api.gradeAggregation import ScoreMatrix, compute_course_grades
+from api.utils import get_ids_for_all_assignments
+from assignment_classifier import AssignmentClassifier, DEFAULT_CATEGORY_RULES
+
+CLASSIFIER = AssignmentClassifier(DEFAULT_CATEGORY_RULES)
+ASSIGNMENT_ID_TO_NAMES = {
+    "1": "Lab 2: Build Your Own Blocks (Conceptual)",
+    "2": "Lab 2: Build Your Own Blocks (Code)",
+    "3": "Optional Lab 5: Extra Practice",
+    "4": "Lab 16: Python Part 1",
+    "5": "Lab 16: Python Part 2",
+    "6": "Lab 16: Python Part 3",
+    "7": "Lab 16: Python Part 4",
+    "8": "Lecture Quiz 1: Welcome",
+    "9": "Optional Lecture Quiz 2: Review",
+    "10": "Discussion 1: Abstraction",
+    "11": "Project 1: Wordle",
+}
+# (Total Score, Max Points, Status) of each student in each assignment
+SCORES = {
+    "1": [("2.0", "2.0", "Graded"), ("1.0", "2.0", "Graded")],
+    "2": [("3.0", "3.0", "Graded"), ("3.0", "3.0", "Graded")],
+    "3": [("0.0", "4.0", "Graded"), ("4.0", "4.0", "Graded")],
+    "4": [("1.0", "1.0", "Graded"), ("1.0", "1.0", "Graded")],
+    "5": [("1.0", "1.0", "Graded"), ("1.0", "1.0", "Graded")],
+    "6": [("1.0", "1.0", "Graded"), ("", "1.0", "Missing")],
+    "7": [("1.0", "1.0", "Graded"), ("1.0", "1.0", "Graded")],
+    "8": [("1.0", "1.0", "Graded"), ("0.0", "1.0", "Graded")],
+    "9": [("0.0", "1.0", "Graded"), ("1.0", "1.0", "Graded")],
+    "10": [("", "1.0", "Missing"), ("1.0", "1.0", "Graded")],
+    "11": [("15.0", "20.0", "Graded"), ("20.0", "20.0", "Graded")],
+}
+STUDENTS = [("Ada", "Lovelace", "3031234567", "ada@berkeley.edu"), ("Grace", "Hopper", "3031234568", "grace@berkeley.edu")]
+
+
+def make_scores_csv(assignment_id):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    writer.writerow(["First Name", "Last Name", "SID", "Email", "Sections", "Total Score", "Max Points", "Status"])
+    for student, scores in zip(STUDENTS, SCORES[assignment_id]):
+        writer.writerow([*student, "", *scores])
+    return output.getvalue()
+
+
+def compute_grades_like_the_api(assignment_id_to_scores):
+    """
+    Computes the grades the way /computeGrades does: from the assignments of the catalog, and the rows of the grade store.
+    """
+    catalog = CLASSIFIER.to_catalog(CLASSIFIER.classify(ASSIGNMENT_ID_TO_NAMES.items()))
+    assignments = [(assignment_id, title) for title, assignment_id in get_ids_for_all_assignments(catalog)]
+    rows = [(assignment_id, row["Email"], float(row["Total Score"]) if row["Total Score"] else None,
+             float(row["Max Points"]), row["Status"])
+            for assignment_id, scores in assignment_id_to_scores.items() for row in csv.DictReader(io.StringIO(scores))]
+    matrix = ScoreMatrix.from_rows([assignment_id for assignment_id, _ in assignments], rows)
+    grades = compute_course_grades(matrix, assignments, CLASSIFIER, num_lecture_drops=0, ungraded_labs=[0],
+                                   special_case_labs=[16], total_lab_points=80)
+    return {email: {name: values[row] for name, values in grades.items()} for row, email in enumerate(matrix.emails)}
+
+
+def test_dashboard_and_api_agree():
+    """
+    Test the instructor dashboard and /computeGrades give every student the same grades, with optional assignments
+    ignored and the four parts of a special case lab forming one lab.
+    """
+    assignment_id_to_scores = {assignment_id: make_scores_csv(assignment_id) for assignment_id in ASSIGNMENT_ID_TO_NAMES}
+
+    dashboard = dashboard_engine.compute_dashboard(ASSIGNMENT_ID_TO_NAMES, assignment_id_to_scores, CLASSIFIER,
+                                                   ungraded_labs=[0], special_case_labs=[16], num_lecture_drops=0,
+                                                   total_lab_points=80)
+    api_grades = compute_grades_like_the_api(assignment_id_to_scores)
+
+    assert "Lab 5" not in dashboard and "Optional Lecture Quiz 2: Review" not in dashboard
+    assert list(dashboard["Lab 16"]) == [1.0, 0.75]
+    # Ada: labs 2 and 16 are full credit; Grace: lab 2 is 4/5 and lab 16 is 3/4
+    expected = {
+        "ada@berkeley.edu": {"lab_score": 80.0, "full_credit_labs": 2, "average_lab_score": 1.0,
+                             "lecture_attendance": 1.0, "discussions_completed": 0, "average_project_score": 0.75},
+        "grace@berkeley.edu": {"lab_score": 0.0, "full_credit_labs": 0, "average_lab_score": 0.775,
+                               "lecture_attendance": 0.0, "discussions_completed": 1, "average_project_score": 1.0},
+    }
+    dashboard_columns = {
+        "lab_score": "Final Lab Score / 80", "full_credit_labs": "# of full credit labs",
+        "average_lab_score": "Avg. Lab Score", "lecture_attendance": "Lecture Attendance Score (Drops Included)",
+        "discussions_completed": "Number of Discussion Makeups", "average_project_score": "Avg. Project Score",
+    }
+    for email, grades in expected.items():
+        for name, value in grades.items():
+            assert np.isclose(api_grades[email][name], value), (email, name)
+            assert np.isclose(dashboard.loc[email, dashboard_columns[name]], value), (email, name)
+
+
+def test_special_case_lab_with_missing_parts_is_still_graded(caplog):
+    """
+    Test a special case lab with fewer than four parts is graded from the parts it has, with a warning.
+    """
+    caplog.set_level(logging.WARNING)
+    names = {assignment_id: ASSIGNMENT_ID_TO_NAMES[assignment_id] for assignment_id in ["4", "5", "6"]}
+    dashboard = dashboard_engine.compute_dashboard(names, {id: make_scores_csv(id) for id in names}, CLASSIFIER,
+                                                   ungraded_labs=[], special_case_labs=[16], num_lecture_drops=0,
+                                                   total_lab_points=80)
+
+    assert np.allclose(list(dashboard["Lab 16"]), [1.0, 2 / 3])
+    assert "3 parts were found" in caplog.text
@@ -0,0 +1,79 @@
+"""
+These are unit tests for gradebook_export.py
+"""
+
+import csv
+import io
+
+from gradebook_export import export_student_columns, split_gradebook_export, trim_scores_csv
+
+# A scores.csv as Gradescope downloads it, and the gradebook export of the same course
+SCORES_CSV = (
+    "First Name,Last Name,SID,Email,Sections,Total Score,Max Points,Status,Submission ID,Submission Time,"
+    "Lateness (H:M:S),View Count,Submission Count,1: Question 1 (2.0 pts)\n"
+    "Ada,Lovelace,3031234567,ada@berkeley.edu,Lab 101,2.0,2.0,Graded,251234567,2024-09-01 12:00:00 -0700,00:00:00,2,1,2.0\n"
+    'José,"Núñez, Jr.",3031234568,jose@berkeley.edu,,,2.0,Missing,,,,0,0,\n'
+)
+GRADEBOOK_EXPORT = (
+    "First Name,Last Name,SID,Email,Sections,Lab 1,Lab 1 - Max Points,Lab 1 - Submission Time,Lab 1 - Lateness (H:M:S),"
+    "Lab 2,Lab 2 - Max Points,Lab 2 - Submission Time,Lab 2 - Lateness (H:M:S),Total Lateness (H:M:S)\n"
+    "Ada,Lovelace,3031234567,ada@berkeley.edu,Lab 101,2.0,2.0,2024-09-01 12:00:00 -0700,00:00:00,,4.0,2024-09-08 12:00:00 -0700,00:00:00,00:00:00\n"
+    'José,"Núñez, Jr.",3031234568,jose@berkeley.edu,,,2.0,,,3.5,4.0,2024-09-08 12:00:00 -0700,01:00:00,01:00:00\n'
+)
+
+
+def read_rows(scores):
+    return list(csv.reader(io.StringIO(scores)))
+
+
+def test_export_student_columns():
+    """
+    Test the student columns are those the export has before the first assignment's.
+    """
+    header = read_rows(GRADEBOOK_EXPORT)[0]
+    assert export_student_columns(header) == ["First Name", "Last Name", "SID", "Email", "Sections"]
+    assert export_student_columns(["Name", "SID", "Email", "Lab 1", "Lab 1 - Max Points"]) == ["Name", "SID", "Email"]
+
+
+def test_split_columns_match_scores_csv():
+    """
+    Test each assignment's columns are in the same positions as in a downloaded scores.csv, up to Lateness (H:M:S), so
+    that the dashboard formulas read SID from C, Total Score from F and Status from H.
+    """
+    split_scores = split_gradebook_export(GRADEBOOK_EXPORT, ["Lab 1", "Lab 2"])
+    scores_header = read_rows(SCORES_CSV)[0]
+    for scores in split_scores.values():
+        header = read_rows(scores)[0]
+        assert header == scores_header[:len(header)]
+        assert header[2] == "SID" and header[5] == "Total Score" and header[7] == "Status"
+
+
+def test_split_rows():
+    """
+    Test each assignment's rows keep the student's columns as exported, and derive Status from the score and
+    submission time.
+    """
+    split_scores = split_gradebook_export(GRADEBOOK_EXPORT, ["Lab 2", "Lab 3"])
+    assert list(split_scores) == ["Lab 2"]
+    assert read_rows(split_scores["Lab 2"])[1:] == [
+        ["Ada", "Lovelace", "3031234567", "ada@berkeley.edu", "Lab 101", "", "4.0", "Ungraded", "",
+         "2024-09-08 12:00:00 -0700", "00:00:00"],
+        ["José", "Núñez, Jr.", "3031234568", "jose@berkeley.edu", "", "3.5", "4.0", "Graded", "",
+         "2024-09-08 12:00:00 -0700", "01:00:00"],
+    ]
+
+
+def test_split_and_trimmed_download_are_the_same_text():
+    """
+    Test an assignment's scores are the same text whether they were split from the export or downloaded on their own,
+    so that switching between the two does not count as a change.
+    """
+    assert trim_scores_csv(SCORES_CSV) == split_gradebook_export(GRADEBOOK_EXPORT, ["Lab 1"])["Lab 1"]
+
+
+def test_trim_leaves_other_csvs_unchanged():
+    """
+    Test a csv without the columns of a scores.csv is not trimmed.
+    """
+    assert trim_scores_csv("") == ""
+    assert trim_scores_csv("Name,Total Score\nStudent1,90\n") == "Name,Total Score\nStudent1,90\n"
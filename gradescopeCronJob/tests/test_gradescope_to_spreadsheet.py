@@ -0,0 +1,404 @@
+"""
+These are unit tests for gradescope_to_spreadsheet.py
+"""
+
+import hashlib
+import json
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+ASSIGNMENT_ID_TO_NAMES = {"5211613": "Lab 1: Welcome to Snap!", "5211614": "Lab 2: Build Your Own Blocks",
+                          "5211615": "Lab 3: Conditionals"}
+SUBSHEET_TITLES_TO_IDS = {"Lab 1: Welcome to Snap!": 1, "Lab 2: Build Your Own Blocks": 2, "Lab 3: Conditionals": 3}
+
+
+def make_scores(total_score):
+    """
+    Returns a scores.csv as Gradescope sends it, with one student.
+    """
+    return f"Name,SID,Email,Total Score\nStudent1,3031234567,s1@berkeley.edu,{total_score}\n".encode()
+
+
+def pasted_sheet_ids(sheets):
+    """
+    Returns the ids of the subsheets pasted by the batch requests sent to the mocked sheets api instance, in order.
+    Requests that add a subsheet are sent on their own, with a dict of requests.
+    """
+    return [request["pasteData"]["coordinate"]["sheetId"]
+            for call in sheets.batchUpdate.call_args_list if isinstance(call.kwargs["body"]["requests"], list)
+            for request in call.kwargs["body"]["requests"]]
+
+
+def read_checkpoint(cron_job):
+    with open(cron_job.SYNC_CHECKPOINT_PATH, "r") as checkpoint_file:
+        return json.load(checkpoint_file)["completed_assignment_ids"]
+
+
+def test_order_for_resuming_starts_with_assignments_not_pushed(cron_job):
+    """
+    Test that the assignments a cut-short run pushed move after the others, until the checkpoint is cleared.
+    """
+    assignment_ids = list(ASSIGNMENT_ID_TO_NAMES)
+    assert cron_job.order_for_resuming(assignment_ids) == assignment_ids
+
+    cron_job.completed_assignment_ids.update(["5211613", "5211614"])
+    cron_job.save_sync_checkpoint()
+
+    assert cron_job.order_for_resuming(assignment_ids) == ["5211615", "5211613", "5211614"]
+    cron_job.clear_sync_checkpoint()
+    assert cron_job.order_for_resuming(assignment_ids) == assignment_ids
+
+
+def test_unreadable_checkpoint_is_ignored(cron_job):
+    """
+    Test that a truncated checkpoint is treated as the previous run having finished.
+    """
+    cron_job.completed_assignment_ids.add("5211613")
+    cron_job.save_sync_checkpoint()
+    with open(cron_job.SYNC_CHECKPOINT_PATH, "w") as checkpoint_file:
+        checkpoint_file.write('{"completed_assignment_ids": ["52')
+
+    assert cron_job.load_sync_checkpoint() == set()
+
+
+def test_flush_requests_checkpoints_only_sent_assignments(cron_job):
+    """
+    Test that assignments are checkpointed once their requests are sent, and that a failed flush keeps its requests
+    for the next one without checkpointing them.
+    """
+    sheets = MagicMock()
+    cron_job.assemble_rest_request_for_assignment(make_scores(90).decode(), None, sheet_id=1)
+    cron_job.pending_assignment_digests["5211613"] = "digest of lab 1"
+
+    cron_job.flush_requests(sheets)
+
+    assert read_checkpoint(cron_job) == ["5211613"]
+    assert cron_job.pushed_assignment_digests == {"5211613": "digest of lab 1"}
+    sheets.batchUpdate.return_value.execute.side_effect = RuntimeError("Sheets is down")
+    cron_job.assemble_rest_request_for_assignment(make_scores(85).decode(), None, sheet_id=2)
+    cron_job.pending_assignment_digests["5211614"] = "digest of lab 2"
+
+    cron_job.flush_requests(sheets)
+
+    assert len(cron_job.request_list) == 1
+    assert read_checkpoint(cron_job) == ["5211613"]
+    assert "5211614" not in cron_job.pushed_assignment_digests
+
+
+def test_cut_short_run_is_resumed_by_the_next(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that a run that reaches its deadline after pushing one assignment defers the others, and that the next run
+    starts with them and skips the one already pushed.
+    """
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    monkeypatch.setattr(cron_job, "SHEETS_BATCH_MAX_REQUESTS", 1)
+    gradescope_client.scores = {"5211613": make_scores(90), "5211614": make_scores(85), "5211615": make_scores(70)}
+    flush_requests = cron_job.flush_requests
+
+    def flush_and_reach_deadline(sheet_api_instance):
+        flush_requests(sheet_api_instance)
+        cron_job.run_deadline = 0
+
+    monkeypatch.setattr(cron_job, "flush_requests", flush_and_reach_deadline)
+    cron_job.prepare_requests_for_all_assignments(MagicMock(), gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+
+    assert cron_job.deferred_assignment_ids == ["5211614", "5211615"]
+    assert read_checkpoint(cron_job) == ["5211613"]
+    monkeypatch.setattr(cron_job, "flush_requests", flush_requests)
+    monkeypatch.setattr(cron_job, "run_deadline", float("inf"))
+    cron_job.deferred_assignment_ids.clear()
+    sheets = MagicMock()
+
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+
+    assert pasted_sheet_ids(sheets) == [2, 3]
+    assert cron_job.deferred_assignment_ids == []
+    assert sorted(cron_job.pushed_assignment_digests) == ["5211613", "5211614", "5211615"]
+
+
+def test_failed_download_is_skipped(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that an assignment whose download fails (fullGSapi returns False) is not pasted over its subsheet.
+    """
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    gradescope_client.scores = {"5211613": make_scores(90), "5211614": False, "5211615": make_scores(70)}
+    sheets = MagicMock()
+
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+    cron_job.flush_requests(sheets)
+
+    assert pasted_sheet_ids(sheets) == [1, 3]
+    assert "5211614" not in cron_job.pushed_assignment_digests
+    assert cron_job.run_profile.assignments["5211614"]["outcome"] == "download failed"
+
+
+def test_deadline_does_not_wait_for_running_downloads(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that a run returns at its deadline while a download is still running, and defers that assignment.
+    """
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    release_download = threading.Event()
+    scores = {"5211613": make_scores(90), "5211614": make_scores(85), "5211615": make_scores(70)}
+
+    def download_scores(course_id, assignment_id):
+        if assignment_id == "5211614":
+            release_download.wait(timeout=10)
+        return scores[assignment_id]
+
+    gradescope_client.download_scores.side_effect = download_scores
+    monkeypatch.setattr(cron_job, "run_deadline", time.time() + 0.5)
+    sheets = MagicMock()
+    start_time = time.time()
+
+    try:
+        cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+        elapsed = time.time() - start_time
+    finally:
+        release_download.set()
+    cron_job.flush_requests(sheets)
+
+    assert elapsed < 5
+    assert cron_job.deferred_assignment_ids == ["5211614", "5211615"]
+    assert pasted_sheet_ids(sheets) == [1]
+
+
+def test_unchanged_assignments_are_not_pasted_again(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that an assignment is only pasted again if its scores changed since they were pushed, or its subsheet is gone.
+    """
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    gradescope_client.scores = {"5211613": make_scores(90), "5211614": make_scores(85), "5211615": make_scores(70)}
+    cron_job.prepare_requests_for_all_assignments(MagicMock(), gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+    cron_job.flush_requests(MagicMock())
+    gradescope_client.scores["5211614"] = make_scores(95)
+    del cron_job.subsheet_titles_to_ids["Lab 3: Conditionals"]
+    sheets = MagicMock()
+    sheets.batchUpdate.return_value.execute.return_value = {"replies": [{"addSheet": {"properties": {"sheetId": 4}}}]}
+
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+    cron_job.flush_requests(sheets)
+
+    assert pasted_sheet_ids(sheets) == [2, 4]
+    assert cron_job.run_profile.assignments["5211613"]["outcome"] == "unchanged"
+
+
+def paste_request(sheet_id, data="Name,Total Score\nStudent1,90\n"):
+    return {"pasteData": {"coordinate": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0}, "data": data,
+                          "type": "PASTE_NORMAL", "delimiter": ","}}
+
+
+def test_split_requests_into_chunks_by_count_and_size(cron_job):
+    """
+    Test that requests are chunked in order by count and by JSON size, and that an oversized request gets its own chunk.
+    """
+    requests = [paste_request(sheet_id) for sheet_id in range(5)]
+    request_bytes = len(json.dumps(requests[0]))
+
+    by_count = cron_job.split_requests_into_chunks(requests, max_bytes=10 ** 6, max_requests=2)
+    by_size = cron_job.split_requests_into_chunks(requests, max_bytes=request_bytes * 3, max_requests=100)
+    oversized = cron_job.split_requests_into_chunks([requests[0], paste_request(9, "x" * 500), requests[1]],
+                                                    max_bytes=request_bytes * 2, max_requests=100)
+
+    assert [chunk for chunk, _ in by_count] == [requests[0:2], requests[2:4], requests[4:5]]
+    assert [len(chunk) for chunk, _ in by_size] == [3, 2]
+    assert by_size[0][1] == request_bytes * 3
+    assert [[request["pasteData"]["coordinate"]["sheetId"] for request in chunk] for chunk, _ in oversized] == [[0], [9], [1]]
+
+
+def test_make_batch_request_keeps_only_failed_chunks(cron_job, monkeypatch):
+    """
+    Test that chunks writing to different subsheets are sent concurrently, by threads with their own sheets api
+    instances, and that only the requests of a chunk that failed are kept in request_list.
+    """
+    monkeypatch.setattr(cron_job, "SHEETS_BATCH_MAX_REQUESTS", 2)
+    sheets = MagicMock()
+
+    def batch_update(spreadsheetId, body):
+        request = MagicMock(body=json.dumps(body))
+        if any(request["pasteData"]["coordinate"]["sheetId"] == 3 for request in body["requests"]):
+            request.execute.side_effect = RuntimeError("Sheets is down")
+        return request
+
+    sheets.batchUpdate.side_effect = batch_update
+    monkeypatch.setattr(cron_job, "create_sheet_api_instance", lambda: sheets)
+    monkeypatch.setattr(cron_job, "thread_local_sheets", threading.local())
+    monkeypatch.setattr(cron_job, "request_list", [paste_request(sheet_id) for sheet_id in range(5)])
+
+    main_thread_sheets = MagicMock()
+
+    with pytest.raises(RuntimeError):
+        cron_job.make_batch_request(main_thread_sheets)
+
+    assert cron_job.request_list == [paste_request(2), paste_request(3)]
+    assert sheets.batchUpdate.call_count == 3
+    main_thread_sheets.batchUpdate.assert_not_called()
+    assert cron_job.batch_metrics["failed_chunks"] == 1
+
+
+def test_dashboard_engine_reads_downloaded_scores(cron_job, gradescope_client):
+    """
+    Test that the scores downloaded for the server-side dashboard, as bytes from Gradescope, keep every student's name.
+    """
+    gradescope_client.scores = {"5211613": "Name,SID,Email,Total Score,Max Points,Status\n"
+                                           "José Núñez,3031234567,s1@berkeley.edu,10.0,10.0,Graded\n"
+                                           "Ada Lovelace,3031234568,s2@berkeley.edu,5.0,10.0,Graded\n".encode("utf-8")}
+    downloaded_scores = {}
+
+    cron_job.prepare_requests_for_all_assignments(MagicMock(), gradescope_client, {"5211613": "Lab 1: Welcome to Snap!"},
+                                                  downloaded_scores)
+    dashboard = cron_job.dashboard_engine.compute_dashboard({"5211613": "Lab 1: Welcome to Snap!"}, downloaded_scores,
+                                                            cron_job.ASSIGNMENT_CLASSIFIER, [], [], 0, 100)
+
+    assert list(dashboard["Name"]) == ["Ada Lovelace", "José Núñez"]
+    assert list(dashboard["Lab 1"]) == [0.5, 1.0]
+
+
+def test_scores_pushed_as_bytes_repr_are_pasted_again_without_counting_as_changed(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that scores pushed by earlier versions (as the repr of their bytes) are pasted again, decoded, and that the
+    assignment is not marked as regraded.
+    """
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    gradescope_client.scores = {"5211613": make_scores(90)}
+    legacy_scores = str(make_scores(90)).replace("\\n", "\n")
+    cron_job.pushed_assignment_digests["5211613"] = hashlib.sha256(legacy_scores.encode("utf-8")).hexdigest()
+
+    cron_job.prepare_requests_for_all_assignments(MagicMock(), gradescope_client, {"5211613": "Lab 1: Welcome to Snap!"})
+
+    assert [request["pasteData"]["data"] for request in cron_job.request_list] == [make_scores(90).decode("utf-8")]
+    assert cron_job.assignment_activity.last_downloaded_at("5211613") is not None
+    assert cron_job.assignment_activity.last_changed_at("5211613") is None
+
+
+def test_compute_changed_ranges_merges_a_regraded_column(cron_job):
+    """
+    Test that a column changed in consecutive rows becomes one range, and that numbers read back from Sheets match
+    the csv text that was pasted.
+    """
+    current_values = [["Name", "SID", "Total Score"], ["Student1", 3031234567, 90], ["Student2", 3031234568, 85],
+                      ["Student3", 3031234569, 70]]
+    new_rows = [["Name", "SID", "Total Score"], ["Student1", "3031234567", "95.0"], ["Student2", "3031234568", "88"],
+                ["Student3", "3031234569", "70.0"]]
+
+    changed_ranges = cron_job.compute_changed_ranges("Lab 1: Welcome to Snap!", current_values, new_rows)
+
+    assert changed_ranges == [{"range": "'Lab 1: Welcome to Snap!'!C2:C3", "values": [["95.0"], ["88"]]}]
+
+
+def test_compute_changed_ranges_clears_removed_cells(cron_job):
+    """
+    Test that cells of rows and columns that are no longer in the csv are cleared, and that quotes in the subsheet
+    title are escaped.
+    """
+    current_values = [["Name", "Total Score", "Status"], ["Student1", 90, "Graded"], ["Student2", 85]]
+    new_rows = [["Name", "Total Score"], ["Student1", "90"]]
+
+    changed_ranges = cron_job.compute_changed_ranges("Dan's Quiz", current_values, new_rows)
+
+    assert changed_ranges == [{"range": "'Dan''s Quiz'!C1:C2", "values": [[""], [""]]},
+                              {"range": "'Dan''s Quiz'!A3:B3", "values": [["", ""]]}]
+    assert cron_job.compute_changed_ranges("Dan's Quiz", [["Name", "Total Score"], ["Student1", 90]], new_rows) == []
+
+
+def test_chunks_are_independent_only_without_shared_subsheets(cron_job):
+    """
+    Test that chunks may only be sent concurrently if each subsheet is written by one chunk, and every subsheet is known.
+    """
+    assert cron_job.chunks_are_independent([([paste_request(1), paste_request(1)], 0), ([paste_request(2)], 0)])
+    assert not cron_job.chunks_are_independent([([paste_request(1)], 0), ([paste_request(2), paste_request(1)], 0)])
+    assert not cron_job.chunks_are_independent([([paste_request(1)], 0), ([{"addSheet": {"properties": {}}}], 0)])
+
+
+def test_diff_mode_writes_changed_cells_or_pastes_unreadable_subsheets(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that in diff mode only the changed cells of an existing subsheet are written, and that an assignment whose
+    subsheet cannot be read is pasted in full instead.
+    """
+    monkeypatch.setattr(cron_job, "SHEETS_WRITE_MODE", "diff")
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    assignment_id_to_names = {"5211613": "Lab 1: Welcome to Snap!"}
+    gradescope_client.scores = {"5211613": make_scores(95)}
+    sheets = MagicMock()
+    sheets.values.return_value.batchGet.return_value.execute.return_value = {"valueRanges": [{"values": [
+        ["Name", "SID", "Email", "Total Score"], ["Student1", 3031234567, "s1@berkeley.edu", 90]]}]}
+
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, assignment_id_to_names)
+
+    assert cron_job.value_range_list == [{"range": "'Lab 1: Welcome to Snap!'!D2:D2", "values": [["95"]]}]
+    assert cron_job.request_list == []
+    cron_job.value_range_list.clear()
+    cron_job.pending_assignment_digests.clear()
+    sheets.values.return_value.batchGet.return_value.execute.side_effect = RuntimeError("Sheets is down")
+
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, assignment_id_to_names)
+
+    assert cron_job.value_range_list == []
+    assert [request["pasteData"]["coordinate"]["sheetId"] for request in cron_job.request_list] == [1]
+
+
+def test_gradebook_columns_follow_the_assignment_categories(cron_job, monkeypatch):
+    """
+    Test that the gradebook subsheets get the columns of the assignments the classifier puts in their category, with
+    the first matching rule winning: a title that mentions a lecture without being a "Lecture Quiz" gets no column, a
+    "Lab Project" is only a project, and a postterm discussion is only a discussion. Case is ignored, so "lab 5" is a lab.
+    """
+    gradebook_subsheets = ["Labs", "Discussions", "Projects", "Lecture Quizzes", "Midterms", "Postterms"]
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", {title: index for index, title in enumerate(gradebook_subsheets)})
+    titles = ["Lecture Quiz 2: Loops", "Lecture 3 Attendance", "Lab 4: Lists", "Optional Lab 9", "Lab Project",
+              "Project 1: Game", "Discussion 2", "Postterm Discussion", "Midterm", "Postterm 1", "lab 5: Trees",
+              "discussion 3", "lecture quiz 4"]
+    sheets = MagicMock()
+    sheets.values.return_value.get.return_value.execute.return_value = {"values": [["Name", "SID", "Email"]]}
+
+    cron_job.populate_spreadsheet_gradebook({str(5211600 + index): title for index, title in enumerate(titles)}, sheets)
+
+    columns = {gradebook_subsheets[request["pasteData"]["coordinate"]["sheetId"]]: request["pasteData"]["data"].split("\n")[0]
+               for request in cron_job.request_list}
+    assert columns == {
+        "Labs": "Lab 4: Lists,lab 5: Trees",
+        "Discussions": "Postterm Discussion,Discussion 2,discussion 3",
+        "Projects": "Lab Project,Project 1: Game",
+        "Lecture Quizzes": "Lecture Quiz 2: Loops,lecture quiz 4",
+        "Midterms": "Midterm",
+        "Postterms": "Postterm 1",
+    }
+
+
+def test_bulk_scores_do_not_change_when_an_assignment_moves_into_the_export(cron_job, gradescope_client, monkeypatch):
+    """
+    Test that an assignment downloaded on its own while missing from the gradebook export is unchanged once it is split
+    from the export, so that it is neither pasted again nor counted as regraded.
+    """
+    monkeypatch.setattr(cron_job, "GRADESCOPE_DOWNLOAD_MODE", "bulk")
+    monkeypatch.setattr(cron_job, "SKIP_UNCHANGED_ASSIGNMENTS", True)
+    monkeypatch.setattr(cron_job, "subsheet_titles_to_ids", dict(SUBSHEET_TITLES_TO_IDS))
+    student = "Ada,Lovelace,3031234567,ada@berkeley.edu,Lab 101"
+    gradescope_client.scores = {id: (
+        "First Name,Last Name,SID,Email,Sections,Total Score,Max Points,Status,Submission ID,Submission Time,"
+        f"Lateness (H:M:S),View Count,Submission Count\n{student},2.0,2.0,Graded,251234567,2024-09-01 12:00:00 -0700,"
+        "00:00:00,1,1\n").encode() for id in ASSIGNMENT_ID_TO_NAMES}
+
+    def get_export(titles):
+        header = "First Name,Last Name,SID,Email,Sections" + "".join(
+            f",{title},{title} - Max Points,{title} - Submission Time,{title} - Lateness (H:M:S)" for title in titles)
+        row = student + ",2.0,2.0,2024-09-01 12:00:00 -0700,00:00:00" * len(titles)
+        return MagicMock(ok=True, url="https://www.gradescope.com/courses/1/gradebook.csv",
+                         content=f"{header}\n{row}\n".encode())
+
+    gradescope_client.session.get.return_value = get_export(["Lab 1: Welcome to Snap!"])
+    first_run_scores = {}
+    cron_job.prepare_requests_for_all_assignments(MagicMock(), gradescope_client, ASSIGNMENT_ID_TO_NAMES, first_run_scores)
+    cron_job.flush_requests(MagicMock())
+    assert gradescope_client.download_scores.call_count == 2
+    assert len(set(first_run_scores.values())) == 1
+
+    gradescope_client.session.get.return_value = get_export(list(ASSIGNMENT_ID_TO_NAMES.values()))
+    sheets = MagicMock()
+    cron_job.prepare_requests_for_all_assignments(sheets, gradescope_client, ASSIGNMENT_ID_TO_NAMES)
+    cron_job.flush_requests(sheets)
+
+    assert gradescope_client.download_scores.call_count == 2
+    assert pasted_sheet_ids(sheets) == []
+    assert all(cron_job.assignment_activity.last_changed_at(id) is None for id in ASSIGNMENT_ID_TO_NAMES)
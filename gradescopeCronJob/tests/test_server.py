@@ -0,0 +1,64 @@
+"""
+These are unit tests for server.py
+"""
+
+import threading
+import pytest
+from http.server import HTTPServer
+from unittest.mock import MagicMock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import server
+
+
+@pytest.fixture
+def scheduler():
+    """
+    Serves the health check with a scheduler on a free port, and returns the scheduler.
+    """
+    scheduler = MagicMock()
+    scheduler.trigger.return_value = {"queued": True}
+    http_server = HTTPServer(("127.0.0.1", 0), server.HealthCheckHandler)
+    server.HealthCheckHandler.scheduler = scheduler
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    scheduler.url = f"http://127.0.0.1:{http_server.server_port}"
+    yield scheduler
+    http_server.shutdown()
+    http_server.server_close()
+    server.HealthCheckHandler.scheduler = None
+
+
+def post_sync(url, token=None):
+    """
+    Sends POST /sync, with the token if given, and returns the response status.
+    """
+    headers = {"Authorization": f"Bearer {token}"} if token is not None else {}
+    try:
+        with urlopen(Request(f"{url}/sync", data=b"", headers=headers, method="POST")) as response:
+            return response.status
+    except HTTPError as error:
+        return error.code
+
+
+def test_sync_refused_without_configured_token(scheduler, monkeypatch):
+    """
+    Test POST /sync is refused unless SYNC_TRIGGER_TOKEN is set, whatever the request sends.
+    """
+    monkeypatch.setattr(server, "SYNC_TRIGGER_TOKEN", None)
+    assert post_sync(scheduler.url) == 403
+    assert post_sync(scheduler.url, token="") == 403
+    scheduler.trigger.assert_not_called()
+
+
+def test_sync_requires_configured_token(scheduler, monkeypatch):
+    """
+    Test POST /sync only starts a sync when it sends the configured token.
+    """
+    monkeypatch.setattr(server, "SYNC_TRIGGER_TOKEN", "secret")
+    assert post_sync(scheduler.url) == 401
+    assert post_sync(scheduler.url, token="wrong") == 401
+    scheduler.trigger.assert_not_called()
+    assert post_sync(scheduler.url, token="secret") == 202
+    scheduler.trigger.assert_called_once_with(False)
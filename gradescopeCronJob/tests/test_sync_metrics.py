@@ -0,0 +1,41 @@
+"""
+These are unit tests for sync_metrics.py
+"""
+
+import os
+
+import sync_metrics
+
+
+def read_metrics(state_directory):
+    with open(os.path.join(state_directory, sync_metrics.METRICS_FILE_NAME), "r") as metrics_file:
+        return metrics_file.read()
+
+
+def saved_bytes(metrics):
+    return next(float(line.split()[-1]) for line in metrics.splitlines()
+                if line.startswith("gradesync_download_bytes_saved_total"))
+
+
+def test_gauges_describe_the_most_recent_run(tmp_path):
+    """
+    Test a run of a long-running process does not report the stage times of an earlier run for the stages it skipped,
+    while the counters add up every run.
+    """
+    state_directory = str(tmp_path)
+    sync_metrics.reset_run_metrics()
+    sync_metrics.ASSIGNMENT_TIERS.labels("hot").set(3)
+    sync_metrics.DOWNLOAD_BYTES_SAVED.inc(100)
+    sync_metrics.write_metrics(state_directory, {"log in": 1.5, "download scores": 2.0}, 4.0, succeeded=True)
+    first_run = read_metrics(state_directory)
+
+    sync_metrics.reset_run_metrics()
+    sync_metrics.DOWNLOAD_BYTES_SAVED.inc(100)
+    sync_metrics.write_metrics(state_directory, {"download scores": 3.0}, 3.5, succeeded=True)
+    second_run = read_metrics(state_directory)
+
+    assert 'gradesync_sync_stage_seconds{stage="log in"} 1.5' in first_run
+    assert 'stage="log in"' not in second_run
+    assert 'gradesync_sync_stage_seconds{stage="download scores"} 3.0' in second_run
+    assert "gradesync_assignment_tiers{" not in second_run
+    assert saved_bytes(second_run) - saved_bytes(first_run) == 100
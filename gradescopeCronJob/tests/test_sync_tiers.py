@@ -0,0 +1,155 @@
+"""
+These are unit tests for sync_tiers.py
+"""
+
+import datetime
+import pytest
+
+import sync_tiers
+from assignment_classifier import AssignmentDates
+from sync_tiers import HOT, WARM, FROZEN
+
+NOW = datetime.datetime(2024, 11, 1, 12, tzinfo=datetime.timezone.utc)
+HOT_WINDOW = datetime.timedelta(days=2)
+WARM_INTERVAL = datetime.timedelta(hours=6)
+FROZEN_AFTER = datetime.timedelta(days=14)
+FROZEN_RECHECK_INTERVAL = datetime.timedelta(days=7)
+
+
+def closed_days_ago(days):
+    """
+    The dates of an assignment released a month before it closed, `days` days before NOW.
+    """
+    closes_at = NOW - datetime.timedelta(days=days)
+    return AssignmentDates(closes_at - datetime.timedelta(days=30), closes_at, None)
+
+
+def tier(dates, last_changed_at=None):
+    return sync_tiers.assignment_tier(dates, NOW, last_changed_at, HOT_WINDOW, FROZEN_AFTER)
+
+
+@pytest.fixture
+def activity(tmp_path):
+    return sync_tiers.AssignmentActivity(str(tmp_path / "state" / "assignment_activity.json"))
+
+
+def select(assignment_dates, activity, all_tiers=False):
+    return sync_tiers.select_assignments(list(assignment_dates), assignment_dates, activity, NOW, HOT_WINDOW,
+                                         WARM_INTERVAL, FROZEN_AFTER, FROZEN_RECHECK_INTERVAL, all_tiers)
+
+
+def test_assignment_tier():
+    """
+    Test an assignment is hot while open or just closed, warm while recently closed and frozen once long closed.
+    """
+    assert tier(None) == HOT
+    assert tier(AssignmentDates(NOW - datetime.timedelta(days=1), None, None)) == HOT
+    assert tier(closed_days_ago(-3)) == HOT
+    assert tier(closed_days_ago(1)) == HOT
+    assert tier(closed_days_ago(5)) == WARM
+    assert tier(closed_days_ago(30)) == FROZEN
+
+
+def test_assignment_tier_late_due_date():
+    """
+    Test an assignment closes at its late due date rather than its due date.
+    """
+    dates = AssignmentDates(NOW - datetime.timedelta(days=30), NOW - datetime.timedelta(days=20),
+                            NOW - datetime.timedelta(days=1))
+    assert tier(dates) == HOT
+
+
+def test_assignment_tier_unreleased():
+    """
+    Test an assignment that is not released yet is frozen.
+    """
+    assert tier(AssignmentDates(NOW + datetime.timedelta(days=1), NOW + datetime.timedelta(days=8), None)) == FROZEN
+
+
+def test_assignment_tier_regraded():
+    """
+    Test a recent change makes a long-closed assignment warm, but never hot.
+    """
+    assert tier(closed_days_ago(30), last_changed_at=NOW - datetime.timedelta(days=1)) == WARM
+    assert tier(closed_days_ago(30), last_changed_at=NOW - datetime.timedelta(days=20)) == FROZEN
+    assert tier(closed_days_ago(5), last_changed_at=NOW - datetime.timedelta(days=20)) == WARM
+
+
+def test_select_assignments_never_downloaded(activity):
+    """
+    Test every assignment that was never downloaded is synced, whatever its tier, in the order given.
+    """
+    assignment_dates = {"3": closed_days_ago(30), "1": closed_days_ago(5), "2": None}
+    selected_ids, tiers = select(assignment_dates, activity)
+    assert selected_ids == ["3", "1", "2"]
+    assert tiers == {"3": FROZEN, "1": WARM, "2": HOT}
+
+
+def test_select_assignments_intervals(activity):
+    """
+    Test warm assignments are synced once every warm interval, frozen ones once every recheck interval, and hot ones
+    every run.
+    """
+    assignment_dates = {
+        "hot": closed_days_ago(1),
+        "warm_recent": closed_days_ago(5),
+        "warm_due": closed_days_ago(5),
+        "frozen_recent": closed_days_ago(30),
+        "frozen_due": closed_days_ago(30),
+    }
+    activity.record_download("hot", NOW - datetime.timedelta(minutes=1), changed=False)
+    activity.record_download("warm_recent", NOW - WARM_INTERVAL + datetime.timedelta(minutes=1), changed=False)
+    activity.record_download("warm_due", NOW - WARM_INTERVAL, changed=False)
+    activity.record_download("frozen_recent", NOW - datetime.timedelta(days=1), changed=False)
+    activity.record_download("frozen_due", NOW - FROZEN_RECHECK_INTERVAL, changed=False)
+    selected_ids, _ = select(assignment_dates, activity)
+    assert selected_ids == ["hot", "warm_due", "frozen_due"]
+
+
+def test_select_assignments_all_tiers(activity):
+    """
+    Test every assignment is synced when every tier is requested, and the tiers are reported all the same.
+    """
+    assignment_dates = {"1": closed_days_ago(5), "2": closed_days_ago(30)}
+    for assignment_id in assignment_dates:
+        activity.record_download(assignment_id, NOW, changed=False)
+    assert select(assignment_dates, activity)[0] == []
+    assert select(assignment_dates, activity, all_tiers=True) == (["1", "2"], {"1": WARM, "2": FROZEN})
+
+
+def test_select_assignments_changed_download_rewarms(activity):
+    """
+    Test a frozen assignment found changed on a recheck is warm on the next run.
+    """
+    assignment_dates = {"1": closed_days_ago(30)}
+    activity.record_download("1", NOW - datetime.timedelta(hours=1), changed=True)
+    assert select(assignment_dates, activity)[1] == {"1": WARM}
+
+
+def test_assignment_activity_persists(activity):
+    """
+    Test the download and change times saved by one run are loaded by the next.
+    """
+    downloaded_at = NOW - datetime.timedelta(hours=1)
+    activity.record_download("1", downloaded_at - datetime.timedelta(days=1), changed=True)
+    activity.record_download("1", downloaded_at, changed=False)
+    activity.save()
+
+    loaded = sync_tiers.AssignmentActivity(activity.path)
+    assert loaded.load() is None
+    assert loaded.last_downloaded_at("1") == downloaded_at
+    assert loaded.last_changed_at("1") == downloaded_at - datetime.timedelta(days=1)
+    assert loaded.last_downloaded_at("2") is None
+
+
+def test_assignment_activity_unreadable(activity):
+    """
+    Test a missing file is no activity, and an unreadable one is no activity with an error.
+    """
+    assert activity.load() is None
+    assert activity.activity == {}
+    activity.save()
+    with open(activity.path, "w") as activity_file:
+        activity_file.write("{not json")
+    assert activity.load() is not None
+    assert activity.activity == {}